@@ -0,0 +1,536 @@
+import heapq
+import threading
+from array import array
+from collections import OrderedDict
+
+from models import db, Page, Choice
+
+
+class StoryAdjacency:
+    """Compressed sparse row (CSR) form of a story graph
+
+    Pages are numbered 0..n-1 in id order. The targets of the choices
+    of page i are targets[offsets[i]:offsets[i + 1]], in choice_order,
+    and weights holds their time_change at the same positions, so the
+    whole graph is a few flat integer arrays however large the story
+    is. Choices leading outside the story are left out.
+    """
+
+    def __init__(self, page_ids, is_ending, edges, ending_labels=None):
+        self.page_ids = array("q", page_ids)
+        self.index = {page_id: i for i, page_id in enumerate(page_ids)}
+        self.is_ending = bytearray(is_ending)
+        self.ending_labels = ending_labels or {}
+
+        n = len(page_ids)
+        counts = [0] * (n + 1)
+        kept = []
+        for from_page_id, to_page_id, time_change in edges:
+            source, target = self.index.get(from_page_id), self.index.get(to_page_id)
+            if source is None or target is None:
+                continue
+            kept.append((source, target, time_change or 0))
+            counts[source + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        self.offsets = array("l", counts)
+
+        # Edges come sorted by source, so filling in order keeps choice_order
+        self.targets = array("l", [0]) * len(kept)
+        self.weights = array("l", [0]) * len(kept)
+        fill = array("l", counts[:n])
+        for source, target, time_change in kept:
+            self.targets[fill[source]] = target
+            self.weights[fill[source]] = time_change
+            fill[source] += 1
+
+    def __len__(self):
+        return len(self.page_ids)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def successors(self, i):
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+
+def load_adjacency(story_id):
+    """Build the CSR graph of a story from two column-only queries"""
+    pages = db.session.execute(
+        db.select(Page.id, Page.is_ending, Page.ending_label)
+        .where(Page.story_id == story_id).order_by(Page.id)
+    ).all()
+    edges = db.session.execute(
+        db.select(Choice.from_page_id, Choice.to_page_id, Choice.time_change)
+        .join(Page, Choice.from_page_id == Page.id)
+        .where(Page.story_id == story_id)
+        .order_by(Choice.from_page_id, Choice.choice_order, Choice.id)
+    ).all()
+    return StoryAdjacency(
+        [p.id for p in pages], [bool(p.is_ending) for p in pages], edges,
+        {p.id: p.ending_label for p in pages if p.is_ending},
+    )
+
+
+def bfs_depths(adjacency, start):
+    """Fewest choices from start to every page, -1 where it cannot be reached"""
+    depth = array("l", [-1]) * len(adjacency)
+    if start is None:
+        return depth
+    depth[start] = 0
+    queue = array("l", [start])
+    offsets, targets = adjacency.offsets, adjacency.targets
+    head = 0
+    while head < len(queue):
+        node = queue[head]
+        head += 1
+        for edge in range(offsets[node], offsets[node + 1]):
+            target = targets[edge]
+            if depth[target] < 0:
+                depth[target] = depth[node] + 1
+                queue.append(target)
+    return depth
+
+
+def strongly_connected_components(adjacency):
+    """Tarjan's algorithm without recursion; returns (component of each page, count)
+
+    Components are numbered in reverse topological order: every choice
+    leaving a component leads to a lower-numbered one.
+    """
+    n = len(adjacency)
+    offsets, targets = adjacency.offsets, adjacency.targets
+    index = array("l", [-1]) * n
+    low = array("l", [0]) * n
+    component = array("l", [-1]) * n
+    on_stack = bytearray(n)
+    stack = []
+    counter = 0
+    count = 0
+
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        # Frames of (page, next edge to follow)
+        frames = [(root, offsets[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        while frames:
+            node, edge = frames[-1]
+            if edge < offsets[node + 1]:
+                frames[-1] = (node, edge + 1)
+                target = targets[edge]
+                if index[target] < 0:
+                    index[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = 1
+                    frames.append((target, offsets[target]))
+                elif on_stack[target] and index[target] < low[node]:
+                    low[node] = index[target]
+                continue
+
+            frames.pop()
+            if frames:
+                parent = frames[-1][0]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+            if low[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component[member] = count
+                    if member == node:
+                        break
+                count += 1
+    return component, count
+
+
+def analyze_story(adjacency, start_page_id):
+    """Reachability, dead ends, loops and depth of a story in O(pages + choices)
+
+    A loop is a strongly connected component with a cycle in it; a trap
+    is a loop the reader can reach but never leave and that holds no
+    ending. max_depth is the fewest choices needed to reach the farthest
+    reachable page.
+    """
+    page_ids = adjacency.page_ids
+    offsets = adjacency.offsets
+    start = adjacency.index.get(start_page_id)
+
+    depth = bfs_depths(adjacency, start)
+    component, count = strongly_connected_components(adjacency)
+
+    members = [[] for _ in range(count)]
+    for i in range(len(adjacency)):
+        members[component[i]].append(i)
+    leaves = bytearray(count)
+    has_ending = bytearray(count)
+    for i in range(len(adjacency)):
+        c = component[i]
+        if adjacency.is_ending[i]:
+            has_ending[c] = 1
+        for target in adjacency.successors(i):
+            if component[target] != c:
+                leaves[c] = 1
+
+    cyclic = cyclic_components(adjacency, component, count)
+    loops = [c for c in range(count) if cyclic[c]]
+    max_depth = max(depth) if start is not None else None
+    return {
+        "start_page_id": start_page_id if start is not None else None,
+        "page_count": len(adjacency),
+        "choice_count": adjacency.edge_count,
+        "reachable_count": sum(1 for d in depth if d >= 0),
+        "unreachable_page_ids": [page_ids[i] for i in range(len(adjacency)) if depth[i] < 0],
+        "dead_end_page_ids": [
+            page_ids[i] for i in range(len(adjacency))
+            if not adjacency.is_ending[i] and offsets[i] == offsets[i + 1]
+        ],
+        "component_count": count,
+        "loops": [sorted(page_ids[i] for i in members[c]) for c in loops],
+        "traps": [
+            sorted(page_ids[i] for i in members[c]) for c in loops
+            if not leaves[c] and not has_ending[c] and depth[members[c][0]] >= 0
+        ],
+        "max_depth": max_depth,
+        "deepest_page_ids": [
+            page_ids[i] for i in range(len(adjacency)) if max_depth is not None and depth[i] == max_depth
+        ],
+    }
+
+
+def cyclic_components(adjacency, component, count):
+    """Flags of the components a reader can go round in: several pages, or a page choosing itself"""
+    size = [0] * count
+    for c in component:
+        size[c] += 1
+    cyclic = bytearray(count)
+    for i in range(len(adjacency)):
+        c = component[i]
+        if size[c] > 1:
+            cyclic[c] = 1
+        elif i in adjacency.successors(i):
+            cyclic[c] = 1
+    return cyclic
+
+
+def ending_stats(adjacency, start_page_id):
+    """Routes from the start page to every ending, without enumerating them
+
+    Cycles are condensed into strongly connected components and path
+    counts, shortest and longest route lengths (in choices) are carried
+    along the resulting DAG in topological order, each page once. Counts
+    are Python integers, so they stay exact when they outgrow 64 bits. A
+    route that can pass through a loop can be made arbitrarily long, so
+    such endings have unbounded routes: no count and no longest length.
+    """
+    n = len(adjacency)
+    offsets, targets = adjacency.offsets, adjacency.targets
+    start = adjacency.index.get(start_page_id)
+    component, count = strongly_connected_components(adjacency)
+    cyclic = cyclic_components(adjacency, component, count)
+
+    routes = [0] * n
+    unbounded = bytearray(n)
+    shortest = bfs_depths(adjacency, start)
+    longest = array("l", [-1]) * n
+    if start is not None:
+        routes[start] = 1
+        longest[start] = 0
+
+    # Tarjan numbers components in reverse topological order
+    order = sorted(range(n), key=component.__getitem__, reverse=True)
+    for node in order:
+        if shortest[node] < 0:
+            continue
+        c = component[node]
+        if cyclic[c]:
+            unbounded[node] = 1
+        for edge in range(offsets[node], offsets[node + 1]):
+            target = targets[edge]
+            if component[target] == c:
+                continue
+            routes[target] += routes[node]
+            if unbounded[node]:
+                unbounded[target] = 1
+            if longest[node] + 1 > longest[target]:
+                longest[target] = longest[node] + 1
+
+    endings = []
+    for i in range(n):
+        if not adjacency.is_ending[i]:
+            continue
+        page_id = adjacency.page_ids[i]
+        reachable = shortest[i] >= 0
+        endings.append({
+            "page_id": page_id,
+            "ending_label": adjacency.ending_labels.get(page_id),
+            "reachable": reachable,
+            "unbounded": bool(unbounded[i]),
+            "route_count": routes[i] if reachable and not unbounded[i] else None,
+            "shortest": shortest[i] if reachable else None,
+            "longest": longest[i] if reachable and not unbounded[i] else None,
+        })
+
+    bounded = [e for e in endings if e["reachable"] and not e["unbounded"]]
+    return {
+        "endings": endings,
+        "reachable_endings": sum(1 for e in endings if e["reachable"]),
+        # None once any ending can be reached an unbounded number of ways
+        "total_routes": (
+            sum(e["route_count"] for e in bounded)
+            if all(not e["unbounded"] for e in endings) else None
+        ),
+    }
+
+
+def shortest_times(adjacency, start):
+    """Dijkstra over time_change; every weight must be non-negative"""
+    n = len(adjacency)
+    offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+    least = [None] * n
+    least[start] = 0
+    heap = [(0, start)]
+    while heap:
+        elapsed, node = heapq.heappop(heap)
+        if elapsed > least[node]:
+            continue
+        for edge in range(offsets[node], offsets[node + 1]):
+            target, arrival = targets[edge], elapsed + weights[edge]
+            if least[target] is None or arrival < least[target]:
+                least[target] = arrival
+                heapq.heappush(heap, (arrival, target))
+    return least, bytearray(n)
+
+
+def longest_times(adjacency, start, reachable):
+    """Most time over the routes to every page when every weight is non-negative
+
+    Runs over the condensation in topological order. A loop holding a
+    choice that costs time can be gone round forever, so it and every
+    page after it have an unbounded most; a loop of free choices costs
+    nothing, so all its pages share the most time of its way in.
+    """
+    n = len(adjacency)
+    offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+    component, count = strongly_connected_components(adjacency)
+
+    members = [[] for _ in range(count)]
+    for i in range(n):
+        if reachable[i]:
+            members[component[i]].append(i)
+    best = [None] * count
+    unbounded = bytearray(count)
+    best[component[start]] = 0
+
+    # Tarjan numbers components in reverse topological order
+    for c in range(count - 1, -1, -1):
+        if best[c] is None:
+            continue
+        for node in members[c]:
+            for edge in range(offsets[node], offsets[node + 1]):
+                target = targets[edge]
+                d = component[target]
+                if d == c:
+                    if weights[edge] > 0:
+                        unbounded[c] = 1
+                    continue
+                arrival = best[c] + weights[edge]
+                if best[d] is None or arrival > best[d]:
+                    best[d] = arrival
+        for node in members[c]:
+            for edge in range(offsets[node], offsets[node + 1]):
+                d = component[targets[edge]]
+                if unbounded[c] and d != c:
+                    unbounded[d] = 1
+
+    most = [best[component[i]] if reachable[i] else None for i in range(n)]
+    return most, bytearray(unbounded[component[i]] for i in range(n))
+
+
+def bellman_ford(adjacency, start, sign):
+    """Least (sign 1) or most (sign -1) time to every page with any weights
+
+    O(pages * choices) in the worst case, so only used when some choice
+    gives time back. Pages after a cycle that keeps improving the total
+    are flagged unbounded.
+    """
+    n = len(adjacency)
+    offsets, targets, weights = adjacency.offsets, adjacency.targets, adjacency.weights
+    best = [None] * n
+    best[start] = 0
+
+    def relax():
+        improved = []
+        for node in range(n):
+            if best[node] is None:
+                continue
+            for edge in range(offsets[node], offsets[node + 1]):
+                target, arrival = targets[edge], best[node] + sign * weights[edge]
+                if best[target] is None or arrival < best[target]:
+                    best[target] = arrival
+                    improved.append(target)
+        return improved
+
+    for _ in range(n - 1):
+        if not relax():
+            break
+
+    # Whatever still improves after n - 1 rounds sits on or behind such a cycle
+    unbounded = bytearray(n)
+    stack = relax()
+    while stack:
+        node = stack.pop()
+        if unbounded[node]:
+            continue
+        unbounded[node] = 1
+        stack.extend(adjacency.successors(node))
+    return [None if b is None else sign * b for b in best], unbounded
+
+
+def page_deadline(extradata):
+    """Deadline an author set on a page, as {"deadline": <time>} in its extradata"""
+    deadline = extradata.get("deadline") if isinstance(extradata, dict) else None
+    # JSON true/false are not times, though Python counts bool as an int
+    if isinstance(deadline, bool) or not isinstance(deadline, (int, float)):
+        return None
+    return deadline
+
+
+def time_bounds(adjacency, start_page_id, deadlines):
+    """Least and most elapsed time, the sum of time_change, at every page
+
+    deadlines maps page ids to the most time allowed on arriving there.
+    With only non-negative time_change the least comes from Dijkstra and
+    the most from the condensation, both near linear; a choice giving
+    time back switches both to Bellman-Ford. Unbounded totals are None.
+    """
+    n = len(adjacency)
+    start = adjacency.index.get(start_page_id)
+    depth = bfs_depths(adjacency, start)
+    reachable = bytearray(d >= 0 for d in depth)
+    negative = any(w < 0 for w in adjacency.weights)
+
+    if start is None:
+        least = most = [None] * n
+        least_unbounded = most_unbounded = bytearray(n)
+    elif negative:
+        least, least_unbounded = bellman_ford(adjacency, start, 1)
+        most, most_unbounded = bellman_ford(adjacency, start, -1)
+    else:
+        least, least_unbounded = shortest_times(adjacency, start)
+        most, most_unbounded = longest_times(adjacency, start, reachable)
+
+    def bounds(i):
+        return {
+            "page_id": adjacency.page_ids[i],
+            "reachable": bool(reachable[i]),
+            "min_elapsed": None if least_unbounded[i] else least[i],
+            "max_elapsed": None if most_unbounded[i] else most[i],
+        }
+
+    pages = [bounds(i) for i in range(n)]
+    endings = [
+        dict(pages[i], ending_label=adjacency.ending_labels.get(adjacency.page_ids[i]))
+        for i in range(n) if adjacency.is_ending[i]
+    ]
+
+    checked = []
+    for page_id, deadline in sorted(deadlines.items()):
+        i = adjacency.index.get(page_id)
+        if i is None:
+            continue
+        page = pages[i]
+        if not page["reachable"]:
+            outcome = "unreachable"
+        elif not least_unbounded[i] and page["min_elapsed"] > deadline:
+            outcome = "always_missed"
+        elif not most_unbounded[i] and page["max_elapsed"] <= deadline:
+            outcome = "always_met"
+        else:
+            outcome = "can_miss"
+        checked.append(dict(page, deadline=deadline, outcome=outcome))
+
+    return {
+        "negative_time_changes": negative,
+        "pages": pages,
+        "endings": endings,
+        "deadlines": checked,
+    }
+
+
+class AnalysisCache:
+    """In-process LRU of graph analyses keyed by story version
+
+    A write moves the story to a new version, so entries for older
+    versions are simply never asked for again and age out; nothing needs
+    invalidating.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def init_app(self, app):
+        self.maxsize = app.config.get("ANALYSIS_CACHE_SIZE", self.maxsize)
+        app.extensions["story_analysis_cache"] = self
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self._entries)
+
+
+analysis_cache = AnalysisCache()
+
+
+def get_adjacency(story_id, version):
+    return analysis_cache.get_or_compute(
+        (story_id, version, "adjacency"), lambda: load_adjacency(story_id)
+    )
+
+
+def get_ending_stats(story_id, version, start_page_id):
+    return analysis_cache.get_or_compute(
+        (story_id, version, "endings"),
+        lambda: ending_stats(get_adjacency(story_id, version), start_page_id),
+    )
+
+
+def load_deadlines(story_id):
+    rows = db.session.execute(
+        db.select(Page.id, Page.extradata)
+        .where(Page.story_id == story_id, Page.extradata.isnot(None))
+    ).all()
+    deadlines = {page_id: page_deadline(extradata) for page_id, extradata in rows}
+    return {page_id: deadline for page_id, deadline in deadlines.items() if deadline is not None}
+
+
+def get_time_bounds(story_id, version, start_page_id):
+    return analysis_cache.get_or_compute(
+        (story_id, version, "timing"),
+        lambda: time_bounds(get_adjacency(story_id, version), start_page_id, load_deadlines(story_id)),
+    )
+
+
+def get_analysis(story_id, version, start_page_id):
+    return analysis_cache.get_or_compute(
+        (story_id, version, "analysis"),
+        lambda: analyze_story(get_adjacency(story_id, version), start_page_id),
+    )
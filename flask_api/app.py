@@ -1,18 +1,34 @@
 from flask import Flask, Blueprint
 from flask_cors import CORS
 from models import db
+from cache import graph_cache
+from snapshots import snapshot_cache
+from analysis import analysis_cache
+from replicas import replica_router
+from compression import compression
+from json_provider import FastJSONProvider
 from routes import api
 from config import Config
+from commands import register_commands
+from schema import migrate, upgrade_schema
 
 app = Flask(__name__)
 app.config.from_object(Config) 
+app.json = FastJSONProvider(app)
 
 CORS(app)
 
 db.init_app(app)
+migrate.init_app(app)
+replica_router.init_app(app)
+graph_cache.init_app(app)
+snapshot_cache.init_app(app)
+analysis_cache.init_app(app)
+compression.init_app(app)
 app.register_blueprint(api)
+register_commands(app)
 
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
+        upgrade_schema()
     app.run(port=5001, debug=True)
@@ -0,0 +1,182 @@
+"""Query plans and latencies of the hot reads before and after the index migration
+
+Seeds a synthetic catalog just before migration 0007 (no indexes yet), times
+the queries behind graph loads, choice lookups and the GET /stories
+listings, then upgrades to head and times them again:
+
+    cd flask_api
+    python benchmarks/indexes.py --stories 2000 --pages 50
+
+Runs against a throwaway SQLite file unless --database-url points at
+an empty scratch database, e.g. a PostgreSQL one.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stories", type=int, default=2000)
+    parser.add_argument("--pages", type=int, default=50, help="pages per story")
+    parser.add_argument("--fanout", type=int, default=2, help="choices per page")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database-url", help="empty scratch database (default: temporary SQLite file)")
+    return parser.parse_args()
+
+
+args = parse_args()
+if args.database_url:
+    os.environ["DATABASE_URL"] = args.database_url
+else:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "benchmark.sqlite")
+
+from app import app  # noqa: E402
+from models import db, Story, Page, Choice, utcnow  # noqa: E402
+from schema import upgrade_schema  # noqa: E402
+
+STATUSES = ("published", "published", "published", "draft", "suspended")
+# Story columns that already exist at revision 0006
+LISTED_COLUMNS = (Story.id, Story.title, Story.author_name, Story.status, Story.created_at, Story.version)
+
+
+def seed(n_stories, n_pages, fanout):
+    rng = random.Random(0)
+    now = utcnow()
+    # The story table as it is at 0006, without the columns later revisions add
+    story_table = db.Table("story", db.MetaData(), autoload_with=db.engine)
+    db.session.execute(db.insert(story_table), [
+        {
+            "title": f"Story {i}", "description": "", "author_name": "bench",
+            "author_id": i % 100, "status": rng.choice(STATUSES), "created_at": now, "version": 1,
+        }
+        for i in range(n_stories)
+    ])
+    story_ids = db.session.execute(db.select(Story.id).order_by(Story.id)).scalars().all()
+
+    # Interleave the pages of different stories like an organically grown catalog
+    rows = [
+        {"story_id": story_id, "page_key": f"page_{n}", "content": "...", "is_ending": n == n_pages - 1}
+        for n in range(n_pages) for story_id in story_ids
+    ]
+    db.session.execute(db.insert(Page), rows)
+    pages_by_story = {}
+    for page_id, story_id in db.session.execute(db.select(Page.id, Page.story_id).order_by(Page.id)):
+        pages_by_story.setdefault(story_id, []).append(page_id)
+
+    db.session.execute(db.insert(Choice), [
+        {
+            "from_page_id": page_id, "to_page_id": rng.choice(page_ids),
+            "choice_text": f"Option {order + 1}", "choice_order": order, "time_change": 0,
+        }
+        for page_ids in pages_by_story.values()
+        for page_id in page_ids
+        for order in range(fanout)
+    ])
+    db.session.commit()
+    return story_ids, pages_by_story
+
+
+def hot_queries(story_id, page_id):
+    """The statements behind the read endpoints, as the routes build them"""
+    return {
+        "pages of a story": (
+            db.select(Page).where(Page.story_id == story_id).order_by(Page.id)
+        ),
+        "choices of a story": (
+            db.select(Choice).join(Page, Choice.from_page_id == Page.id)
+            .where(Page.story_id == story_id)
+            .order_by(Choice.from_page_id, Choice.choice_order, Choice.id)
+        ),
+        "choices of a page": (
+            db.select(Choice).where(Choice.from_page_id == page_id)
+            .order_by(Choice.choice_order, Choice.id)
+        ),
+        "choices to a page": db.select(Choice.id).where(Choice.to_page_id == page_id),
+        "published stories": (
+            db.select(*LISTED_COLUMNS).where(Story.status == "published")
+            .order_by(Story.created_at.desc(), Story.id.desc()).limit(51)
+        ),
+        "stories of an author": (
+            db.select(*LISTED_COLUMNS).where(Story.author_id == 7)
+            .order_by(Story.created_at.desc(), Story.id.desc()).limit(51)
+        ),
+    }
+
+
+def plan(statement):
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        rows = db.session.execute(db.text("EXPLAIN QUERY PLAN " + sql)).all()
+        return [row[-1] for row in rows]
+    return [row[0] for row in db.session.execute(db.text("EXPLAIN " + sql)).all()]
+
+
+def analyze():
+    """Refresh PostgreSQL statistics so the planner knows the tables' real size"""
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure(story_id, page_id, repeat):
+    results = {}
+    for name, statement in hot_queries(story_id, page_id).items():
+        seconds = best_of(repeat, lambda: db.session.execute(statement).all())
+        results[name] = (seconds, plan(statement))
+    return results
+
+
+def main():
+    with app.app_context():
+        if db.inspect(db.engine).get_table_names():
+            print("The benchmark needs an empty database; it creates and fills its own tables")
+            return 1
+
+        upgrade_schema("0006")
+        start = time.perf_counter()
+        story_ids, pages_by_story = seed(args.stories, args.pages, args.fanout)
+        print(f"Seeded {len(story_ids)} stories, {len(story_ids) * args.pages} pages, "
+              f"{len(story_ids) * args.pages * args.fanout} choices "
+              f"in {time.perf_counter() - start:.1f}s ({db.engine.dialect.name})\n")
+
+        analyze()
+        story_id = story_ids[len(story_ids) // 2]
+        page_id = pages_by_story[story_id][len(pages_by_story[story_id]) // 2]
+
+        before = measure(story_id, page_id, args.repeat)
+        # Let go of the connection so it sees the new schema
+        db.session.remove()
+        upgrade_schema()
+        analyze()
+        after = measure(story_id, page_id, args.repeat)
+
+        for name in before:
+            (old, old_plan), (new, new_plan) = before[name], after[name]
+            print(f"{name} (best of {args.repeat})")
+            print(f"  before {old * 1000:9.3f} ms   after {new * 1000:9.3f} ms   {old / new:6.1f}x")
+            for label, lines in (("before", old_plan), ("after", new_plan)):
+                print(f"  {label} plan:")
+                for line in lines:
+                    print(f"    {line}")
+            print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
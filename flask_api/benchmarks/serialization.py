@@ -0,0 +1,105 @@
+"""Serialization time and bytes on the wire for a large story
+
+Compares the stdlib Flask JSON provider with FastJSONProvider and an
+uncompressed response with gzip and deflate ones, against a throwaway
+in-memory SQLite database:
+
+    cd flask_api
+    python benchmarks/serialization.py --pages 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ["DATABASE_URL"] = "sqlite://"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from app import app  # noqa: E402
+from models import db, Story, Page, Choice  # noqa: E402
+from json_provider import FastJSONProvider, orjson  # noqa: E402
+
+WORDS = (
+    "the corridor narrows until your shoulders brush damp stone on either side somewhere "
+    "ahead water drips into a pool each drop echoing longer than it should you hear "
+    "footsteps behind torch light flickers against carved runes door lantern ancient"
+).split()
+
+
+def prose(rng, words=120):
+    """Pseudo-random prose so pages do not compress unrealistically well"""
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def seed(n_pages, fanout):
+    rng = random.Random(0)
+    story = Story(title="Benchmark", description="A long story", author_name="bench", status="published")
+    db.session.add(story)
+    db.session.flush()
+    pages = [
+        Page(story_id=story.id, page_key=f"page_{i}", content=prose(rng), is_ending=i >= n_pages - fanout)
+        for i in range(n_pages)
+    ]
+    db.session.add_all(pages)
+    db.session.flush()
+    story.start_page_id = pages[0].id
+    db.session.add_all(
+        Choice(from_page_id=page.id, to_page_id=pages[min(i + j + 1, n_pages - 1)].id,
+               choice_text=f"Take passage {j + 1}", choice_order=j)
+        for i, page in enumerate(pages[:-fanout])
+        for j in range(fanout)
+    )
+    db.session.commit()
+    return story.id
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--fanout", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        story_id = seed(args.pages, args.fanout)
+        client = app.test_client()
+        url = f"/stories/{story_id}?include_pages=true"
+        document = client.get(url).get_json()
+
+        print(f"Story with {args.pages} pages, {args.fanout} choices per page\n")
+        print("Serialization (best of %d)" % args.repeat)
+        providers = [("stdlib json", DefaultJSONProvider(app))]
+        if orjson is not None:
+            providers.append(("orjson", FastJSONProvider(app)))
+        else:
+            print("  orjson is not installed, FastJSONProvider falls back to stdlib json")
+        baseline = None
+        for name, provider in providers:
+            seconds = best_of(args.repeat, lambda: provider.response(document))
+            baseline = baseline or seconds
+            print(f"  {name:<12} {seconds * 1000:8.1f} ms  {baseline / seconds:5.1f}x")
+
+        print("\nBytes on the wire")
+        identity = None
+        for encoding in ("identity", "gzip", "deflate"):
+            response = client.get(url, headers={"Accept-Encoding": encoding})
+            size = len(response.data)
+            identity = identity or size
+            print(f"  {encoding:<12} {size:10,d} B  {identity / size:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+
+
+class StoryGraphCache:
+    """In-process LRU of compiled story graphs, keyed by story and version
+
+    Every write moves a story to a new version, whichever process or job
+    makes it, so a reader that asks for the version it just read from the
+    database never gets a graph older than that. Only the newest graph
+    of each story is kept; invalidate() merely frees it early.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._page_index = {}
+        self._choice_index = {}
+
+    def init_app(self, app):
+        self.maxsize = app.config.get("STORY_CACHE_SIZE", self.maxsize)
+        app.extensions["story_graph_cache"] = self
+
+    def get(self, story_id, version):
+        with self._lock:
+            graph = self._entries.get(story_id)
+            if graph is None or graph.story["version"] != version:
+                return None
+            self._entries.move_to_end(story_id)
+            return graph
+
+    def story_for_page(self, page_id):
+        with self._lock:
+            return self._page_index.get(page_id)
+
+    def story_for_choice(self, choice_id):
+        with self._lock:
+            return self._choice_index.get(choice_id)
+
+    def put(self, graph):
+        with self._lock:
+            current = self._entries.get(graph.story_id)
+            # A reader on a lagging replica must not replace a newer graph
+            if current is not None and current.story["version"] > graph.story["version"]:
+                return False
+            self._drop(graph.story_id)
+            self._entries[graph.story_id] = graph
+            for page_id in graph.pages:
+                self._page_index[page_id] = graph.story_id
+            for choice_id in graph.choices:
+                self._choice_index[choice_id] = graph.story_id
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+            return True
+
+    def invalidate(self, story_id):
+        with self._lock:
+            self._drop(story_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._page_index.clear()
+            self._choice_index.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, story_id):
+        graph = self._entries.pop(story_id, None)
+        if graph is None:
+            return
+        for page_id in graph.pages:
+            if self._page_index.get(page_id) == story_id:
+                del self._page_index[page_id]
+        for choice_id in graph.choices:
+            if self._choice_index.get(choice_id) == story_id:
+                del self._choice_index[choice_id]
+
+
+graph_cache = StoryGraphCache()
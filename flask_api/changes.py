@@ -0,0 +1,61 @@
+from models import db, Change, utcnow
+
+STORY, PAGE, CHOICE = "story", "page", "choice"
+CREATE, UPDATE, DELETE = "create", "update", "delete"
+
+# Transaction-level advisory lock key serializing writers of the feed on PostgreSQL
+FEED_LOCK = 0x5EED
+
+
+def lock_feed():
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(db.select(db.func.pg_advisory_xact_lock(FEED_LOCK)))
+
+
+def record_many(changes):
+    """Append (story_id, entity, entity_id, op) tuples to the change feed
+
+    Runs in the caller's transaction, so an entry exists exactly when
+    its write commits. On PostgreSQL the feed lock is held until commit,
+    so entries become visible in seq order and a reader resuming after
+    the last seq it saw cannot skip one that commits late.
+    """
+    changes = list(changes)
+    if not changes:
+        return
+    lock_feed()
+    now = utcnow()
+    db.session.execute(db.insert(Change), [
+        {"story_id": story_id, "entity": entity, "entity_id": entity_id, "op": op, "changed_at": now}
+        for story_id, entity, entity_id, op in changes
+    ])
+
+
+def record(story_id, entity, op, *entity_ids):
+    """Log op on entity_ids of one story; story changes default to the story itself"""
+    if entity == STORY and not entity_ids:
+        entity_ids = (story_id,)
+    record_many((story_id, entity, entity_id, op) for entity_id in entity_ids)
+
+
+def record_select(entity, op, select):
+    """Log op on every (story_id, entity_id) row of select with one INSERT ... SELECT"""
+    lock_feed()
+    rows = select.subquery()
+    db.session.execute(
+        db.insert(Change).from_select(
+            ["story_id", "entity_id", "entity", "op", "changed_at"],
+            db.select(*rows.c, db.literal(entity), db.literal(op), db.literal(utcnow(), db.DateTime))
+        )
+    )
+
+
+def changes_since(since, limit):
+    """Up to limit changes after seq since, oldest first, and whether more follow"""
+    rows = (
+        Change.query.filter(Change.seq > since)
+        .order_by(Change.seq)
+        .limit(limit + 1)
+        .all()
+    )
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,101 @@
+from models import db, Story, Page, Choice, story_tag
+from changes import record, record_select, STORY, PAGE, CHOICE, CREATE
+from snapshots import publish_story, PUBLISHED
+
+PAGE_COLUMNS = ("page_key", "content", "is_start", "is_ending", "ending_label", "page_number", "extradata")
+CHOICE_COLUMNS = ("choice_text", "choice_order", "time_change")
+
+
+def page_id_map(source_id, target_id):
+    """(old_id, new_id) pairs pairing the pages of two stories by id order
+
+    Pages are copied with one INSERT ... SELECT ordered by id, so the
+    n-th page of the copy is the copy of the n-th page of the source.
+    """
+    def numbered(story_id):
+        return (
+            db.select(Page.id, db.func.row_number().over(order_by=Page.id).label("n"))
+            .where(Page.story_id == story_id)
+            .cte()
+        )
+
+    old, new = numbered(source_id), numbered(target_id)
+    return (
+        db.select(old.c.id.label("old_id"), new.c.id.label("new_id"))
+        .join(new, new.c.n == old.c.n)
+        .cte("page_map")
+    )
+
+
+def clone_story(source, **overrides):
+    """Copy a story with its pages, choices and tags inside the database
+
+    Rows are copied with set-based INSERT ... SELECT statements, so the
+    cost does not depend on round trips per page. Returns the new story;
+    the caller commits.
+    """
+    story = Story(
+        title=overrides.get("title") or f"{source.title} (copy)",
+        description=overrides.get("description", source.description),
+        author_name=overrides.get("author_name", source.author_name),
+        author_id=overrides.get("author_id", source.author_id),
+        status=overrides.get("status", "draft"),
+        tags=source.tags,
+        # Same pages and choices, so the same statistics
+        page_count=source.page_count,
+        ending_count=source.ending_count,
+        choice_count=source.choice_count,
+        max_depth=source.max_depth
+    )
+    db.session.add(story)
+    db.session.flush()
+
+    db.session.execute(
+        db.insert(story_tag).from_select(
+            ["story_id", "tag_id"],
+            db.select(db.literal(story.id), story_tag.c.tag_id).where(story_tag.c.story_id == source.id)
+        )
+    )
+
+    page_columns = [getattr(Page, name) for name in PAGE_COLUMNS]
+    db.session.execute(
+        db.insert(Page).from_select(
+            ["story_id", *PAGE_COLUMNS],
+            db.select(db.literal(story.id), *page_columns)
+            .where(Page.story_id == source.id)
+            .order_by(Page.id)
+        )
+    )
+
+    page_map = page_id_map(source.id, story.id)
+    from_map, to_map = page_map.alias("from_map"), page_map.alias("to_map")
+    db.session.execute(
+        db.insert(Choice).from_select(
+            ["from_page_id", "to_page_id", *CHOICE_COLUMNS],
+            db.select(from_map.c.new_id, to_map.c.new_id, *[getattr(Choice, name) for name in CHOICE_COLUMNS])
+            .select_from(Choice)
+            .join(from_map, from_map.c.old_id == Choice.from_page_id)
+            .join(to_map, to_map.c.old_id == Choice.to_page_id)
+            .order_by(Choice.id)
+        )
+    )
+
+    if source.start_page_id:
+        story.start_page_id = db.session.execute(
+            db.select(page_map.c.new_id).where(page_map.c.old_id == source.start_page_id)
+        ).scalar()
+    # The copied rows go into the feed like any other creates, so a
+    # consumer can rebuild the new story from it alone
+    record(story.id, STORY, CREATE)
+    record_select(PAGE, CREATE, (
+        db.select(Page.story_id, Page.id).where(Page.story_id == story.id).order_by(Page.id)
+    ))
+    record_select(CHOICE, CREATE, (
+        db.select(Page.story_id, Choice.id)
+        .join(Page, Choice.from_page_id == Page.id)
+        .where(Page.story_id == story.id)
+        .order_by(Choice.id)
+    ))
+    if story.status == PUBLISHED:
+        publish_story(story.id)
+    return story
@@ -0,0 +1,98 @@
+import time
+
+import click
+from flask.cli import with_appcontext
+
+from tags import backfill_story_tags
+from replicas import replica_router
+from models import db, Story
+from snapshots import publish_story, PUBLISHED
+from graph import get_story_version
+from simulate import get_transitions, simulate, DEFAULT_WALKS, DEFAULT_MAX_STEPS, MAX_BIAS
+from stats import repair_story_stats
+
+
+@click.command("backfill-tags")
+@with_appcontext
+def backfill_tags_command():
+    """Build the tag tables from the comma separated Story.tags strings"""
+    stories, tags, links = backfill_story_tags()
+    click.echo(f"✓ {tags} tags linked to {stories} stories ({links} links)")
+
+
+@click.command("replica-status")
+@with_appcontext
+def replica_status_command():
+    """Health check every configured read replica"""
+    if not replica_router.replicas:
+        click.echo("No replicas configured; set DATABASE_REPLICA_URLS")
+    for replica in replica_router.replicas:
+        click.echo(f"{'✓' if replica.check() else '✗'} {replica.name}")
+
+
+@click.command("snapshot-published")
+@with_appcontext
+def snapshot_published_command():
+    """Snapshot the published stories that were never published through the API"""
+    story_ids = db.session.execute(
+        db.select(Story.id)
+        .where(Story.status == PUBLISHED, Story.published_version.is_(None))
+        .order_by(Story.id)
+    ).scalars().all()
+    for story_id in story_ids:
+        publish_story(story_id)
+        db.session.commit()
+    click.echo(f"✓ {len(story_ids)} published stories snapshotted")
+
+
+@click.command("simulate")
+@click.argument("story_id", type=int)
+@click.option("--walks", default=DEFAULT_WALKS, show_default=True, help="random playthroughs")
+@click.option("--seed", type=int, help="seed for a repeatable run")
+@click.option("--bias", default=1.0, show_default=True, type=click.FloatRange(0, MAX_BIAS, min_open=True),
+              help="weight of each later choice relative to the one before (1 is uniform)")
+@click.option("--max-steps", default=DEFAULT_MAX_STEPS, show_default=True,
+              help="choices after which a walk counts as unfinished")
+@with_appcontext
+def simulate_command(story_id, walks, seed, bias, max_steps):
+    """Estimate the ending distribution and length of a story from random playthroughs"""
+    current = get_story_version(story_id)
+    if current is None:
+        raise click.ClickException(f"story {story_id} not found")
+    version, start_page_id = current
+
+    start = time.perf_counter()
+    result = simulate(get_transitions(story_id, version, bias), start_page_id, walks, seed, max_steps)
+    if result is None:
+        raise click.ClickException(f"story {story_id} has no start page")
+    elapsed = time.perf_counter() - start
+
+    click.echo(f"✓ {walks} walks in {elapsed:.2f}s: {result['finished']} finished, "
+               f"{result['unfinished']} still going after {max_steps} choices")
+    for title, outcomes in (("Endings", result["endings"]), ("Dead ends", result["dead_ends"])):
+        if outcomes:
+            click.echo(f"{title}:")
+        for outcome in outcomes:
+            label = outcome["ending_label"] or f"page {outcome['page_id']}"
+            click.echo(f"  {outcome['share']:7.2%}  {label}")
+    steps = result["steps"]
+    if steps["mean"] is not None:
+        click.echo(f"Choices per playthrough: mean {steps['mean']:.1f}, min {steps['min']}, max {steps['max']}")
+
+
+@click.command("repair-story-stats")
+@with_appcontext
+def repair_story_stats_command():
+    """Recompute the stored page, ending and choice counts and max depth of every story"""
+    start = time.perf_counter()
+    stories, repaired = repair_story_stats()
+    click.echo(f"✓ Statistics of {stories} stories recomputed in {time.perf_counter() - start:.1f}s, "
+               f"{repaired} corrected")
+
+
+def register_commands(app):
+    app.cli.add_command(backfill_tags_command)
+    app.cli.add_command(replica_status_command)
+    app.cli.add_command(snapshot_published_command)
+    app.cli.add_command(simulate_command)
+    app.cli.add_command(repair_story_stats_command)
@@ -0,0 +1,79 @@
+import zlib
+
+from flask import request
+
+ENCODINGS = ("gzip", "deflate")
+COMPRESSIBLE_MIMETYPES = ("application/json", "application/x-ndjson")
+
+
+def _compressor(encoding, level):
+    # wbits 16 + MAX_WBITS writes a gzip container, MAX_WBITS a zlib (HTTP deflate) one
+    wbits = 16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS
+    return zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+
+def _compress_stream(chunks, compressor):
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class Compression:
+    """gzip / deflate response compression negotiated from Accept-Encoding
+
+    JSON bodies of at least COMPRESS_MIN_SIZE bytes are compressed, and
+    streamed responses are compressed chunk by chunk. A compressed body is
+    a different representation, so its ETag gets the encoding as a suffix;
+    etags.client_has() accepts either form in If-None-Match.
+    """
+
+    def __init__(self, min_size=1024, level=6):
+        self.min_size = min_size
+        self.level = level
+
+    def init_app(self, app):
+        self.min_size = app.config.get("COMPRESS_MIN_SIZE", self.min_size)
+        self.level = app.config.get("COMPRESS_LEVEL", self.level)
+        app.extensions["compression"] = self
+        app.after_request(self.compress_response)
+
+    def compress_response(self, response):
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        etag, weak = response.get_etag()
+
+        if response.status_code == 304:
+            response.vary.add("Accept-Encoding")
+            # Echo the variant the client revalidated with
+            if etag and encoding and request.if_none_match.contains(f"{etag}-{encoding}"):
+                response.set_etag(f"{etag}-{encoding}", weak)
+            return response
+
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add("Accept-Encoding")
+        if encoding is None or "Content-Encoding" in response.headers:
+            return response
+        if response.status_code != 200 or response.direct_passthrough:
+            return response
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, _compressor(encoding, self.level))
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            compressor = _compressor(encoding, self.level)
+            response.set_data(compressor.compress(body) + compressor.flush())
+
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak)
+        return response
+
+
+compression = Compression()
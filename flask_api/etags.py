@@ -0,0 +1,52 @@
+import hashlib
+
+from flask import request, jsonify, current_app, stream_with_context
+
+
+def make_etag(*parts):
+    """Strong ETag for a representation built from version parts and the query string"""
+    raw = "|".join(str(p) for p in parts) + "|" + request.query_string.decode()
+    return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+
+def client_has(etag):
+    """Whether If-None-Match holds etag, as is or with a compression suffix"""
+    return any(
+        request.if_none_match.contains(candidate)
+        for candidate in (etag, f"{etag}-gzip", f"{etag}-deflate")
+    )
+
+
+def conditional_json(etag, build):
+    """Answer 304 when the client already holds etag, otherwise jsonify build()
+
+    build is only called when the body is actually needed, so a matching
+    If-None-Match skips serialization entirely.
+    """
+    if client_has(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    return response
+
+
+# Snapshot URLs carry their version, so what they return never changes
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def immutable_json(etag, build):
+    """conditional_json for a representation that is never modified"""
+    response = conditional_json(etag, build)
+    response.headers["Cache-Control"] = IMMUTABLE
+    return response
+
+
+def conditional_stream(etag, generate, mimetype):
+    """Like conditional_json, but streams the str chunks of generate()"""
+    if client_has(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(stream_with_context(generate()), mimetype=mimetype)
+    response.set_etag(etag)
+    return response
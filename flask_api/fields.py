@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from sqlalchemy.orm import load_only
+
+STORY_FIELDS = (
+    "id", "title", "description", "tags", "author_name", "author_id",
+    "status", "start_page_id", "created_at", "version", "published_version",
+    "page_count", "ending_count", "choice_count", "max_depth"
+)
+PAGE_FIELDS = (
+    "id", "story_id", "page_key", "content", "is_start", "is_ending",
+    "ending_label", "page_number", "extradata", "choices"
+)
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def parse_fields(raw, allowed):
+    """Requested ?fields= names, always including id, or None for the full shape"""
+    if raw is None:
+        return None
+    names = []
+    for name in raw.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in allowed:
+            raise InvalidFields(f"unknown field '{name}', expected any of {', '.join(allowed)}")
+        if name not in names:
+            names.append(name)
+    if "id" not in names:
+        names.insert(0, "id")
+    return names
+
+
+def only_columns(model, fields, *required):
+    """load_only() option selecting the column fields, plus required and id"""
+    columns = model.__table__.columns
+    names = [f for f in fields if f in columns]
+    names += [f for f in required + ("id",) if f not in names]
+    return load_only(*[getattr(model, name) for name in names])
+
+
+def row_to_dict(obj, fields):
+    """Serialize only the loaded column fields of a model instance"""
+    columns = obj.__table__.columns
+    result = {}
+    for name in fields:
+        if name not in columns:
+            continue
+        value = getattr(obj, name)
+        result[name] = value.isoformat() if isinstance(value, datetime) else value
+    return result
+
+
+def project(data, fields):
+    if fields is None:
+        return data
+    return {name: data[name] for name in fields if name in data}
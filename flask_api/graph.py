@@ -0,0 +1,160 @@
+from models import db, Story, Page, Choice, DELETING
+from cache import graph_cache
+from fields import only_columns, row_to_dict
+
+
+def load_story_choices(story_id):
+    """All choices of a story grouped by page, with one query"""
+    choices = (
+        Choice.query
+        .join(Page, Choice.from_page_id == Page.id)
+        .filter(Page.story_id == story_id)
+        .order_by(Choice.from_page_id, Choice.choice_order, Choice.id)
+        .all()
+    )
+
+    # Group choices in memory instead of querying once per page
+    choices_by_page = {}
+    for choice in choices:
+        choices_by_page.setdefault(choice.from_page_id, []).append(choice)
+    return choices_by_page
+
+
+def load_story_graph(story_id):
+    """Load all pages and choices of a story with one query each"""
+    pages = Page.query.filter_by(story_id=story_id).order_by(Page.id).all()
+
+    choices_by_page = {page.id: [] for page in pages}
+    choices_by_page.update(load_story_choices(story_id))
+
+    return pages, choices_by_page
+
+
+def load_pages_projection(story_id, page_fields):
+    """Pages of a story in the include_pages shape, selecting only page_fields"""
+    pages = (
+        Page.query.options(only_columns(Page, page_fields))
+        .filter_by(story_id=story_id)
+        .order_by(Page.id)
+        .all()
+    )
+    choices_by_page = load_story_choices(story_id) if "choices" in page_fields else None
+
+    result = []
+    for idx, page in enumerate(pages, start=1):
+        page_dict = row_to_dict(page, page_fields)
+        if "page_number" in page_fields:
+            page_dict["page_number"] = idx
+        if choices_by_page is not None:
+            page_dict["choices"] = [c.to_dict() for c in choices_by_page.get(page.id, [])]
+        result.append(page_dict)
+    return result
+
+
+class StoryGraph:
+    """Serialized, read-only graph of one story: pages by id, choices sorted by choice_order"""
+
+    def __init__(self, story, pages, choices_by_page):
+        self.story_id = story.id
+        self.story = story.to_dict()
+        self.pages = {page.id: page.to_dict() for page in pages}
+        self.choices_by_page = {
+            page_id: [c.to_dict() for c in page_choices]
+            for page_id, page_choices in choices_by_page.items()
+        }
+        self.choices = {
+            c["id"]: c for page_choices in self.choices_by_page.values() for c in page_choices
+        }
+
+    def story_dict(self):
+        return dict(self.story)
+
+    def page_with_choices(self, page_id):
+        page_dict = dict(self.pages[page_id])
+        page_dict["choices"] = [dict(c) for c in self.choices_by_page.get(page_id, [])]
+        return page_dict
+
+    def pages_list(self):
+        """Pages with their choices, in the shape of include_pages"""
+        result = []
+        for idx, page_id in enumerate(self.pages, start=1):
+            page_dict = self.page_with_choices(page_id)
+            page_dict["page_number"] = idx
+            result.append(page_dict)
+        return result
+
+    def choices_list(self):
+        return [dict(c) for page_choices in self.choices_by_page.values() for c in page_choices]
+
+
+def get_story_version(story_id):
+    """(version, start_page_id) of a story readers can see, or None"""
+    row = db.session.execute(
+        db.select(Story.version, Story.start_page_id)
+        .where(Story.id == story_id, Story.status != DELETING)
+    ).first()
+    return tuple(row) if row is not None else None
+
+
+def get_story_graph(story_id, version=None):
+    """Return the compiled graph of a story at its current version, from the cache when possible
+
+    The version is read with one primary key lookup unless the caller
+    already has it, so writes committed by other workers, jobs and
+    commands are seen on the next read like writes of this process.
+    """
+    if version is None:
+        current = get_story_version(story_id)
+        if current is None:
+            return None
+        version = current[0]
+
+    graph = graph_cache.get(story_id, version)
+    if graph is not None:
+        return graph
+
+    pages, choices_by_page = load_story_graph(story_id)
+    # Read last: if it still has the version read above, no write
+    # committed in between and the pages and choices all belong to it
+    story = db.session.get(Story, story_id, populate_existing=True)
+    # A story waiting for its delete job is already gone for readers
+    if story is None or story.status == DELETING:
+        return None
+
+    graph = StoryGraph(story, pages, choices_by_page)
+    if story.version == version:
+        graph_cache.put(graph)
+    return graph
+
+
+def get_page_graph(page_id):
+    """Return the graph holding a page, without touching the database on a warm cache"""
+    story_id = graph_cache.story_for_page(page_id)
+    if story_id is None:
+        story_id = db.session.query(Page.story_id).filter(Page.id == page_id).scalar()
+        if story_id is None:
+            return None
+
+    graph = get_story_graph(story_id)
+    if graph is None or page_id not in graph.pages:
+        return None
+    return graph
+
+
+def get_choice_graph(choice_id):
+    """Return the graph holding a choice, without touching the database on a warm cache"""
+    story_id = graph_cache.story_for_choice(choice_id)
+    if story_id is None:
+        story_id = (
+            db.session.query(Page.story_id)
+            .join(Choice, Choice.from_page_id == Page.id)
+            .filter(Choice.id == choice_id)
+            .scalar()
+        )
+        if story_id is None:
+            return None
+
+    graph = get_story_graph(story_id)
+    if graph is None or choice_id not in graph.choices:
+        return None
+    return graph
@@ -0,0 +1,407 @@
+from collections import Counter
+
+from models import db, Story, Page, Choice
+from changes import record_many, STORY, PAGE, CHOICE, CREATE, UPDATE, DELETE
+
+OPERATIONS = ("create", "update", "delete")
+TYPES = ("page", "choice")
+PAGE_EDIT_FIELDS = ("page_key", "content", "is_start", "is_ending", "ending_label", "extradata")
+CHOICE_EDIT_FIELDS = ("choice_text", "choice_order", "time_change")
+MAX_OPERATIONS = 1000
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _text(column, nullable=False):
+    """(check, description) of the strings that fit column"""
+    length = column.type.length
+
+    def check(value):
+        if value is None:
+            return nullable
+        return isinstance(value, str) and (length is None or len(value) <= length)
+
+    description = "a string" + (f" of at most {length} characters" if length else "")
+    return check, description + (" or null" if nullable else "")
+
+
+# Values the editable fields accept, checked before anything reaches the database
+FIELD_CHECKS = {
+    "page_key": _text(Page.page_key, nullable=True),
+    "content": _text(Page.content),
+    "is_start": (lambda value: isinstance(value, bool), "true or false"),
+    "is_ending": (lambda value: isinstance(value, bool), "true or false"),
+    "ending_label": _text(Page.ending_label, nullable=True),
+    "choice_text": _text(Choice.choice_text),
+    "choice_order": (_is_int, "an integer"),
+    "time_change": (_is_int, "an integer"),
+}
+
+
+class InvalidOperations(ValueError):
+    """A graph edit batch failed validation; errors lists every problem found"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class VersionConflict(Exception):
+    """The story changed after the snapshot the batch was validated against"""
+
+
+class GraphEdit:
+    """A batch of page and choice operations on one story
+
+    Operations are validated together against a snapshot of the story
+    graph, with no queries, and applied in a single transaction. Pages
+    created in the batch get a "ref" that later operations use through
+    from_page_ref / to_page_ref in place of from_page_id / to_page_id.
+    Deleting a page also deletes the choices leading to and from it.
+    """
+
+    def __init__(self, graph, operations):
+        self.graph = graph
+        self.story_id = graph.story_id
+        self.version = graph.story["version"]
+        self.errors = []
+
+        self.page_creates = []      # (index, ref, row)
+        self.page_updates = {}      # page id -> changed columns
+        self.page_deletes = set()
+        self.choice_creates = []    # (index, row with from/to page targets)
+        self.choice_updates = {}    # choice id -> changed columns, to_page_id may be a target
+        self.choice_deletes = set()
+        self.refs = {}              # ref -> position in page_creates
+        self.results = {}           # operation index -> id of the created row
+
+        if not isinstance(operations, list) or not operations:
+            raise InvalidOperations(["operations must be a non-empty list"])
+        if len(operations) > MAX_OPERATIONS:
+            raise InvalidOperations([f"at most {MAX_OPERATIONS} operations per request"])
+
+        for index, operation in enumerate(operations):
+            self._check(index, operation)
+        if not self.errors:
+            self._check_final_state()
+        if self.errors:
+            raise InvalidOperations(self.errors[:20])
+
+    # -- validation --
+
+    def _error(self, index, message):
+        self.errors.append(f"operations[{index}]: {message}")
+
+    def _check(self, index, operation):
+        if not isinstance(operation, dict):
+            return self._error(index, "must be an object")
+        op, kind = operation.get("op"), operation.get("type")
+        if op not in OPERATIONS:
+            return self._error(index, f"op must be one of {', '.join(OPERATIONS)}")
+        if kind not in TYPES:
+            return self._error(index, f"type must be one of {', '.join(TYPES)}")
+        data = operation.get("data", {})
+        if not isinstance(data, dict):
+            return self._error(index, "data must be an object")
+        getattr(self, f"_{op}_{kind}")(index, operation, data)
+
+    def _unknown_fields(self, index, data, allowed):
+        unknown = sorted(set(data) - set(allowed))
+        if unknown:
+            self._error(index, f"unknown fields {', '.join(unknown)}")
+        return bool(unknown)
+
+    def _bad_values(self, index, data):
+        bad = False
+        for field, value in data.items():
+            check, description = FIELD_CHECKS.get(field, (None, None))
+            if check is not None and not check(value):
+                self._error(index, f"{field} must be {description}")
+                bad = True
+        return bad
+
+    def _is_id(self, index, value, name):
+        # Checked before any lookup: a JSON list or object cannot be a dict key
+        if not isinstance(value, int) or isinstance(value, bool):
+            self._error(index, f"{name} must be an integer")
+            return False
+        return True
+
+    def _live_page(self, index, page_id, name="id"):
+        if not self._is_id(index, page_id, name):
+            return False
+        if page_id not in self.graph.pages:
+            self._error(index, f"page {page_id} is not part of story {self.story_id}")
+            return False
+        if page_id in self.page_deletes:
+            self._error(index, f"page {page_id} is deleted earlier in the batch")
+            return False
+        return True
+
+    def _live_choice(self, index, choice_id):
+        if not self._is_id(index, choice_id, "id"):
+            return False
+        if choice_id not in self.graph.choices:
+            self._error(index, f"choice {choice_id} is not part of story {self.story_id}")
+            return False
+        if choice_id in self.choice_deletes:
+            self._error(index, f"choice {choice_id} is deleted earlier in the batch")
+            return False
+        if self.graph.choices[choice_id]["from_page_id"] in self.page_deletes:
+            self._error(index, f"choice {choice_id} belongs to a page deleted earlier in the batch")
+            return False
+        return True
+
+    def _page_target(self, index, data, name):
+        """("id", page id) or ("ref", ref) for the page data points at through name"""
+        if f"{name}_ref" in data:
+            ref = data[f"{name}_ref"]
+            if not isinstance(ref, str):
+                self._error(index, f"{name}_ref must be a string")
+                return None
+            if ref not in self.refs:
+                self._error(index, f"{name}_ref '{ref}' matches no page created earlier in the batch")
+                return None
+            return ("ref", ref)
+        if f"{name}_id" not in data:
+            self._error(index, f"{name}_id or {name}_ref is required")
+            return None
+        page_id = data[f"{name}_id"]
+        if not self._live_page(index, page_id, f"{name}_id"):
+            return None
+        return ("id", page_id)
+
+    def _create_page(self, index, operation, data):
+        if self._unknown_fields(index, data, PAGE_EDIT_FIELDS) or self._bad_values(index, data):
+            return
+        if not data.get("content"):
+            return self._error(index, "content is required")
+        ref = operation.get("ref")
+        if ref is not None:
+            if not isinstance(ref, str) or ref in self.refs:
+                return self._error(index, "ref must be a string unique within the batch")
+            self.refs[ref] = len(self.page_creates)
+        row = {
+            "page_key": data.get("page_key"),
+            "content": data["content"],
+            "is_start": data.get("is_start", False),
+            "is_ending": data.get("is_ending", False),
+            "ending_label": data.get("ending_label"),
+            "extradata": data.get("extradata"),
+        }
+        self.page_creates.append((index, ref, row))
+
+    def _update_page(self, index, operation, data):
+        page_id = operation.get("id")
+        if self._unknown_fields(index, data, PAGE_EDIT_FIELDS) or self._bad_values(index, data):
+            return
+        if not self._live_page(index, page_id):
+            return
+        if "content" in data and not data["content"]:
+            return self._error(index, "content cannot be empty")
+        if "page_key" in data and not data["page_key"]:
+            return self._error(index, "page_key cannot be empty")
+        self.page_updates.setdefault(page_id, {}).update(data)
+
+    def _delete_page(self, index, operation, data):
+        page_id = operation.get("id")
+        if self._live_page(index, page_id):
+            self.page_deletes.add(page_id)
+            self.page_updates.pop(page_id, None)
+
+    def _create_choice(self, index, operation, data):
+        allowed = CHOICE_EDIT_FIELDS + ("from_page_id", "from_page_ref", "to_page_id", "to_page_ref")
+        if self._unknown_fields(index, data, allowed) or self._bad_values(index, data):
+            return
+        if not data.get("choice_text"):
+            return self._error(index, "choice_text is required")
+        from_page = self._page_target(index, data, "from_page")
+        to_page = self._page_target(index, data, "to_page")
+        if from_page is None or to_page is None:
+            return
+        row = {
+            "from_page_id": from_page,
+            "to_page_id": to_page,
+            "choice_text": data["choice_text"],
+            "choice_order": data.get("choice_order", 0),
+            "time_change": data.get("time_change", 0),
+        }
+        self.choice_creates.append((index, row))
+
+    def _update_choice(self, index, operation, data):
+        choice_id = operation.get("id")
+        allowed = CHOICE_EDIT_FIELDS + ("to_page_id", "to_page_ref")
+        if self._unknown_fields(index, data, allowed) or self._bad_values(index, data):
+            return
+        if not self._live_choice(index, choice_id):
+            return
+        if "choice_text" in data and not data["choice_text"]:
+            return self._error(index, "choice_text cannot be empty")
+        changes = {key: data[key] for key in CHOICE_EDIT_FIELDS if key in data}
+        if "to_page_id" in data or "to_page_ref" in data:
+            target = self._page_target(index, data, "to_page")
+            if target is None:
+                return
+            changes["to_page_id"] = target
+        self.choice_updates.setdefault(choice_id, {}).update(changes)
+
+    def _delete_choice(self, index, operation, data):
+        choice_id = operation.get("id")
+        if self._live_choice(index, choice_id):
+            self.choice_deletes.add(choice_id)
+            self.choice_updates.pop(choice_id, None)
+
+    def _check_final_state(self):
+        def deleted(target):
+            return target[0] == "id" and target[1] in self.page_deletes
+
+        # Pages deleted after a choice was pointed at them
+        for choice_id, changes in self.choice_updates.items():
+            if "to_page_id" in changes and deleted(changes["to_page_id"]):
+                self.errors.append(f"choice {choice_id} is retargeted to a page deleted in the batch")
+        for index, row in self.choice_creates:
+            for name in ("from_page_id", "to_page_id"):
+                if deleted(row[name]):
+                    self._error(index, f"{name} points at a page deleted in the batch")
+
+        # page_key must stay unique for every key the batch introduces
+        final_keys = {
+            page_id: self.page_updates.get(page_id, {}).get("page_key", page["page_key"])
+            for page_id, page in self.graph.pages.items()
+            if page_id not in self.page_deletes
+        }
+        key_counts = Counter(final_keys.values())
+        for page_id, changes in self.page_updates.items():
+            if "page_key" in changes and key_counts[changes["page_key"]] > 1:
+                self.errors.append(f"page_key '{changes['page_key']}' is already used")
+        taken = set(key_counts)
+        for index, _, row in self.page_creates:
+            if row["page_key"] is None:
+                continue
+            if row["page_key"] in taken:
+                self._error(index, f"page_key '{row['page_key']}' is already used")
+            taken.add(row["page_key"])
+
+        # Default keys for new pages, page_<n> like POST /stories/<id>/pages
+        number = len(final_keys)
+        for _, _, row in self.page_creates:
+            number += 1
+            if row["page_key"] is None:
+                while f"page_{number}" in taken:
+                    number += 1
+                row["page_key"] = f"page_{number}"
+                taken.add(row["page_key"])
+
+    # -- application --
+
+    def _stats_delta(self, choice_deletes):
+        """Story.stats_delta for the batch, worked out from the snapshot alone"""
+        pages = self.graph.pages
+        endings = sum(1 for _, _, row in self.page_creates if row["is_ending"])
+        endings -= sum(1 for page_id in self.page_deletes if pages[page_id]["is_ending"])
+        endings += sum(
+            int(bool(changes["is_ending"])) - int(bool(pages[page_id]["is_ending"]))
+            for page_id, changes in self.page_updates.items() if "is_ending" in changes
+        )
+        reshaped = bool(
+            self.page_creates or self.page_deletes or self.choice_creates or choice_deletes
+            or any("to_page_id" in changes for changes in self.choice_updates.values())
+        )
+        return Story.stats_delta(
+            pages=len(self.page_creates) - len(self.page_deletes),
+            endings=endings,
+            choices=len(self.choice_creates) - len(choice_deletes),
+            reshaped=reshaped,
+        )
+
+    def apply(self):
+        """Write the batch in the current transaction; the caller commits
+
+        Raises VersionConflict when another write reached the story after
+        the snapshot was taken. Returns the new story version.
+        """
+        # Choices leading to or from deleted pages go with them, unless retargeted
+        choice_deletes = set(self.choice_deletes)
+        for choice_id, choice in self.graph.choices.items():
+            if choice["from_page_id"] in self.page_deletes:
+                choice_deletes.add(choice_id)
+            elif choice["to_page_id"] in self.page_deletes and "to_page_id" not in self.choice_updates.get(choice_id, {}):
+                choice_deletes.add(choice_id)
+
+        # Bumping first takes the story row lock, so the batch and any
+        # concurrent write to this story are serialized
+        bumped = db.session.execute(
+            db.update(Story)
+            .where(Story.id == self.story_id, Story.version == self.version)
+            .values(version=Story.version + 1, **self._stats_delta(choice_deletes))
+        )
+        if bumped.rowcount != 1:
+            raise VersionConflict(self.story_id)
+
+        results = {}
+        new_pages = [Page(story_id=self.story_id, **row) for _, _, row in self.page_creates]
+        if new_pages:
+            db.session.add_all(new_pages)
+            db.session.flush()
+        for (index, _, _), page in zip(self.page_creates, new_pages):
+            results[index] = page.id
+
+        def page_id(target):
+            kind, value = target
+            return new_pages[self.refs[value]].id if kind == "ref" else value
+
+        if choice_deletes:
+            db.session.execute(db.delete(Choice).where(Choice.id.in_(sorted(choice_deletes))))
+        if self.page_deletes:
+            db.session.execute(db.delete(Page).where(Page.id.in_(sorted(self.page_deletes))))
+
+        if self.page_updates:
+            db.session.execute(
+                db.update(Page),
+                [dict(changes, id=pid) for pid, changes in self.page_updates.items()]
+            )
+        choice_updates = [
+            dict(changes, id=cid, **(
+                {"to_page_id": page_id(changes["to_page_id"])} if "to_page_id" in changes else {}
+            ))
+            for cid, changes in self.choice_updates.items()
+            if cid not in choice_deletes
+        ]
+        if choice_updates:
+            db.session.execute(db.update(Choice), choice_updates)
+
+        new_choices = [
+            Choice(**dict(row, from_page_id=page_id(row["from_page_id"]), to_page_id=page_id(row["to_page_id"])))
+            for _, row in self.choice_creates
+        ]
+        if new_choices:
+            db.session.add_all(new_choices)
+            db.session.flush()
+        for (index, _), choice in zip(self.choice_creates, new_choices):
+            results[index] = choice.id
+
+        start_page_id = self.graph.story["start_page_id"]
+        if start_page_id in self.page_deletes:
+            start_page_id = None
+        if start_page_id is None and new_pages:
+            start_page_id = new_pages[0].id
+        if start_page_id != self.graph.story["start_page_id"]:
+            db.session.execute(
+                db.update(Story).where(Story.id == self.story_id).values(start_page_id=start_page_id)
+            )
+
+        story_id = self.story_id
+        record_many(
+            [(story_id, PAGE, page.id, CREATE) for page in new_pages]
+            + [(story_id, PAGE, pid, UPDATE) for pid in self.page_updates]
+            + [(story_id, PAGE, pid, DELETE) for pid in sorted(self.page_deletes)]
+            + [(story_id, CHOICE, choice.id, CREATE) for choice in new_choices]
+            + [(story_id, CHOICE, row["id"], UPDATE) for row in choice_updates]
+            + [(story_id, CHOICE, cid, DELETE) for cid in sorted(choice_deletes)]
+            + ([(story_id, STORY, story_id, UPDATE)] if start_page_id != self.graph.story["start_page_id"] else [])
+        )
+
+        self.results = results
+        return self.version + 1
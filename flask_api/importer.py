@@ -0,0 +1,294 @@
+from models import db, Story, Page, Choice, DELETING, MODERATION_STATUSES
+from tags import parse_tags, set_story_tags
+from changes import record, record_select, STORY, PAGE, CHOICE, CREATE, UPDATE, DELETE
+from snapshots import publish_story, PUBLISHED
+from analysis import StoryAdjacency
+from stats import refresh_story_stats, max_depth
+
+# Validation problems reported per document before giving up
+MAX_ERRORS = 20
+
+
+class InvalidStory(ValueError):
+    """A story document failed validation; errors lists every problem found"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def _is_text(value):
+    return isinstance(value, str) and value.strip() != ""
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _check_text(errors, where, value, column, required=False):
+    """Append an error unless value is a string fitting column, or absent when optional"""
+    if required and not _is_text(value):
+        errors.append(f"{where} is required" if value is None or isinstance(value, str) else f"{where} must be a string")
+    elif value is not None and not isinstance(value, str):
+        errors.append(f"{where} must be a string")
+    elif value is not None and column.type.length is not None and len(value) > column.type.length:
+        errors.append(f"{where} must be at most {column.type.length} characters")
+
+
+def _check_optional(errors, where, value, check, kind):
+    if value is not None and not check(value):
+        errors.append(f"{where} must be {kind}")
+
+
+def validate_story(data):
+    """Check a story document in the shape of stories/mohith_python_exam.json
+
+    Pages are identified by their page_key and choices point at pages
+    through next_page_key. Raises InvalidStory listing the problems.
+    """
+    errors = []
+    if not isinstance(data, dict):
+        raise InvalidStory(["story must be a JSON object"])
+    _check_text(errors, "title", data.get("title"), Story.title, required=True)
+    _check_text(errors, "description", data.get("description"), Story.description)
+    _check_text(errors, "author_name", data.get("author_name"), Story.author_name)
+    _check_optional(errors, "author_id", data.get("author_id"), _is_int, "an integer")
+    if "status" in data and data["status"] not in MODERATION_STATUSES:
+        errors.append(f"status must be one of {', '.join(MODERATION_STATUSES)}")
+    tags = data.get("tags")
+    if tags is not None and not (
+        isinstance(tags, str) or isinstance(tags, list) and all(isinstance(tag, str) for tag in tags)
+    ):
+        errors.append("tags must be a string or a list of strings")
+    elif len(",".join(parse_tags(tags))) > Story.tags.type.length:
+        errors.append(f"tags must be at most {Story.tags.type.length} characters together")
+
+    pages = data.get("pages", [])
+    if not isinstance(pages, list):
+        raise InvalidStory(errors + ["pages must be a list"])
+
+    keys = set()
+    for idx, page in enumerate(pages):
+        if not isinstance(page, dict):
+            errors.append(f"pages[{idx}] must be an object")
+            continue
+        key = page.get("page_key")
+        if not _is_text(key):
+            errors.append(f"pages[{idx}].page_key is required")
+        elif len(key) > Page.page_key.type.length:
+            errors.append(f"pages[{idx}].page_key must be at most {Page.page_key.type.length} characters")
+        elif key in keys:
+            errors.append(f"pages[{idx}].page_key '{key}' is duplicated")
+        else:
+            keys.add(key)
+        if not _is_text(page.get("content")):
+            errors.append(f"pages[{idx}].content is required")
+        for flag in ("is_start", "is_ending"):
+            _check_optional(errors, f"pages[{idx}].{flag}", page.get(flag), lambda v: isinstance(v, bool), "true or false")
+        _check_text(errors, f"pages[{idx}].ending_label", page.get("ending_label"), Page.ending_label)
+
+    for idx, page in enumerate(pages):
+        if not isinstance(page, dict):
+            continue
+        choices = page.get("choices", [])
+        if not isinstance(choices, list):
+            errors.append(f"pages[{idx}].choices must be a list")
+            continue
+        for c_idx, choice in enumerate(choices):
+            where = f"pages[{idx}].choices[{c_idx}]"
+            if not isinstance(choice, dict):
+                errors.append(f"{where} must be an object")
+                continue
+            _check_text(errors, f"{where}.choice_text", choice.get("choice_text"), Choice.choice_text, required=True)
+            for field in ("choice_order", "time_change"):
+                _check_optional(errors, f"{where}.{field}", choice.get(field), _is_int, "an integer")
+            next_page_key = choice.get("next_page_key")
+            if not isinstance(next_page_key, str) or next_page_key not in keys:
+                errors.append(f"{where}.next_page_key '{next_page_key}' matches no page")
+
+    if sum(1 for page in pages if isinstance(page, dict) and page.get("is_start")) > 1:
+        errors.append("only one page can have is_start")
+
+    if errors:
+        raise InvalidStory(errors[:MAX_ERRORS])
+
+
+def page_row(story_id, page):
+    return {
+        "story_id": story_id,
+        "page_key": page["page_key"],
+        "content": page["content"],
+        "is_start": bool(page.get("is_start", False)),
+        "is_ending": bool(page.get("is_ending", False)),
+        "ending_label": page.get("ending_label"),
+        "extradata": page.get("extradata"),
+    }
+
+
+def choice_rows(pages, page_ids):
+    """Choice rows of every page, with next_page_key resolved through page_ids"""
+    return [
+        {
+            "from_page_id": page_ids[page["page_key"]],
+            "to_page_id": page_ids[choice["next_page_key"]],
+            "choice_text": choice["choice_text"],
+            "choice_order": choice.get("choice_order", order),
+            "time_change": choice.get("time_change", 0),
+        }
+        for page in pages
+        for order, choice in enumerate(page.get("choices", []))
+    ]
+
+
+def choices_from(page_ids):
+    """(story_id, choice id) of the choices leaving page_ids, for record_select"""
+    return (
+        db.select(Page.story_id, Choice.id)
+        .join(Page, Choice.from_page_id == Page.id)
+        .where(Choice.from_page_id.in_(list(page_ids)))
+        .order_by(Choice.id)
+    )
+
+
+def document_max_depth(pages, page_ids, start_page_id):
+    """max_depth of a newly imported story, from the document instead of the database"""
+    adjacency = StoryAdjacency(
+        sorted(page_ids.values()), [False] * len(page_ids),
+        [(choice["from_page_id"], choice["to_page_id"], 0) for choice in choice_rows(pages, page_ids)],
+    )
+    return max_depth(adjacency, start_page_id)
+
+
+def insert_pages(story_id, pages):
+    """Bulk insert pages and their choices, returning {page_key: page id}"""
+    if not pages:
+        return {}
+
+    # One multi-row INSERT ... RETURNING instead of a round trip per page
+    rows = db.session.execute(
+        db.insert(Page).returning(Page.page_key, Page.id),
+        [page_row(story_id, page) for page in pages]
+    )
+    page_ids = dict(rows.all())
+
+    choices = choice_rows(pages, page_ids)
+    if choices:
+        db.session.execute(db.insert(Choice), choices)
+    return page_ids
+
+
+def start_page_key(pages):
+    """Key of the page marked is_start, or of the first page"""
+    for page in pages:
+        if page.get("is_start"):
+            return page["page_key"]
+    return pages[0]["page_key"] if pages else None
+
+
+def import_story(data):
+    """Insert a validated story document in the current transaction
+
+    Returns (story, {page_key: page id}); the caller commits.
+    """
+    pages = data.get("pages", [])
+    tag_names = parse_tags(data.get("tags"))
+    story = Story(
+        title=data["title"],
+        description=data.get("description", ""),
+        author_name=data.get("author_name", "Anonymous"),
+        author_id=data.get("author_id"),
+        status=data.get("status", "published"),
+        tags=",".join(tag_names),
+        page_count=len(pages),
+        ending_count=sum(1 for page in pages if page.get("is_ending")),
+        choice_count=sum(len(page.get("choices", [])) for page in pages)
+    )
+    db.session.add(story)
+    db.session.flush()
+    set_story_tags(story.id, tag_names)
+
+    page_ids = insert_pages(story.id, pages)
+    if pages:
+        story.start_page_id = page_ids[start_page_key(pages)]
+        story.max_depth = document_max_depth(pages, page_ids, story.start_page_id)
+    record(story.id, STORY, CREATE)
+    record(story.id, PAGE, CREATE, *page_ids.values())
+    record_select(CHOICE, CREATE, choices_from(page_ids.values()))
+    if story.status == PUBLISHED:
+        publish_story(story.id)
+    return story, page_ids
+
+
+def update_story(story, data):
+    """Bring an existing story in line with a validated document, matching pages by page_key
+
+    Pages missing from the document are kept, since play sessions may
+    still point at them. Choices of the pages in the document are replaced.
+    Returns {page_key: page id} for the pages of the document.
+    """
+    pages = data.get("pages", [])
+    tag_names = parse_tags(data.get("tags"))
+    story.description = data.get("description", story.description)
+    story.author_name = data.get("author_name", story.author_name)
+    story.author_id = data.get("author_id", story.author_id)
+    story.status = data.get("status", story.status)
+    story.tags = ",".join(tag_names)
+    set_story_tags(story.id, tag_names)
+
+    existing = dict(
+        db.session.query(Page.page_key, Page.id)
+        .filter(Page.story_id == story.id, Page.page_key.in_([p["page_key"] for p in pages]))
+        .all()
+    ) if pages else {}
+
+    updates = [
+        dict(page_row(story.id, page), id=existing[page["page_key"]])
+        for page in pages if page["page_key"] in existing
+    ]
+    if updates:
+        # Bulk UPDATE by primary key, one executemany for all pages
+        db.session.execute(db.update(Page), updates)
+        record_select(CHOICE, DELETE, choices_from(existing.values()))
+        db.session.execute(
+            db.delete(Choice).where(Choice.from_page_id.in_(list(existing.values())))
+        )
+
+    new_pages = [page for page in pages if page["page_key"] not in existing]
+    page_ids = dict(existing)
+    if new_pages:
+        rows = db.session.execute(
+            db.insert(Page).returning(Page.page_key, Page.id),
+            [page_row(story.id, page) for page in new_pages]
+        )
+        page_ids.update(rows.all())
+
+    choices = choice_rows(pages, page_ids)
+    if choices:
+        db.session.execute(db.insert(Choice), choices)
+    if pages:
+        story.start_page_id = page_ids[start_page_key(pages)]
+    refresh_story_stats(story.id)
+    Story.bump_version(story.id)
+    record(story.id, STORY, UPDATE)
+    record(story.id, PAGE, UPDATE, *existing.values())
+    record(story.id, PAGE, CREATE, *[page_ids[page["page_key"]] for page in new_pages])
+    # Every choice of the document's pages was inserted above
+    record_select(CHOICE, CREATE, choices_from(page_ids.values()))
+    if story.status == PUBLISHED:
+        publish_story(story.id)
+    return page_ids
+
+
+def upsert_story(data):
+    """Update the story with the same title, or import it when there is none
+
+    Returns (story, {page_key: page id}, created); the caller commits.
+    """
+    story = (
+        Story.query.filter(Story.title == data["title"], Story.status != DELETING)
+        .order_by(Story.id).first()
+    )
+    if story is None:
+        story, page_ids = import_story(data)
+        return story, page_ids, True
+    return story, update_story(story, data), False
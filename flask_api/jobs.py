@@ -0,0 +1,120 @@
+import traceback
+from datetime import timedelta
+
+from flask import current_app
+
+from models import db, Job, utcnow
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+# Job kind -> handler(ctx, **params), filled by @handler in tasks.py
+HANDLERS = {}
+
+
+class UnknownJob(ValueError):
+    pass
+
+
+def handler(kind):
+    """Register fn(ctx, **params) as the handler of a job kind"""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, **params):
+    """Add a job to the queue in the current transaction; the caller commits"""
+    if kind not in HANDLERS:
+        raise UnknownJob(kind)
+    job = Job(kind=kind, status=QUEUED, params=params)
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+
+class JobContext:
+    """Handed to a handler so it can report progress while it runs"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def progress(self, done, total=None):
+        """Record progress and commit the work done so far with it
+
+        Handlers call this at the points where their partial work is
+        safe to keep, so a reader polling /jobs/<id> never sees progress
+        that a crash would roll back.
+        """
+        values = {"progress": done, "updated_at": utcnow()}
+        if total is not None:
+            values["total"] = total
+        db.session.execute(db.update(Job).where(Job.id == self.job_id).values(**values))
+        db.session.commit()
+
+
+def requeue_stale():
+    """Put running jobs whose worker stopped reporting back in the queue
+
+    Jobs that already used up JOB_MAX_ATTEMPTS are failed instead.
+    Returns the number of jobs touched.
+    """
+    deadline = utcnow() - timedelta(seconds=current_app.config["JOB_TIMEOUT"])
+    stale = (Job.status == RUNNING) & (Job.updated_at < deadline)
+    max_attempts = current_app.config["JOB_MAX_ATTEMPTS"]
+
+    failed = db.session.execute(
+        db.update(Job).where(stale, Job.attempts >= max_attempts)
+        .values(status=FAILED, error="worker timed out", finished_at=utcnow())
+    ).rowcount
+    requeued = db.session.execute(
+        db.update(Job).where(stale).values(status=QUEUED)
+    ).rowcount
+    db.session.commit()
+    return failed + requeued
+
+
+def claim_next():
+    """Atomically take the oldest queued job, or return None
+
+    The UPDATE is conditional on the job still being queued, so two
+    workers racing for the same row cannot both win it. On PostgreSQL
+    SKIP LOCKED also lets them pick different rows without waiting.
+    """
+    while True:
+        job_id = db.session.execute(
+            db.select(Job.id).where(Job.status == QUEUED)
+            .order_by(Job.id).limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+
+        now = utcnow()
+        claimed = db.session.execute(
+            db.update(Job).where(Job.id == job_id, Job.status == QUEUED)
+            .values(status=RUNNING, attempts=Job.attempts + 1, started_at=now, updated_at=now)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+
+
+def run_job(job):
+    """Run a claimed job to completion and record its outcome"""
+    job_id, kind, params = job.id, job.kind, job.params or {}
+    try:
+        result = HANDLERS[kind](JobContext(job_id), **params)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("job %s (%s) failed", job_id, kind)
+        values = {"status": FAILED, "error": traceback.format_exc(limit=5)}
+    else:
+        values = {"status": SUCCEEDED, "result": result}
+    now = utcnow()
+    db.session.execute(
+        db.update(Job).where(Job.id == job_id).values(finished_at=now, updated_at=now, **values)
+    )
+    db.session.commit()
+    return values["status"]
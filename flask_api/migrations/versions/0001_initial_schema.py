@@ -0,0 +1,66 @@
+"""initial schema
+
+The story, page and choice tables exactly as db.create_all() made them
+before migrations existed. A database created that way is brought under
+migrations with `flask --app app db stamp 0001`; the later revisions
+add everything since.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 17:16:13.852427
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('story',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('tags', sa.String(length=500), nullable=True),
+    sa.Column('author_name', sa.String(length=100), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('start_page_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('page',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('story_id', sa.Integer(), nullable=False),
+    sa.Column('page_key', sa.String(length=100), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('is_start', sa.Boolean(), nullable=True),
+    sa.Column('is_ending', sa.Boolean(), nullable=True),
+    sa.Column('ending_label', sa.String(length=100), nullable=True),
+    sa.Column('page_number', sa.Integer(), nullable=True),
+    sa.Column('extradata', sa.JSON(), nullable=True),
+    sa.ForeignKeyConstraint(['story_id'], ['story.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('choice',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('from_page_id', sa.Integer(), nullable=False),
+    sa.Column('to_page_id', sa.Integer(), nullable=False),
+    sa.Column('choice_text', sa.String(length=500), nullable=False),
+    sa.Column('choice_order', sa.Integer(), nullable=True),
+    sa.Column('time_change', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['from_page_id'], ['page.id'], ),
+    sa.ForeignKeyConstraint(['to_page_id'], ['page.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('choice')
+    op.drop_table('page')
+    op.drop_table('story')
@@ -0,0 +1,33 @@
+"""story version
+
+The version every write to a story increments, behind ETags and
+conditional GETs. Existing stories start at 1: the column is added as
+nullable, filled in, then made NOT NULL with a server default.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 17:16:20.419523
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('story') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=True))
+    op.execute("UPDATE story SET version = 1 WHERE version IS NULL")
+    with op.batch_alter_table('story') as batch_op:
+        batch_op.alter_column('version', existing_type=sa.Integer(), existing_server_default='1', nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('story') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,33 @@
+"""story search index
+
+GIN index of the weighted full-text document of a story
+(models.SEARCH_VECTOR). PostgreSQL only; SQLite searches in process.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 17:16:23.323531
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE INDEX ix_story_search ON story USING gin (("
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')))"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX ix_story_search")
@@ -0,0 +1,43 @@
+"""tags
+
+Tag names and the story_tag links between stories and tags. The links
+of existing stories are built from their comma separated Story.tags
+with `flask --app app backfill-tags`.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 17:16:26.310687
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tag',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('story_tag',
+    sa.Column('story_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['story_id'], ['story.id'], ),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ),
+    sa.PrimaryKeyConstraint('story_id', 'tag_id')
+    )
+    op.create_index('ix_story_tag_tag_id', 'story_tag', ['tag_id', 'story_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_story_tag_tag_id', table_name='story_tag')
+    op.drop_table('story_tag')
+    op.drop_table('tag')
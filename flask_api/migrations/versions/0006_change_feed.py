@@ -0,0 +1,35 @@
+"""change feed
+
+The change table behind GET /changes, one row per story, page or
+choice write. The feed starts empty.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 17:16:32.255528
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change',
+    sa.Column('seq', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('story_id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=10), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(length=10), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('seq')
+    )
+
+
+def downgrade():
+    op.drop_table('change')
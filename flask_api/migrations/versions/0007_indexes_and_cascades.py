@@ -0,0 +1,79 @@
+"""indexes and cascades
+
+Composite indexes for the hot reads: pages of a story, choices of a
+page and choices leading to a page, and the keyset pages of GET
+/stories. Foreign keys of pages, choices and tag links also cascade
+deletes from their story, page or tag.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 17:16:37.507026
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# table -> [(column, referenced column)] of the foreign keys given ON DELETE CASCADE
+CASCADES = {
+    'page': [('story_id', 'story.id')],
+    'choice': [('from_page_id', 'page.id'), ('to_page_id', 'page.id')],
+    'story_tag': [('story_id', 'story.id'), ('tag_id', 'tag.id')],
+}
+
+INDEXES = [
+    ('ix_page_story_id_id', 'page', ['story_id', 'id']),
+    ('ix_choice_from_page_id_order', 'choice', ['from_page_id', 'choice_order', 'id']),
+    ('ix_choice_to_page_id', 'choice', ['to_page_id']),
+    ('ix_story_created_at_id', 'story', ['created_at', 'id']),
+    ('ix_story_status_created_at_id', 'story', ['status', 'created_at', 'id']),
+    ('ix_story_author_id_created_at_id', 'story', ['author_id', 'created_at', 'id']),
+]
+
+
+def set_ondelete(table, foreign_keys, ondelete):
+    """Redefine the foreign keys of table with the given ON DELETE action"""
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # SQLite cannot alter constraints, and its foreign keys are unnamed:
+        # rebuild the table with the columns redeclared
+        primary_key = table == 'story_tag'
+        columns = [
+            sa.Column(column, sa.Integer(), sa.ForeignKey(target, ondelete=ondelete),
+                      nullable=False, primary_key=primary_key)
+            for column, target in foreign_keys
+        ]
+        with op.batch_alter_table(table, recreate='always', reflect_args=columns):
+            pass
+        return
+
+    existing = {
+        tuple(fk['constrained_columns']): fk['name']
+        for fk in sa.inspect(bind).get_foreign_keys(table)
+    }
+    for column, target in foreign_keys:
+        name = existing.get((column,)) or f'{table}_{column}_fkey'
+        referred_table, referred_column = target.split('.')
+        if (column,) in existing:
+            op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referred_table, [column], [referred_column], ondelete=ondelete)
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+    for table, foreign_keys in CASCADES.items():
+        set_ondelete(table, foreign_keys, 'CASCADE')
+
+
+def downgrade():
+    for table, foreign_keys in CASCADES.items():
+        set_ondelete(table, foreign_keys, None)
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,42 @@
+"""story snapshots
+
+Frozen copies of published stories, served under versioned URLs with
+immutable cache headers, and the version of each story's current one.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 19:02:11.214380
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('story') as batch_op:
+        batch_op.add_column(sa.Column('published_version', sa.Integer(), nullable=True))
+
+    op.create_table('story_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('story_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('start_page_id', sa.Integer(), nullable=True),
+    sa.Column('document', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['story_id'], ['story.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('story_id', 'version', name='uq_story_snapshot_story_id_version')
+    )
+
+
+def downgrade():
+    op.drop_table('story_snapshot')
+    with op.batch_alter_table('story') as batch_op:
+        batch_op.drop_column('published_version')
@@ -0,0 +1,44 @@
+"""story stats
+
+Page, ending and choice counts and max depth stored on each story,
+kept up to date by every write. Counts are filled in here; max_depth
+is left to `flask repair-story-stats`.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 20:41:53.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+COUNTS = ('page_count', 'ending_count', 'choice_count')
+
+
+def upgrade():
+    with op.batch_alter_table('story') as batch_op:
+        for column in COUNTS:
+            batch_op.add_column(sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('max_depth', sa.Integer(), nullable=True))
+
+    op.execute(
+        "UPDATE story SET "
+        "page_count = (SELECT count(*) FROM page WHERE page.story_id = story.id), "
+        "ending_count = (SELECT count(*) FROM page WHERE page.story_id = story.id AND page.is_ending), "
+        "choice_count = (SELECT count(*) FROM choice JOIN page ON choice.from_page_id = page.id "
+        "WHERE page.story_id = story.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('story') as batch_op:
+        batch_op.drop_column('max_depth')
+        for column in reversed(COUNTS):
+            batch_op.drop_column(column)
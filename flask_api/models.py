@@ -1,6 +1,24 @@
+from datetime import datetime, timezone
+
 from flask_sqlalchemy import SQLAlchemy
+# Registers the typed to_tsvector()/to_tsquery() constructs used by SEARCH_VECTOR
+import sqlalchemy.dialects.postgresql  # noqa: F401
+
+from replicas import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def utcnow():
+    # Set client-side so the value round-trips exactly as a pagination cursor
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Status of a story whose delete job is queued; reads treat it as gone
+DELETING = "deleting"
+# Statuses clients may set; only DELETE /stories/<id> moves a story to DELETING
+MODERATION_STATUSES = ("published", "draft", "suspended")
 
-db = SQLAlchemy()
 
 class Story(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -11,7 +29,51 @@ class Story(db.Model):
     author_id = db.Column(db.Integer, nullable=True)
     status = db.Column(db.String(20), default="published")
     start_page_id = db.Column(db.Integer, nullable=True)
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    created_at = db.Column(db.DateTime, default=utcnow, server_default=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    # Version of the snapshot readers are served, see snapshots.py
+    published_version = db.Column(db.Integer, nullable=True)
+    # Kept up to date by every write, see bump_version; max_depth is None
+    # after a change of shape until `flask repair-story-stats` fills it in
+    page_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    ending_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    choice_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    max_depth = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        # Keyset pages of GET /stories, unfiltered, by status and by author
+        db.Index("ix_story_created_at_id", "created_at", "id"),
+        db.Index("ix_story_status_created_at_id", "status", "created_at", "id"),
+        db.Index("ix_story_author_id_created_at_id", "author_id", "created_at", "id"),
+    )
+
+    @staticmethod
+    def bump_version(story_id, pages=0, endings=0, choices=0, reshaped=False):
+        """Increment a story's version in the current transaction
+
+        pages, endings and choices are added to the stored counts in the
+        same UPDATE; reshaped (choices or the start page changed) clears
+        max_depth.
+        """
+        db.session.execute(
+            db.update(Story).where(Story.id == story_id).values(
+                version=Story.version + 1, **Story.stats_delta(pages, endings, choices, reshaped)
+            )
+        )
+
+    @staticmethod
+    def stats_delta(pages=0, endings=0, choices=0, reshaped=False):
+        """UPDATE values adjusting the stored statistics of a story"""
+        values = {}
+        if pages:
+            values["page_count"] = Story.page_count + pages
+        if endings:
+            values["ending_count"] = Story.ending_count + endings
+        if choices:
+            values["choice_count"] = Story.choice_count + choices
+        if reshaped:
+            values["max_depth"] = None
+        return values
 
     def to_dict(self):
         return {
@@ -23,13 +85,54 @@ class Story(db.Model):
             "author_id": self.author_id, 
             "status": self.status,
             "start_page_id": self.start_page_id,
-            "created_at": self.created_at.isoformat() if self.created_at else None
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "version": self.version,
+            "published_version": self.published_version,
+            "page_count": self.page_count,
+            "ending_count": self.ending_count,
+            "choice_count": self.choice_count,
+            "max_depth": self.max_depth
+        }
+
+
+story_tag = db.Table(
+    "story_tag",
+    db.Column("story_id", db.Integer, db.ForeignKey("story.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("tag_id", db.Integer, db.ForeignKey("tag.id", ondelete="CASCADE"), primary_key=True),
+    # The primary key serves lookups by story; this one serves lookups by tag
+    db.Index("ix_story_tag_tag_id", "tag_id", "story_id"),
+)
+
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name
         }
 
 
+# Weighted full-text document of a story. Queries must use this exact
+# expression for Postgres to pick the GIN index below.
+SEARCH_CONFIG = db.literal("english")
+SEARCH_VECTOR = db.func.setweight(
+    db.func.to_tsvector(SEARCH_CONFIG, db.func.coalesce(Story.title, db.literal(""))),
+    db.literal("A")
+).op("||")(
+    db.func.setweight(
+        db.func.to_tsvector(SEARCH_CONFIG, db.func.coalesce(Story.description, db.literal(""))),
+        db.literal("B")
+    )
+)
+db.Index("ix_story_search", SEARCH_VECTOR, postgresql_using="gin").ddl_if(dialect="postgresql")
+
+
 class Page(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    story_id = db.Column(db.Integer, db.ForeignKey("story.id"), nullable=False)
+    story_id = db.Column(db.Integer, db.ForeignKey("story.id", ondelete="CASCADE"), nullable=False)
     page_key = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
     is_start = db.Column(db.Boolean, default=False)
@@ -38,6 +141,11 @@ class Page(db.Model):
     page_number = db.Column(db.Integer)
     extradata = db.Column(db.JSON)
 
+    __table_args__ = (
+        # Pages of a story in id order, the shape every graph load asks for
+        db.Index("ix_page_story_id_id", "story_id", "id"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -54,12 +162,18 @@ class Page(db.Model):
 
 class Choice(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    from_page_id = db.Column(db.Integer, db.ForeignKey("page.id"), nullable=False)
-    to_page_id = db.Column(db.Integer, db.ForeignKey("page.id"), nullable=False)
+    from_page_id = db.Column(db.Integer, db.ForeignKey("page.id", ondelete="CASCADE"), nullable=False)
+    to_page_id = db.Column(db.Integer, db.ForeignKey("page.id", ondelete="CASCADE"), nullable=False)
     choice_text = db.Column(db.String(500), nullable=False)
     choice_order = db.Column(db.Integer, default=0)
     time_change = db.Column(db.Integer, default=0)
 
+    __table_args__ = (
+        # Choices of a page in display order, and the choices leading to a page
+        db.Index("ix_choice_from_page_id_order", "from_page_id", "choice_order", "id"),
+        db.Index("ix_choice_to_page_id", "to_page_id"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -68,4 +182,79 @@ class Choice(db.Model):
             "choice_text": self.choice_text,
             "choice_order": self.choice_order,
             "time_change": self.time_change
-        }
\ No newline at end of file
+        }
+
+
+class StorySnapshot(db.Model):
+    """Frozen, never modified copy of a story graph as it was published"""
+    id = db.Column(db.Integer, primary_key=True)
+    story_id = db.Column(db.Integer, db.ForeignKey("story.id", ondelete="CASCADE"), nullable=False)
+    # Story.version at the time of publishing
+    version = db.Column(db.Integer, nullable=False)
+    start_page_id = db.Column(db.Integer, nullable=True)
+    # {"story": ..., "pages": [...]} in the shape of GET /stories/<id>?include_pages=true
+    document = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint("story_id", "version", name="uq_story_snapshot_story_id_version"),
+    )
+
+
+class Job(db.Model):
+    """A unit of background work, queued by the API and run by worker.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    params = db.Column(db.JSON)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=True)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    # Bumped on every progress report; a running job that stops updating it is requeued
+    updated_at = db.Column(db.DateTime, default=utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Serves the worker's "oldest queued job" claim
+        db.Index("ix_job_status_id", "status", "id"),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "total": self.total,
+            "result": self.result,
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class Change(db.Model):
+    """One entry of the change feed, written in the transaction of the write it records"""
+    # Monotonic position in the feed; consumers resume from the last seq they saw
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    story_id = db.Column(db.Integer, nullable=False)
+    entity = db.Column(db.String(10), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)
+    changed_at = db.Column(db.DateTime, default=utcnow)
+
+    def to_dict(self):
+        return {
+            "seq": self.seq,
+            "story_id": self.story_id,
+            "type": self.entity,
+            "id": self.entity_id,
+            "op": self.op,
+            "changed_at": self.changed_at.isoformat() if self.changed_at else None
+        }
@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def parse_limit(raw):
+    """Clamp the ?limit= argument to [1, MAX_LIMIT]"""
+    if not raw:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def parse_ids(raw, max_count=MAX_LIMIT):
+    """Unique ids of a ?ids=1,2,3 argument, in request order"""
+    ids, seen = [], set()
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        value = int(part)
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    if len(ids) > max_count:
+        raise ValueError(f"at most {max_count} ids per request")
+    return ids
+
+
+def encode_cursor(*values):
+    """Opaque cursor holding the sort key of the last row of a page"""
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values
+
+
+def decode_story_cursor(cursor):
+    """(created_at, id) keyset position of a /stories cursor"""
+    values = decode_cursor(cursor)
+    try:
+        created_at, story_id = values
+        return datetime.fromisoformat(created_at), int(story_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
@@ -0,0 +1,142 @@
+import itertools
+import os
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import g, request, has_request_context
+from flask_sqlalchemy.session import Session
+
+READ_METHODS = ("GET", "HEAD")
+STICKY_COOKIE = "primary_until"
+
+
+class Replica:
+    def __init__(self, uri):
+        self.engine = sa.create_engine(uri, pool_pre_ping=True)
+        self.healthy = True
+        self.checked_at = 0.0
+
+    @property
+    def name(self):
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(sa.text("SELECT 1"))
+            self.healthy = True
+        except sa.exc.SQLAlchemyError:
+            self.healthy = False
+        self.checked_at = time.monotonic()
+        return self.healthy
+
+
+class ReplicaRouter:
+    """Sends the queries of GET requests to read replicas, round-robin
+
+    Writes, and every query of a client that wrote within the last
+    REPLICA_STICKY_SECONDS, go to the primary. A replica that fails a
+    query or a health check is skipped until it passes the next check.
+    Checks run every REPLICA_HEALTH_INTERVAL seconds in a background
+    thread, so no request waits on one. Without replicas configured
+    everything goes to the primary as before.
+    """
+
+    def __init__(self):
+        self.replicas = []
+        self.sticky_seconds = 5.0
+        self.health_interval = 10.0
+        self._lock = threading.Lock()
+        self._cycle = iter(())
+        self._monitor_pid = None
+
+    def init_app(self, app):
+        self.replicas = [Replica(uri) for uri in app.config.get("SQLALCHEMY_REPLICA_URIS", [])]
+        self.sticky_seconds = app.config.get("REPLICA_STICKY_SECONDS", self.sticky_seconds)
+        self.health_interval = app.config.get("REPLICA_HEALTH_INTERVAL", self.health_interval)
+        self._cycle = itertools.cycle(self.replicas)
+        app.extensions["replica_router"] = self
+        if self.replicas:
+            app.before_request(self._route_request)
+            app.after_request(self._stick_after_write)
+            app.teardown_request(self._check_failure)
+
+    def pick(self):
+        """Next healthy replica, or None to use the primary"""
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                replica = next(self._cycle)
+            if replica.healthy:
+                return replica
+        return None
+
+    def start_monitor(self):
+        """Health-check the replicas in a daemon thread of this process
+
+        Started by the first request of every process rather than by
+        init_app, since a thread does not survive the fork of a server
+        spawning its workers.
+        """
+        with self._lock:
+            if self._monitor_pid == os.getpid():
+                return
+            self._monitor_pid = os.getpid()
+        threading.Thread(target=self._monitor, name="replica-health", daemon=True).start()
+
+    def _monitor(self):
+        while True:
+            for replica in self.replicas:
+                replica.check()
+            time.sleep(self.health_interval)
+
+    def engine_for_request(self):
+        """Engine the current request reads from, or None for the primary"""
+        if not has_request_context():
+            return None
+        replica = g.get("replica")
+        return replica.engine if replica is not None else None
+
+    def _route_request(self):
+        if self._monitor_pid != os.getpid():
+            self.start_monitor()
+        if request.method not in READ_METHODS:
+            return
+        try:
+            sticky_until = float(request.cookies.get(STICKY_COOKIE, 0))
+        except ValueError:
+            sticky_until = 0
+        if sticky_until > time.time():
+            return
+        g.replica = self.pick()
+
+    def _stick_after_write(self, response):
+        if request.method not in READ_METHODS and response.status_code < 400:
+            # Read-your-writes: this client's next reads skip the replicas while they catch up
+            response.set_cookie(
+                STICKY_COOKIE, str(time.time() + self.sticky_seconds),
+                max_age=int(self.sticky_seconds) + 1, httponly=True
+            )
+        replica = g.get("replica")
+        response.headers["X-DB-Route"] = "replica" if replica is not None else "primary"
+        return response
+
+    def _check_failure(self, exc):
+        replica = g.get("replica")
+        if replica is not None and isinstance(exc, sa.exc.DBAPIError):
+            replica.healthy = False
+            replica.checked_at = time.monotonic()
+
+
+replica_router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """db.session that reads from the replica picked for the current request"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            engine = replica_router.engine_for_request()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -1,8 +1,32 @@
-from flask import Blueprint, jsonify, request, abort, current_app
-from models import db, Story, Page, Choice
+from flask import Blueprint, jsonify, request, abort, current_app, stream_with_context
+from models import db, Story, Page, Choice, Job, StorySnapshot, DELETING, MODERATION_STATUSES
+from graph import get_story_version, get_story_graph, get_page_graph, get_choice_graph, load_pages_projection
+from cache import graph_cache
+from etags import make_etag, conditional_json, conditional_stream, immutable_json
+from pagination import parse_limit, parse_ids, encode_cursor, decode_story_cursor, InvalidCursor
+from search import search_stories
+from tags import parse_tags, set_story_tags, filter_by_tags, tag_facets, TAG_MATCH_MODES
+from streaming import (
+    STREAM_FORMATS, NDJSON_MIMETYPE, iter_pages, iter_catalog, buffered, ndjson, story_json, story_ndjson
+)
+from importer import InvalidStory, validate_story, import_story
+from graph_edit import GraphEdit, InvalidOperations, VersionConflict
+from clone import clone_story
+from snapshots import publish_story, snapshot_cache, PUBLISHED
+from analysis import get_analysis, get_ending_stats, get_time_bounds
+from simulate import get_transitions, simulate, DEFAULT_WALKS, MAX_WALKS, DEFAULT_MAX_STEPS, MAX_BIAS
+from jobs import enqueue
+from tasks import mark_deleting
+from changes import record, record_many, changes_since, STORY, PAGE, CHOICE, CREATE, UPDATE, DELETE
+from fields import (
+    STORY_FIELDS, PAGE_FIELDS, InvalidFields, parse_fields, only_columns, row_to_dict, project
+)
 
 api = Blueprint("api", __name__)
 
+# Statuses PATCH /stories can set, and how many stories it takes at once
+MAX_BULK_IDS = 1000
+
 
 def require_api_key():
     """Check API key for write operations"""
@@ -17,62 +41,358 @@ def require_api_key():
     return None
 
 
+def wants_async():
+    """Whether the client asked for a heavy operation to run as a background job"""
+    return request.args.get("async", "").lower() in ["1", "true", "yes"]
+
+
+def job_accepted(job):
+    """202 pointing the client at the job it should poll"""
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return response
+
+
+def live_story_or_404(story_id):
+    """The story, unless it is missing or waiting for its delete job"""
+    story = db.session.get(Story, story_id)
+    if story is None or story.status == DELETING:
+        abort(404)
+    return story
+
+
+def live_page_or_404(page_id):
+    """The page, unless it is missing or its story is waiting for its delete job"""
+    return (
+        Page.query.join(Story, Story.id == Page.story_id)
+        .filter(Page.id == page_id, Story.status != DELETING)
+        .first_or_404()
+    )
+
+
 
 @api.route("/stories", methods=["GET"])
 def stories():
 
     status = request.args.get("status")
     search = request.args.get("search")
-    tags = request.args.get("tags")
+    tags = parse_tags(request.args.get("tags"))
+    tag_match = request.args.get("tag_match", "all")
+    author_id = request.args.get("author_id", type=int)
+    limit = parse_limit(request.args.get("limit"))
+    cursor = request.args.get("cursor")
+    try:
+        fields = parse_fields(request.args.get("fields"), STORY_FIELDS)
+    except InvalidFields as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Stories waiting for their delete job are already gone for readers
+    query = Story.query.filter(Story.status != DELETING)
     
-    query = Story.query
+    # Sparse fieldset: only select the requested columns, plus what paging and ETags need
+    if fields:
+        query = query.options(only_columns(Story, fields, "created_at", "version"))
+    
+    def serialize(story):
+        return story.to_dict() if fields is None else row_to_dict(story, fields)
+    
+    # Multi-get: ?ids=1,2,3 is answered with a single IN query
+    if request.args.get("ids") is not None:
+        try:
+            ids = parse_ids(request.args["ids"])
+        except ValueError as e:
+            return jsonify({"error": f"invalid ids: {e}"}), 400
+        
+        found = {s.id: s for s in query.filter(Story.id.in_(ids)).all()} if ids else {}
+        stories_list = [found[i] for i in ids if i in found]
+        etag = make_etag("stories", *[(s.id, s.version) for s in stories_list])
+        
+        return conditional_json(etag, lambda: {
+            "stories": [serialize(s) for s in stories_list],
+            "next_cursor": None
+        })
     
     if status:
         query = query.filter_by(status=status)
     
+    if author_id is not None:
+        query = query.filter_by(author_id=author_id)
+    
 
+    if tags:
+        if tag_match not in TAG_MATCH_MODES:
+            return jsonify({"error": f"tag_match must be one of {', '.join(TAG_MATCH_MODES)}"}), 400
+        query = filter_by_tags(query, tags, tag_match)
+    
+    # Full-text search returns results by relevance instead of by date
     if search:
-        like_pattern = f"%{search}%"
+        try:
+            stories_list, ranks, next_cursor = search_stories(query, search, limit, cursor)
+        except InvalidCursor:
+            return jsonify({"error": "invalid cursor"}), 400
+        
+        etag = make_etag("search", next_cursor, *[(s.id, s.version) for s in stories_list])
+        
+        def build():
+            result = []
+            for s in stories_list:
+                story_dict = serialize(s)
+                story_dict["rank"] = ranks[s.id]
+                result.append(story_dict)
+            return {"stories": result, "next_cursor": next_cursor}
+        
+        return conditional_json(etag, build)
+    
+    # Keyset pagination on (created_at, id): each page is an index range scan
+    if cursor:
+        try:
+            after_created_at, after_id = decode_story_cursor(cursor)
+        except InvalidCursor:
+            return jsonify({"error": "invalid cursor"}), 400
         query = query.filter(
             db.or_(
-                Story.title.ilike(like_pattern),
-                Story.description.ilike(like_pattern)
+                Story.created_at < after_created_at,
+                db.and_(Story.created_at == after_created_at, Story.id < after_id)
             )
         )
     
-
-    if tags:
-        tag_pattern = f"%{tags}%"
-        query = query.filter(Story.tags.ilike(tag_pattern))
+    rows = query.order_by(Story.created_at.desc(), Story.id.desc()).limit(limit + 1).all()
+    stories_list = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = stories_list[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    
+    etag = make_etag("stories", *[(s.id, s.version) for s in rows])
     
-    stories_list = query.order_by(Story.created_at.desc()).all()
-    return jsonify([s.to_dict() for s in stories_list])
+    return conditional_json(etag, lambda: {
+        "stories": [serialize(s) for s in stories_list],
+        "next_cursor": next_cursor
+    })
 
 
 @api.route("/stories/<int:story_id>", methods=["GET"])
 def get_story(story_id):
 
-    story = Story.query.get_or_404(story_id)
-    result = story.to_dict()
-    
-
     include_pages = request.args.get("include_pages", "").lower() in ["1", "true", "yes"]
+    try:
+        fields = parse_fields(request.args.get("fields"), STORY_FIELDS)
+        page_fields = parse_fields(request.args.get("page_fields"), PAGE_FIELDS)
+    except InvalidFields as e:
+        return jsonify({"error": str(e)}), 400
+    
+    stream = request.args.get("stream")
+    if stream is not None:
+        if stream not in STREAM_FORMATS:
+            return jsonify({"error": f"stream must be one of {', '.join(STREAM_FORMATS)}"}), 400
+        return stream_story(story_id, stream, include_pages, fields, page_fields)
     
-    if include_pages:
-        pages = Page.query.filter_by(story_id=story_id).order_by(Page.id).all()
-        result["pages"] = []
+    current = get_story_version(story_id)
+    if current is None:
+        abort(404)
+    version = current[0]
+    
+    # A projection on a cold cache selects only the requested columns
+    # instead of loading and caching the whole graph
+    graph = graph_cache.get(story_id, version)
+    if graph is None and (fields or (include_pages and page_fields)):
+        story = Story.query.options(only_columns(Story, fields or STORY_FIELDS, "version")).get_or_404(story_id)
+        etag = make_etag("story", story_id, story.version)
         
-        for idx, page in enumerate(pages, start=1):
-            page_dict = page.to_dict()
-            page_dict["page_number"] = idx  
-            
-            # Get choices for this page
-            choices = Choice.query.filter_by(from_page_id=page.id).order_by(Choice.choice_order).all()
-            page_dict["choices"] = [c.to_dict() for c in choices]
-            
-            result["pages"].append(page_dict)
+        def build():
+            result = row_to_dict(story, fields or STORY_FIELDS)
+            if include_pages:
+                result["pages"] = load_pages_projection(story_id, page_fields or PAGE_FIELDS)
+            return result
+        
+        return conditional_json(etag, build)
+    
+    graph = graph or get_story_graph(story_id, version)
+    if graph is None:
+        abort(404)
+    etag = make_etag("story", story_id, graph.story["version"])
+    
+    def build():
+        result = project(graph.story_dict(), fields)
+        if include_pages:
+            result["pages"] = [project(p, page_fields) for p in graph.pages_list()]
+        return result
+    
+    return conditional_json(etag, build)
+
+
+def stream_story(story_id, stream, include_pages, fields, page_fields):
+    """GET /stories/<id> written page by page straight from the database
+
+    Skips the graph cache so memory stays flat however large the story is.
+    """
+    story = (
+        Story.query.options(only_columns(Story, fields or STORY_FIELDS, "version"))
+        .filter(Story.id == story_id, Story.status != DELETING)
+        .first_or_404()
+    )
+    etag = make_etag("story", story_id, story.version)
+    story_dict = row_to_dict(story, fields or STORY_FIELDS)
+    
+    def generate():
+        pages = iter_pages(Page.story_id == story_id, page_fields) if include_pages else None
+        if stream == "ndjson":
+            return buffered(story_ndjson(story_dict, pages))
+        return buffered(story_json(story_dict, pages))
+    
+    mimetype = NDJSON_MIMETYPE if stream == "ndjson" else "application/json"
+    return conditional_stream(etag, generate, mimetype)
+
+
+@api.route("/export", methods=["GET"])
+def export_catalog():
+    """Every published story with its pages and choices, as NDJSON records"""
+    response = current_app.response_class(
+        stream_with_context(buffered(ndjson(iter_catalog()))),
+        mimetype=NDJSON_MIMETYPE
+    )
+    response.headers["Content-Disposition"] = "attachment; filename=catalog.ndjson"
+    return response
+
+
+@api.route("/stories/<int:story_id>/graph", methods=["GET"])
+def story_graph(story_id):
+
+    graph = get_story_graph(story_id)
+    if graph is None:
+        abort(404)
+    etag = make_etag("graph", story_id, graph.story["version"])
+
+    return conditional_json(etag, lambda: {
+        "story": graph.story_dict(),
+        "pages": list(graph.pages.values()),
+        "choices": graph.choices_list()
+    })
+
+
+@api.route("/stories/<int:story_id>/analysis", methods=["GET"])
+def story_analysis(story_id):
+    """Unreachable pages, dead ends, loops and depth of the story graph"""
+    current = get_story_version(story_id)
+    if current is None:
+        abort(404)
+    version, start_page_id = current
+    etag = make_etag("analysis", story_id, version)
+    
+    return conditional_json(etag, lambda: {
+        "story_id": story_id,
+        "version": version,
+        **get_analysis(story_id, version, start_page_id)
+    })
+
+
+@api.route("/stories/<int:story_id>/endings/stats", methods=["GET"])
+def story_ending_stats(story_id):
+    """How many routes lead to each ending, and the shortest and longest of them"""
+    current = get_story_version(story_id)
+    if current is None:
+        abort(404)
+    version, start_page_id = current
+    etag = make_etag("endings", story_id, version)
+    
+    return conditional_json(etag, lambda: {
+        "story_id": story_id,
+        "version": version,
+        **get_ending_stats(story_id, version, start_page_id)
+    })
+
+
+@api.route("/stories/<int:story_id>/timing", methods=["GET"])
+def story_timing(story_id):
+    """Least and most elapsed time at every page, ending and deadline"""
+    current = get_story_version(story_id)
+    if current is None:
+        abort(404)
+    version, start_page_id = current
+    etag = make_etag("timing", story_id, version)
+    
+    return conditional_json(etag, lambda: {
+        "story_id": story_id,
+        "version": version,
+        **get_time_bounds(story_id, version, start_page_id)
+    })
+
+
+@api.route("/stories/<int:story_id>/simulate", methods=["GET"])
+def simulate_story(story_id):
+    """Ending frequencies and story lengths over random playthroughs"""
+    walks = request.args.get("walks", DEFAULT_WALKS, type=int)
+    seed = request.args.get("seed", type=int)
+    bias = request.args.get("bias", 1.0, type=float)
+    max_steps = request.args.get("max_steps", DEFAULT_MAX_STEPS, type=int)
+    if not 1 <= walks <= MAX_WALKS:
+        return jsonify({"error": f"walks must be between 1 and {MAX_WALKS}"}), 400
+    if not 0 < bias <= MAX_BIAS:
+        return jsonify({"error": f"bias must be above 0 and at most {MAX_BIAS:g}"}), 400
+    if not 1 <= max_steps <= DEFAULT_MAX_STEPS:
+        return jsonify({"error": f"max_steps must be between 1 and {DEFAULT_MAX_STEPS}"}), 400
+    
+    current = get_story_version(story_id)
+    if current is None:
+        abort(404)
+    version, start_page_id = current
+    table = get_transitions(story_id, version, bias)
+    if start_page_id not in table.index:
+        return jsonify({"error": "Story has no start page"}), 409
+    
+    def build():
+        # Anyone can call this, so the CPU a request may take is capped
+        result = simulate(table, start_page_id, walks, seed, max_steps, table.step_budget)
+        return {"story_id": story_id, "version": version, "bias": bias, **result}
+    
+    # Only a seeded run is repeatable, and so worth revalidating
+    if seed is None:
+        return jsonify(build())
+    etag = make_etag("simulate", story_id, version, walks, seed, bias, max_steps)
+    return conditional_json(etag, build)
+
+
+@api.route("/stories/<int:story_id>/graph", methods=["PATCH"])
+def edit_story_graph(story_id):
+    """Apply a batch of page and choice operations in one transaction"""
+    auth_error = require_api_key()
+    if auth_error:
+        return auth_error
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "No data provided"}), 400
     
-    return jsonify(result)
+    graph = get_story_graph(story_id)
+    if graph is None:
+        abort(404)
+    
+    # Optional optimistic concurrency: the version the client edited
+    if "version" in data and data["version"] != graph.story["version"]:
+        return jsonify({"error": "Story has changed", "version": graph.story["version"]}), 409
+    
+    operations = data.get("operations")
+    try:
+        edit = GraphEdit(graph, operations)
+        version = edit.apply()
+    except InvalidOperations as e:
+        return jsonify({"error": "invalid operations", "details": e.errors}), 400
+    except VersionConflict:
+        db.session.rollback()
+        graph_cache.invalidate(story_id)
+        return jsonify({"error": "Story has changed, retry with its new version"}), 409
+    db.session.commit()
+    graph_cache.invalidate(story_id)
+    
+    return jsonify({
+        "story_id": story_id,
+        "version": version,
+        "results": [
+            {"op": op["op"], "type": op["type"], "id": edit.results.get(index, op.get("id"))}
+            for index, op in enumerate(operations)
+        ]
+    })
 
 
 @api.route("/stories", methods=["POST"])
@@ -84,20 +404,131 @@ def create_new_story():
     data = request.get_json()
     if not data or not data.get("title"):
         return jsonify({"error": "title is required"}), 400
+    if "status" in data and data["status"] not in MODERATION_STATUSES:
+        return jsonify({"error": f"status must be one of {', '.join(MODERATION_STATUSES)}"}), 400
     
+    tag_names = parse_tags(data.get("tags"))
     story = Story(
         title=data["title"],
         description=data.get("description", ""),
         author_name=data.get("author_name", "Anonymous"),
         author_id=data.get("author_id"),
         status=data.get("status", "published"),
-        tags=data.get("tags", "")
+        tags=",".join(tag_names)
     )
     db.session.add(story)
+    db.session.flush()
+    set_story_tags(story.id, tag_names)
+    record(story.id, STORY, CREATE)
+    if story.status == PUBLISHED:
+        publish_story(story.id)
     db.session.commit()
     return jsonify(story.to_dict()), 201
 
 
+@api.route("/stories", methods=["PATCH"])
+def moderate_stories():
+    """Set the status of many stories with one UPDATE"""
+    auth_error = require_api_key()
+    if auth_error:
+        return auth_error
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "No data provided"}), 400
+    
+    status = data.get("status")
+    if status not in MODERATION_STATUSES:
+        return jsonify({"error": f"status must be one of {', '.join(MODERATION_STATUSES)}"}), 400
+    
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({"error": "ids must be a list of story ids"}), 400
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BULK_IDS:
+        return jsonify({"error": f"at most {MAX_BULK_IDS} ids per request"}), 400
+    
+    # Stories waiting for their delete job are left alone
+    updated = db.session.execute(
+        db.update(Story)
+        .where(Story.id.in_(ids), Story.status != DELETING)
+        .values(status=status, version=Story.version + 1)
+        .returning(Story.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all() if ids else []
+    record_many((story_id, STORY, story_id, UPDATE) for story_id in updated)
+    # A story published for the first time needs a snapshot for readers to play
+    if status == PUBLISHED and updated:
+        unpublished = db.session.execute(
+            db.select(Story.id).where(Story.id.in_(updated), Story.published_version.is_(None))
+        ).scalars().all()
+        for story_id in unpublished:
+            publish_story(story_id)
+    db.session.commit()
+    for story_id in updated:
+        graph_cache.invalidate(story_id)
+    
+    updated = set(updated)
+    return jsonify({
+        "status": status,
+        "updated": [i for i in ids if i in updated],
+        "not_found": [i for i in ids if i not in updated]
+    })
+
+
+@api.route("/stories/import", methods=["POST"])
+def import_story_graph():
+    """Create a story with all of its pages and choices in one transaction"""
+    auth_error = require_api_key()
+    if auth_error:
+        return auth_error
+    
+    data = request.get_json(silent=True)
+    try:
+        validate_story(data)
+    except InvalidStory as e:
+        return jsonify({"error": "invalid story", "details": e.errors}), 400
+    
+    if wants_async():
+        job = enqueue("import_story", document=data)
+        db.session.commit()
+        return job_accepted(job)
+    
+    story, page_ids = import_story(data)
+    db.session.commit()
+    
+    return jsonify({
+        "story": story.to_dict(),
+        "page_ids": page_ids
+    }), 201
+
+
+@api.route("/stories/<int:story_id>/clone", methods=["POST"])
+def clone_existing_story(story_id):
+    """Fork a story with all its pages and choices, as a draft by default"""
+    auth_error = require_api_key()
+    if auth_error:
+        return auth_error
+    
+    source = live_story_or_404(story_id)
+    data = request.get_json(silent=True) or {}
+    overrides = {
+        key: data[key]
+        for key in ["title", "description", "author_name", "author_id", "status"]
+        if key in data
+    }
+    
+    if wants_async():
+        job = enqueue("clone_story", story_id=story_id, overrides=overrides)
+        db.session.commit()
+        return job_accepted(job)
+    
+    story = clone_story(source, **overrides)
+    db.session.commit()
+    
+    return jsonify(story.to_dict()), 201
+
+
 @api.route("/stories/<int:story_id>", methods=["PUT"])
 def edit_story(story_id):
     
@@ -105,63 +536,156 @@ def edit_story(story_id):
     if auth_error:
         return auth_error
     
-    story = Story.query.get_or_404(story_id)
+    story = live_story_or_404(story_id)
     data = request.get_json()
     if not data:
         return jsonify({"error": "No data provided"}), 400
+    # DELETING is only reached through DELETE, which also queues the job
+    if "status" in data and data["status"] not in MODERATION_STATUSES:
+        return jsonify({"error": f"status must be one of {', '.join(MODERATION_STATUSES)}"}), 400
     
-    
-    for key in ["title", "description", "author_name", "author_id", "status", "tags", "start_page_id"]:
+    for key in ["title", "description", "author_name", "author_id", "status", "start_page_id"]:
         if key in data:
             setattr(story, key, data[key])
     
+    if "tags" in data:
+        tag_names = parse_tags(data["tags"])
+        story.tags = ",".join(tag_names)
+        set_story_tags(story_id, tag_names)
+    
+    Story.bump_version(story_id, reshaped="start_page_id" in data)
+    record(story_id, STORY, UPDATE)
+    # Saving a story as published publishes its current draft
+    if data.get("status") == PUBLISHED:
+        publish_story(story_id)
     db.session.commit()
+    graph_cache.invalidate(story_id)
     return jsonify(story.to_dict())
 
 
-@api.route("/stories/<int:story_id>", methods=["DELETE"])
-def remove_story(story_id):
-    
+@api.route("/stories/<int:story_id>/publish", methods=["POST"])
+def publish(story_id):
+    """Freeze the story as it is now into the snapshot readers are served"""
     auth_error = require_api_key()
     if auth_error:
         return auth_error
     
-    story = Story.query.get_or_404(story_id)
+    story = live_story_or_404(story_id)
     
+    previous_version = story.published_version
+    snapshot = publish_story(story_id)
+    created = snapshot.version != previous_version
+    db.session.commit()
+    graph_cache.invalidate(story_id)
     
-    pages = Page.query.filter_by(story_id=story_id).all()
-    page_ids = [p.id for p in pages]
+    return jsonify({
+        "story_id": story_id,
+        "version": snapshot.version,
+        "url": f"/stories/{story_id}/snapshots/{snapshot.version}"
+    }), 201 if created else 200
+
+
+@api.route("/stories/<int:story_id>/published", methods=["GET"])
+def published_snapshot(story_id):
+    """Where the current snapshot of a story lives; readers pin its version"""
+    row = (
+        db.session.query(Story.status, Story.published_version, StorySnapshot.start_page_id)
+        .join(StorySnapshot, db.and_(
+            StorySnapshot.story_id == Story.id, StorySnapshot.version == Story.published_version
+        ))
+        .filter(Story.id == story_id, Story.status != DELETING)
+        .first()
+    )
+    if row is None:
+        abort(404)
+    status, version, start_page_id = row
+    etag = make_etag("published", story_id, version, status)
     
-   
-    if page_ids:
-        Choice.query.filter(Choice.from_page_id.in_(page_ids)).delete(synchronize_session=False)
+    response = conditional_json(etag, lambda: {
+        "story_id": story_id,
+        "status": status,
+        "version": version,
+        "start_page_id": start_page_id,
+        "url": f"/stories/{story_id}/snapshots/{version}"
+    })
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def visible_snapshot(story_id, version):
+    """Snapshot of a story that is not waiting for its delete job, or None
+
+    The snapshot itself never changes, but the story can go away, so
+    its status is checked with one primary key lookup on every read.
+    """
+    if get_story_version(story_id) is None:
+        return None
+    return snapshot_cache.get(story_id, version)
+
+
+@api.route("/stories/<int:story_id>/snapshots/<int:version>", methods=["GET"])
+def get_snapshot(story_id, version):
     
-   
-    Page.query.filter_by(story_id=story_id).delete(synchronize_session=False)
+    frozen = visible_snapshot(story_id, version)
+    if frozen is None:
+        abort(404)
+    return immutable_json(make_etag("snapshot", story_id, version), lambda: frozen.document)
+
+
+@api.route("/stories/<int:story_id>/snapshots/<int:version>/pages/<int:page_id>", methods=["GET"])
+def get_snapshot_page(story_id, version, page_id):
     
-   
-    db.session.delete(story)
-    db.session.commit()
+    frozen = visible_snapshot(story_id, version)
+    if frozen is None or page_id not in frozen.pages:
+        abort(404)
+    return immutable_json(make_etag("snapshot-page", story_id, version, page_id), lambda: frozen.pages[page_id])
+
+
+@api.route("/stories/<int:story_id>/snapshots/<int:version>/choices/<int:choice_id>", methods=["GET"])
+def follow_snapshot_choice(story_id, version, choice_id):
     
-    return jsonify({"message": "Story deleted", "deleted": True}), 200
+    frozen = visible_snapshot(story_id, version)
+    if frozen is None or choice_id not in frozen.choices:
+        abort(404)
+    to_page_id = frozen.choices[choice_id]["to_page_id"]
+    if to_page_id not in frozen.pages:
+        abort(404)
+    etag = make_etag("snapshot-choice", story_id, version, choice_id)
+    return immutable_json(etag, lambda: frozen.pages[to_page_id])
 
 
+@api.route("/stories/<int:story_id>", methods=["DELETE"])
+def remove_story(story_id):
+    """Hide the story at once and leave removing its rows to a background job"""
+    auth_error = require_api_key()
+    if auth_error:
+        return auth_error
+    
+    story = live_story_or_404(story_id)
+    mark_deleting(story)
+    job = enqueue("delete_story", story_id=story_id)
+    record(story_id, STORY, DELETE)
+    db.session.commit()
+    graph_cache.invalidate(story_id)
+    
+    return job_accepted(job)
+
 
 @api.route("/stories/<int:story_id>/start", methods=["GET"])
 def story_start(story_id):
    
-    story = Story.query.get_or_404(story_id)
+    graph = get_story_graph(story_id)
+    if graph is None:
+        abort(404)
     
-    if not story.start_page_id:
+    start_page_id = graph.story["start_page_id"]
+    if not start_page_id:
         return jsonify({"error": "start_page_id not set"}), 400
     
-    page = Page.query.get_or_404(story.start_page_id)
-    choices = Choice.query.filter_by(from_page_id=page.id).order_by(Choice.choice_order).all()
-    
-    page_dict = page.to_dict()
-    page_dict["choices"] = [c.to_dict() for c in choices]
+    if start_page_id not in graph.pages:
+        abort(404)
     
-    return jsonify({"page_id": page.id})
+    return jsonify({"page_id": start_page_id})
 
 
 @api.route("/stories/<int:story_id>/pages", methods=["POST"])
@@ -171,7 +695,7 @@ def add_page_to_story(story_id):
     if auth_error:
         return auth_error
     
-    story = Story.query.get_or_404(story_id)
+    story = live_story_or_404(story_id)
     data = request.get_json()
     if not data or not data.get("content"):
         return jsonify({"error": "content is required"}), 400
@@ -185,26 +709,101 @@ def add_page_to_story(story_id):
         ending_label=data.get("ending_label")
     )
     db.session.add(page)
-    db.session.commit()
+    db.session.flush()
     
     
+    record(story_id, PAGE, CREATE, page.id)
     if not story.start_page_id:
         story.start_page_id = page.id
-        db.session.commit()
+        # The new start page has no choices yet
+        story.max_depth = 0
+        record(story_id, STORY, UPDATE)
     
+    Story.bump_version(story_id, pages=1, endings=int(bool(page.is_ending)))
+    db.session.commit()
+    
+    graph_cache.invalidate(story_id)
     return jsonify(page.to_dict()), 201
 
 
+@api.route("/pages", methods=["GET"])
+def pages_bulk():
+    
+    try:
+        ids = parse_ids(request.args.get("ids", ""))
+        fields = parse_fields(request.args.get("fields"), PAGE_FIELDS)
+    except InvalidFields as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError as e:
+        return jsonify({"error": f"invalid ids: {e}"}), 400
+    
+    query = db.session.query(Page, Story.version).join(Story, Story.id == Page.story_id)
+    if fields:
+        query = query.options(only_columns(Page, fields, "story_id"))
+    rows = query.filter(Page.id.in_(ids), Story.status != DELETING).all() if ids else []
+    
+    found = {page.id: (page, version) for page, version in rows}
+    ordered = [found[i] for i in ids if i in found]
+    etag = make_etag("pages", *[(page.id, version) for page, version in ordered])
+    
+    def build():
+        result = [
+            page.to_dict() if fields is None else row_to_dict(page, fields)
+            for page, _ in ordered
+        ]
+        # Choices are opt-in and cost one more IN query for all pages together
+        if fields and "choices" in fields:
+            choices_by_page = {}
+            choices = (
+                Choice.query.filter(Choice.from_page_id.in_(list(found)))
+                .order_by(Choice.from_page_id, Choice.choice_order, Choice.id)
+                .all()
+            ) if found else []
+            for c in choices:
+                choices_by_page.setdefault(c.from_page_id, []).append(c.to_dict())
+            for page_dict in result:
+                page_dict["choices"] = choices_by_page.get(page_dict["id"], [])
+        return {"pages": result}
+    
+    return conditional_json(etag, build)
+
+
 @api.route("/pages/<int:page_id>", methods=["GET"])
 def get_page(page_id):
     
-    page = Page.query.get_or_404(page_id)
-    choices = Choice.query.filter_by(from_page_id=page.id).order_by(Choice.choice_order).all()
+    try:
+        fields = parse_fields(request.args.get("fields"), PAGE_FIELDS)
+    except InvalidFields as e:
+        return jsonify({"error": str(e)}), 400
     
-    page_dict = page.to_dict()
-    page_dict["choices"] = [c.to_dict() for c in choices]
+    if fields and graph_cache.story_for_page(page_id) is None:
+        row = (
+            db.session.query(Page, Story.version)
+            .join(Story, Story.id == Page.story_id)
+            .options(only_columns(Page, fields, "story_id"))
+            .filter(Page.id == page_id, Story.status != DELETING)
+            .first()
+        )
+        if row is None:
+            abort(404)
+        page, version = row
+        etag = make_etag("page", page_id, page.story_id, version)
+        
+        def build():
+            page_dict = row_to_dict(page, fields)
+            if "choices" in fields:
+                choices = Choice.query.filter_by(from_page_id=page_id).order_by(Choice.choice_order, Choice.id).all()
+                page_dict["choices"] = [c.to_dict() for c in choices]
+            return page_dict
+        
+        return conditional_json(etag, build)
+    
+    graph = get_page_graph(page_id)
+    if graph is None:
+        abort(404)
+    etag = make_etag("page", page_id, graph.story_id, graph.story["version"])
     
-    return jsonify(page_dict)
+    return conditional_json(etag, lambda: project(graph.page_with_choices(page_id), fields))
 
 
 @api.route("/pages/<int:page_id>", methods=["PUT"])
@@ -214,16 +813,21 @@ def edit_page(page_id):
     if auth_error:
         return auth_error
     
-    page = Page.query.get_or_404(page_id)
+    page = live_page_or_404(page_id)
     data = request.get_json()
     if not data:
         return jsonify({"error": "No data provided"}), 400
    
+    was_ending = bool(page.is_ending)
     for key in ["content", "is_start", "is_ending", "ending_label", "page_key"]:
         if key in data:
             setattr(page, key, data[key])
     
+    story_id = page.story_id
+    Story.bump_version(story_id, endings=int(bool(page.is_ending)) - int(was_ending))
+    record(story_id, PAGE, UPDATE, page_id)
     db.session.commit()
+    graph_cache.invalidate(story_id)
     return jsonify(page.to_dict())
 
 
@@ -234,18 +838,31 @@ def remove_page(page_id):
     if auth_error:
         return auth_error
     
-    page = Page.query.get_or_404(page_id)
+    page = live_page_or_404(page_id)
     
     
-    Choice.query.filter_by(from_page_id=page.id).delete(synchronize_session=False)
+    # Choices leading to the page go too, and are counted
+    choice_ids = db.session.execute(
+        db.delete(Choice).where((Choice.from_page_id == page.id) | (Choice.to_page_id == page.id))
+        .returning(Choice.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
     
+    story_id = page.story_id
+    record(story_id, CHOICE, DELETE, *choice_ids)
+    record(story_id, PAGE, DELETE, page_id)
     
     story = Story.query.get(page.story_id)
     if story and story.start_page_id == page.id:
         story.start_page_id = None
+        record(story_id, STORY, UPDATE)
     
     db.session.delete(page)
+    Story.bump_version(
+        story_id, pages=-1, endings=-int(bool(page.is_ending)), choices=-len(choice_ids), reshaped=True
+    )
     db.session.commit()
+    graph_cache.invalidate(story_id)
     
     return jsonify({"message": "Page deleted", "deleted": True}), 200
 
@@ -257,13 +874,13 @@ def add_choice_to_page(page_id):
     if auth_error:
         return auth_error
     
-    page = Page.query.get_or_404(page_id)
+    page = live_page_or_404(page_id)
     data = request.get_json()
     
     if not data or not data.get("to_page_id") or not data.get("choice_text"):
         return jsonify({"error": "to_page_id and choice_text required"}), 400
     
-    to_page = Page.query.get_or_404(data["to_page_id"])
+    to_page = live_page_or_404(data["to_page_id"])
     
     
     if page.story_id != to_page.story_id:
@@ -275,22 +892,52 @@ def add_choice_to_page(page_id):
         choice_text=data["choice_text"],
         choice_order=data.get("choice_order", 0)
     )
+    story_id = page.story_id
     db.session.add(choice)
+    db.session.flush()
+    record(story_id, CHOICE, CREATE, choice.id)
+    Story.bump_version(story_id, choices=1, reshaped=True)
     db.session.commit()
+    graph_cache.invalidate(story_id)
     return jsonify(choice.to_dict()), 201
 
 
+@api.route("/choices", methods=["GET"])
+def choices_bulk():
+    
+    try:
+        ids = parse_ids(request.args.get("ids", ""))
+    except ValueError as e:
+        return jsonify({"error": f"invalid ids: {e}"}), 400
+    
+    rows = (
+        db.session.query(Choice, Story.version)
+        .join(Page, Page.id == Choice.from_page_id)
+        .join(Story, Story.id == Page.story_id)
+        .filter(Choice.id.in_(ids), Story.status != DELETING)
+        .all()
+    ) if ids else []
+    
+    found = {choice.id: (choice, version) for choice, version in rows}
+    ordered = [found[i] for i in ids if i in found]
+    etag = make_etag("choices", *[(choice.id, version) for choice, version in ordered])
+    
+    return conditional_json(etag, lambda: {"choices": [choice.to_dict() for choice, _ in ordered]})
+
+
 @api.route("/choices/<int:choice_id>", methods=["GET"])
 def follow_choice(choice_id):
     
-    choice = Choice.query.get_or_404(choice_id)
-    page = Page.query.get_or_404(choice.to_page_id)
-    choices = Choice.query.filter_by(from_page_id=page.id).order_by(Choice.choice_order).all()
+    graph = get_choice_graph(choice_id)
+    if graph is None:
+        abort(404)
     
-    page_dict = page.to_dict()
-    page_dict["choices"] = [c.to_dict() for c in choices]
+    to_page_id = graph.choices[choice_id]["to_page_id"]
+    if to_page_id not in graph.pages:
+        abort(404)
+    etag = make_etag("choice", choice_id, graph.story_id, graph.story["version"])
     
-    return jsonify(page_dict)
+    return conditional_json(etag, lambda: graph.page_with_choices(to_page_id))
 
 
 @api.route("/choices/<int:choice_id>", methods=["PUT"])
@@ -305,19 +952,23 @@ def edit_choice(choice_id):
     if not data:
         return jsonify({"error": "No data provided"}), 400
     
+    from_page = live_page_or_404(choice.from_page_id)
    
     for key in ["choice_text", "choice_order", "to_page_id"]:
         if key in data:
             
             if key == "to_page_id":
-                to_page = Page.query.get_or_404(data[key])
-                from_page = Page.query.get(choice.from_page_id)
+                to_page = live_page_or_404(data[key])
                 if from_page.story_id != to_page.story_id:
                     return jsonify({"error": "Pages must belong to the same story"}), 400
             
             setattr(choice, key, data[key])
     
+    story_id = from_page.story_id
+    Story.bump_version(story_id, reshaped="to_page_id" in data)
+    record(story_id, CHOICE, UPDATE, choice_id)
     db.session.commit()
+    graph_cache.invalidate(story_id)
     return jsonify(choice.to_dict())
 
 
@@ -329,12 +980,51 @@ def remove_choice(choice_id):
         return auth_error
     
     choice = Choice.query.get_or_404(choice_id)
+    story_id = live_page_or_404(choice.from_page_id).story_id
     db.session.delete(choice)
+    Story.bump_version(story_id, choices=-1, reshaped=True)
+    record(story_id, CHOICE, DELETE, choice_id)
     db.session.commit()
+    graph_cache.invalidate(story_id)
     
     return jsonify({"message": "Choice deleted", "deleted": True}), 200
 
 
+@api.route("/tags", methods=["GET"])
+def tag_counts():
+
+    status = request.args.get("status")
+    limit = request.args.get("limit", type=int)
+    
+    return jsonify([
+        {"name": name, "count": count}
+        for name, count in tag_facets(status=status, limit=limit)
+    ])
+
+
+@api.route("/changes", methods=["GET"])
+def change_feed():
+    """Story, page and choice changes after ?since=<seq>, oldest first"""
+    since = request.args.get("since", 0, type=int)
+    limit = parse_limit(request.args.get("limit"))
+    
+    changes, has_more = changes_since(since, limit)
+    return jsonify({
+        "changes": [c.to_dict() for c in changes],
+        "last_seq": changes[-1].seq if changes else since,
+        "has_more": has_more
+    })
+
+
+@api.route("/jobs/<int:job_id>", methods=["GET"])
+def job_status(job_id):
+    
+    job = db.session.get(Job, job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict())
+
+
 @api.route("/health", methods=["GET"])
 def health():
     return jsonify({"status": "ok"})
\ No newline at end of file
@@ -0,0 +1,15 @@
+import os
+
+from flask_migrate import Migrate, upgrade
+
+from models import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# Alembic migrations of the story database, run with `flask --app app db upgrade`
+migrate = Migrate(db=db, directory=MIGRATIONS_DIR, render_as_batch=True)
+
+
+def upgrade_schema(revision="head"):
+    """Bring the database of the current app up to revision; never drops data"""
+    upgrade(directory=MIGRATIONS_DIR, revision=revision)
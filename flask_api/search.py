@@ -0,0 +1,232 @@
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from changes import STORY
+from models import db, Change, Story, DELETING, SEARCH_CONFIG, SEARCH_VECTOR
+from pagination import encode_cursor, decode_cursor, InvalidCursor
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or the to with".split())
+
+# Upper bound on the vocabulary terms a prefix expands to in the fallback index
+MAX_PREFIX_TERMS = 64
+CHUNK_SIZE = 500
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class InvertedIndex:
+    """In-process full-text index over story titles and descriptions
+
+    Used when the database has no native full-text search (SQLite in
+    development and tests). Scores are BM25 with title terms counted
+    twice, and the last query term matches as a prefix so the home page
+    can search as the user types. Writes from any process reach the index
+    through the change feed: before each search it re-reads the stories
+    with feed entries past the last seq it has seen.
+    """
+
+    k1 = 1.2
+    b = 0.75
+    title_weight = 2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.loaded = False
+        self._postings = defaultdict(dict)
+        self._terms = []
+        self._doc_terms = {}
+        self._doc_len = {}
+        self._total_len = 0
+        self.seq = 0
+
+    def load(self):
+        """Build the index from the story table, once per process"""
+        with self._lock:
+            if self.loaded:
+                return
+            # Read the feed position first, so a write racing the scan is replayed by catch_up
+            self.seq = db.session.query(db.func.coalesce(db.func.max(Change.seq), 0)).scalar()
+            rows = db.session.query(Story.id, Story.title, Story.description).yield_per(1000)
+            for story_id, title, description in rows:
+                self._add(story_id, title, description, keep_sorted=False)
+            self._terms = sorted(self._postings)
+            self.loaded = True
+
+    def catch_up(self):
+        """Re-index the stories with story entries in the change feed since the last call"""
+        with self._lock:
+            changed = (
+                db.session.query(Change.seq, Change.story_id)
+                .filter(Change.seq > self.seq, Change.entity == STORY)
+                .all()
+            )
+            if not changed:
+                return
+            story_ids = sorted({story_id for _, story_id in changed})
+            for start in range(0, len(story_ids), CHUNK_SIZE):
+                chunk = story_ids[start:start + CHUNK_SIZE]
+                rows = {
+                    row.id: row
+                    for row in db.session.query(Story.id, Story.title, Story.description, Story.status)
+                    .filter(Story.id.in_(chunk))
+                }
+                for story_id in chunk:
+                    self._remove(story_id)
+                    row = rows.get(story_id)
+                    if row is not None and row.status != DELETING:
+                        self._add(story_id, row.title, row.description)
+            self.seq = max(seq for seq, _ in changed)
+
+    def search(self, text):
+        """(story_id, score) pairs matching every query term, best match first"""
+        terms = tokenize(text)
+        if not terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_len) or 1
+            avg_len = self._total_len / n_docs or 1
+            scores = None
+
+            for position, term in enumerate(terms):
+                if position == len(terms) - 1:
+                    expanded = self._expand_prefix(term)
+                else:
+                    expanded = [term] if term in self._postings else []
+
+                term_scores = {}
+                for t in expanded:
+                    postings = self._postings[t]
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for story_id, tf in postings.items():
+                        norm = tf + self.k1 * (1 - self.b + self.b * self._doc_len[story_id] / avg_len)
+                        score = idf * tf * (self.k1 + 1) / norm
+                        if score > term_scores.get(story_id, 0):
+                            term_scores[story_id] = score
+
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {sid: s + term_scores[sid] for sid, s in scores.items() if sid in term_scores}
+                if not scores:
+                    return []
+
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+
+    def _expand_prefix(self, prefix):
+        start = bisect_left(self._terms, prefix)
+        expanded = []
+        for term in self._terms[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(prefix):
+                break
+            expanded.append(term)
+        return expanded
+
+    def _add(self, story_id, title, description, keep_sorted=True):
+        counts = defaultdict(int)
+        for term in tokenize(title):
+            counts[term] += self.title_weight
+        for term in tokenize(description):
+            counts[term] += 1
+
+        for term, tf in counts.items():
+            if keep_sorted and term not in self._postings:
+                insort(self._terms, term)
+            self._postings[term][story_id] = tf
+        self._doc_terms[story_id] = list(counts)
+        self._doc_len[story_id] = sum(counts.values())
+        self._total_len += self._doc_len[story_id]
+
+    def _remove(self, story_id):
+        for term in self._doc_terms.pop(story_id, []):
+            postings = self._postings[term]
+            postings.pop(story_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+        self._total_len -= self._doc_len.pop(story_id, 0)
+
+
+search_index = InvertedIndex()
+
+
+def uses_native_search():
+    return db.engine.dialect.name == "postgresql"
+
+
+def to_tsquery_text(text):
+    """AND of the search terms, with the last one matching as a prefix"""
+    terms = [t for t in TOKEN_RE.findall((text or "").lower())]
+    if not terms:
+        return None
+    terms[-1] += ":*"
+    return " & ".join(terms)
+
+
+def decode_search_cursor(cursor):
+    values = decode_cursor(cursor)
+    if len(values) != 2 or values[0] != "search" or not isinstance(values[1], int):
+        raise InvalidCursor(cursor)
+    return values[1]
+
+
+def search_stories(query, text, limit, cursor=None):
+    """Rank stories of query against text
+
+    Returns (stories, ranks, next_cursor) where ranks maps story id to
+    relevance. Ranked results cannot be keyset-paginated on created_at, so
+    the cursor holds a position in the ranked result instead.
+    """
+    position = decode_search_cursor(cursor) if cursor else 0
+
+    if uses_native_search():
+        tsquery_text = to_tsquery_text(text)
+        if tsquery_text is None:
+            return [], {}, None
+        tsquery = db.func.to_tsquery(SEARCH_CONFIG, tsquery_text)
+        rank = db.func.ts_rank_cd(SEARCH_VECTOR, tsquery)
+        rows = (
+            query.filter(SEARCH_VECTOR.op("@@")(tsquery))
+            .add_columns(rank.label("rank"))
+            .order_by(db.desc("rank"), Story.id.desc())
+            .offset(position)
+            .limit(limit + 1)
+            .all()
+        )
+        stories = [story for story, _ in rows[:limit]]
+        ranks = {story.id: float(r) for story, r in rows[:limit]}
+        next_cursor = encode_cursor("search", position + limit) if len(rows) > limit else None
+        return stories, ranks, next_cursor
+
+    search_index.load()
+    search_index.catch_up()
+    ranked = search_index.search(text)
+    ranked_ids = [story_id for story_id, _ in ranked]
+    ranks = dict(ranked)
+    total = len(ranked_ids)
+
+    # Apply the remaining SQL filters chunk by chunk in rank order until the page is full
+    stories = []
+    while position < total and len(stories) <= limit:
+        chunk = ranked_ids[position:position + CHUNK_SIZE]
+        found = {s.id: s for s in query.filter(Story.id.in_(chunk)).all()}
+        for offset, story_id in enumerate(chunk):
+            if story_id in found:
+                stories.append(found[story_id])
+                if len(stories) > limit:
+                    position += offset
+                    break
+        else:
+            position += len(chunk)
+
+    next_cursor = None
+    if len(stories) > limit:
+        stories = stories[:limit]
+        next_cursor = encode_cursor("search", position)
+    return stories, {s.id: ranks[s.id] for s in stories}, next_cursor
@@ -0,0 +1,144 @@
+import numpy as np
+
+from analysis import analysis_cache, get_adjacency
+
+DEFAULT_WALKS = 100_000
+MAX_WALKS = 1_000_000
+# Walks still going after this many choices are counted as unfinished (caught in a loop)
+DEFAULT_MAX_STEPS = 1000
+MAX_BIAS = 10.0
+# Cost units a request may spend; one walker moving one choice costs
+# 8 + log2(choices in the story), the price of its searchsorted. About a
+# second of CPU whatever the size of the story.
+WORK_BUDGET = 160_000_000
+
+
+class TransitionTable:
+    """Choice probabilities of a story as flat NumPy arrays, one entry per choice
+
+    Choices of page u sit at offsets[u]:offsets[u + 1] as in the CSR
+    adjacency. thresholds holds u plus the cumulative probability of
+    each choice of u, so thresholds is sorted across the whole story and
+    one searchsorted of u + r, with r uniform in [0, 1), picks a choice
+    for every walker at once, whatever page each one is on.
+
+    bias weights the choice at position k of a page by bias ** k: 1 is
+    a reader picking uniformly, below 1 one who favours the first
+    options, above 1 one who favours the last. Weights are scaled so the
+    heaviest choice of a page weighs 1, which cannot overflow however
+    many choices the page has.
+    """
+
+    def __init__(self, adjacency, bias=1.0):
+        n = len(adjacency)
+        offsets = np.asarray(adjacency.offsets, dtype=np.int64)
+        self.targets = np.asarray(adjacency.targets, dtype=np.int64)
+        self.page_ids = np.asarray(adjacency.page_ids, dtype=np.int64)
+        self.is_ending = np.frombuffer(bytes(adjacency.is_ending), dtype=np.bool_)
+        self.ending_labels = adjacency.ending_labels
+        self.index = adjacency.index
+
+        degree = np.diff(offsets)
+        source = np.repeat(np.arange(n, dtype=np.int64), degree)
+        position = np.arange(len(self.targets), dtype=np.int64) - offsets[source]
+        if bias > 1:
+            # Count from the last choice instead: bias ** (k - last) <= 1
+            position -= np.repeat(degree - 1, degree)
+        weight = np.power(float(bias), position.astype(np.float64))
+
+        cumulative = np.cumsum(weight)
+        # Restart the running sum at every page, then scale each page's to [0, 1]
+        before = np.concatenate(([0.0], cumulative))[offsets[:-1]]
+        cumulative -= np.repeat(before, degree)
+        totals = np.repeat(cumulative[offsets[1:][degree > 0] - 1], degree[degree > 0])
+        self.thresholds = source + cumulative / totals
+        # The last choice of each page must catch every r below 1
+        self.thresholds[offsets[1:][degree > 0] - 1] = np.flatnonzero(degree > 0) + 1.0
+
+        # Walks stop on endings and on dead ends
+        self.terminal = self.is_ending | (degree == 0)
+        # Walker moves that fit in WORK_BUDGET
+        self.step_budget = int(WORK_BUDGET / (8 + np.log2(len(self.targets) + 1)))
+
+    def step(self, pages, rng):
+        choices = np.searchsorted(self.thresholds, pages + rng.random(len(pages)), side="right")
+        return self.targets[choices]
+
+
+def get_transitions(story_id, version, bias):
+    return analysis_cache.get_or_compute(
+        (story_id, version, "transitions", bias),
+        lambda: TransitionTable(get_adjacency(story_id, version), bias),
+    )
+
+
+def simulate(table, start_page_id, walks=DEFAULT_WALKS, seed=None, max_steps=DEFAULT_MAX_STEPS,
+             step_budget=None):
+    """Random playthroughs from the start page, advanced together one choice at a time
+
+    Each round draws one random number per walker still going and moves
+    them all with array operations, so the Python loop runs once per
+    choice depth, not once per walker. The same seed gives the same
+    result. With a step_budget the run stops before the total number of
+    walker moves would exceed it; the walks still going then count as
+    unfinished and the result says it was truncated.
+    """
+    rng = np.random.default_rng(seed)
+    start = table.index.get(start_page_id)
+    if start is None:
+        return None
+
+    pages = np.full(walks, start, dtype=np.int64)
+    steps = np.zeros(walks, dtype=np.int64)
+    active = np.arange(walks, dtype=np.int64)
+    if table.terminal[start]:
+        active = active[:0]
+
+    spent = 0
+    truncated = False
+    for depth in range(1, max_steps + 1):
+        if not len(active):
+            break
+        spent += len(active)
+        if step_budget is not None and spent > step_budget:
+            truncated = True
+            break
+        moved = table.step(pages[active], rng)
+        pages[active] = moved
+        steps[active] = depth
+        active = active[~table.terminal[moved]]
+
+    finished = np.ones(walks, dtype=np.bool_)
+    finished[active] = False
+    landed = np.bincount(pages[finished], minlength=len(table.page_ids))
+    histogram = np.bincount(steps[finished])
+
+    def outcomes(mask):
+        return [
+            {
+                "page_id": int(table.page_ids[i]),
+                "ending_label": table.ending_labels.get(int(table.page_ids[i])),
+                "count": int(landed[i]),
+                "share": float(landed[i] / walks),
+            }
+            for i in np.flatnonzero(mask & (landed > 0))
+        ]
+
+    finished_steps = steps[finished]
+    return {
+        "walks": walks,
+        "seed": seed,
+        "max_steps": max_steps,
+        "finished": int(finished.sum()),
+        "unfinished": len(active),
+        "truncated": truncated,
+        "endings": sorted(outcomes(table.is_ending), key=lambda e: -e["count"]),
+        "dead_ends": sorted(outcomes(~table.is_ending), key=lambda e: -e["count"]),
+        "steps": {
+            "mean": float(finished_steps.mean()) if len(finished_steps) else None,
+            "min": int(finished_steps.min()) if len(finished_steps) else None,
+            "max": int(finished_steps.max()) if len(finished_steps) else None,
+            # histogram[k] walks finished after k choices
+            "histogram": histogram.tolist(),
+        },
+    }
@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+
+from models import db, Story, StorySnapshot
+from graph import load_story_graph, StoryGraph
+from changes import record, STORY, UPDATE
+
+PUBLISHED = "published"
+
+
+def publish_story(story_id):
+    """Freeze the current pages and choices of a story as its published snapshot
+
+    The story is marked published and moved to a new version, which
+    becomes both its published_version and the version of the snapshot.
+    Later edits change the live rows only; readers pinned to a snapshot
+    never see them until the story is published again. Publishing a
+    story with no changes since its last snapshot returns that snapshot.
+    The caller commits.
+    """
+    db.session.flush()
+    story = db.session.get(Story, story_id)
+    if story.status == PUBLISHED and story.published_version == story.version:
+        existing = get_snapshot_row(story_id, story.version)
+        if existing is not None:
+            return existing
+
+    # Both columns are set from the old version, so they end up equal
+    db.session.execute(
+        db.update(Story).where(Story.id == story_id).values(
+            status=PUBLISHED, version=Story.version + 1, published_version=Story.version + 1
+        )
+    )
+    db.session.refresh(story)
+
+    pages, choices_by_page = load_story_graph(story_id)
+    graph = StoryGraph(story, pages, choices_by_page)
+    snapshot = StorySnapshot(
+        story_id=story_id,
+        version=story.version,
+        start_page_id=story.start_page_id,
+        document={"story": graph.story_dict(), "pages": graph.pages_list()}
+    )
+    db.session.add(snapshot)
+    record(story_id, STORY, UPDATE)
+    return snapshot
+
+
+def get_snapshot_row(story_id, version):
+    return StorySnapshot.query.filter_by(story_id=story_id, version=version).first()
+
+
+class FrozenStory:
+    """Read-only view of a snapshot document with pages and choices by id"""
+
+    def __init__(self, snapshot):
+        self.story_id = snapshot.story_id
+        self.version = snapshot.version
+        self.document = snapshot.document
+        self.pages = {page["id"]: page for page in self.document["pages"]}
+        self.choices = {
+            choice["id"]: choice for page in self.document["pages"] for choice in page["choices"]
+        }
+
+
+class SnapshotCache:
+    """In-process LRU of frozen stories
+
+    Snapshots never change, so entries are never invalidated; they only
+    fall out of the cache when it is full.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def init_app(self, app):
+        self.maxsize = app.config.get("SNAPSHOT_CACHE_SIZE", self.maxsize)
+        app.extensions["story_snapshot_cache"] = self
+
+    def get(self, story_id, version):
+        key = (story_id, version)
+        with self._lock:
+            frozen = self._entries.get(key)
+            if frozen is not None:
+                self._entries.move_to_end(key)
+                return frozen
+
+        snapshot = get_snapshot_row(story_id, version)
+        if snapshot is None:
+            return None
+        frozen = FrozenStory(snapshot)
+        with self._lock:
+            self._entries[key] = frozen
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return frozen
+
+    def __len__(self):
+        return len(self._entries)
+
+
+snapshot_cache = SnapshotCache()
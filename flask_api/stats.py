@@ -0,0 +1,124 @@
+from itertools import groupby
+
+from models import db, Story, Page, Choice
+from analysis import StoryAdjacency, bfs_depths
+from changes import record_many, STORY, UPDATE
+
+# Rows fetched at a time while walking every story's graph for max_depth
+STREAM_BATCH_SIZE = 5000
+
+
+def count_story_stats(story_ids=None):
+    """{story id: (page_count, ending_count, choice_count)} from two grouped queries"""
+    pages = (
+        db.select(
+            Page.story_id,
+            db.func.count(Page.id),
+            db.func.sum(db.case((Page.is_ending.is_(True), 1), else_=0)),
+        )
+        .group_by(Page.story_id)
+    )
+    choices = (
+        db.select(Page.story_id, db.func.count(Choice.id))
+        .join(Page, Choice.from_page_id == Page.id)
+        .group_by(Page.story_id)
+    )
+    stories = db.select(Story.id)
+    if story_ids is not None:
+        pages = pages.where(Page.story_id.in_(story_ids))
+        choices = choices.where(Page.story_id.in_(story_ids))
+        stories = stories.where(Story.id.in_(story_ids))
+
+    counts = {story_id: (0, 0, 0) for story_id in db.session.execute(stories).scalars()}
+    for story_id, page_count, ending_count in db.session.execute(pages):
+        counts[story_id] = (page_count, ending_count or 0, 0)
+    for story_id, choice_count in db.session.execute(choices):
+        page_count, ending_count, _ = counts.get(story_id, (0, 0, 0))
+        counts[story_id] = (page_count, ending_count, choice_count)
+    return counts
+
+
+def refresh_story_stats(story_id):
+    """Recount a story after a write too irregular to track by deltas; the caller commits"""
+    page_count, ending_count, choice_count = count_story_stats([story_id]).get(story_id, (0, 0, 0))
+    db.session.execute(
+        db.update(Story).where(Story.id == story_id).values(
+            page_count=page_count, ending_count=ending_count, choice_count=choice_count, max_depth=None
+        )
+    )
+
+
+def max_depth(adjacency, start_page_id):
+    """Fewest choices to reach the farthest page from the start, None without a start page"""
+    start = adjacency.index.get(start_page_id)
+    return max(bfs_depths(adjacency, start)) if start is not None else None
+
+
+def story_depths():
+    """(story id, max_depth) of every story with pages, streaming its pages and choices once"""
+    start_pages = dict(db.session.execute(db.select(Story.id, Story.start_page_id)).all())
+    page_rows = db.session.execute(
+        db.select(Page.story_id, Page.id, Page.is_ending)
+        .order_by(Page.story_id, Page.id)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    choice_rows = db.session.execute(
+        db.select(Page.story_id, Choice.from_page_id, Choice.to_page_id, Choice.time_change)
+        .join(Page, Choice.from_page_id == Page.id)
+        .order_by(Page.story_id, Choice.from_page_id, Choice.choice_order, Choice.id)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+
+    # Both streams are sorted by story; walk them side by side
+    choice_groups = groupby(choice_rows, key=lambda row: row.story_id)
+    pending = next(choice_groups, None)
+    for story_id, pages in groupby(page_rows, key=lambda row: row.story_id):
+        pages = list(pages)
+        edges = []
+        while pending is not None and pending[0] <= story_id:
+            if pending[0] == story_id:
+                edges = [(row.from_page_id, row.to_page_id, row.time_change) for row in pending[1]]
+            pending = next(choice_groups, None)
+        adjacency = StoryAdjacency([p.id for p in pages], [bool(p.is_ending) for p in pages], edges)
+        yield story_id, max_depth(adjacency, start_pages.get(story_id))
+
+
+def repair_story_stats():
+    """Recompute the stored statistics of every story in bulk
+
+    Only stories whose stored values were wrong are written, and they
+    move to a new version so cached copies and ETags of them expire.
+    Returns (stories checked, stories repaired).
+    """
+    counts = count_story_stats()
+    depths = dict(story_depths())
+    stored = {
+        row.id: (row.page_count, row.ending_count, row.choice_count, row.max_depth)
+        for row in db.session.execute(
+            db.select(Story.id, Story.page_count, Story.ending_count, Story.choice_count, Story.max_depth)
+        )
+    }
+    rows = [
+        {
+            "b_id": story_id, "b_page_count": page_count, "b_ending_count": ending_count,
+            "b_choice_count": choice_count, "b_max_depth": depths.get(story_id),
+        }
+        for story_id, (page_count, ending_count, choice_count) in counts.items()
+        if stored.get(story_id) != (page_count, ending_count, choice_count, depths.get(story_id))
+    ]
+    if rows:
+        # One executemany for every repaired story
+        story = Story.__table__
+        db.session.execute(
+            db.update(story).where(story.c.id == db.bindparam("b_id")).values(
+                page_count=db.bindparam("b_page_count"),
+                ending_count=db.bindparam("b_ending_count"),
+                choice_count=db.bindparam("b_choice_count"),
+                max_depth=db.bindparam("b_max_depth"),
+                version=story.c.version + 1,
+            ),
+            rows,
+        )
+        record_many((row["b_id"], STORY, row["b_id"], UPDATE) for row in rows)
+    db.session.commit()
+    return len(counts), len(rows)
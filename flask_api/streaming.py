@@ -0,0 +1,123 @@
+from flask import current_app
+
+from models import db, Story, Page, Choice
+from fields import PAGE_FIELDS, only_columns, row_to_dict
+
+STREAM_FORMATS = ("json", "ndjson")
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Rows fetched per round trip from the server-side cursors
+YIELD_PER = 500
+# Bytes buffered before a chunk is handed to the WSGI server
+CHUNK_BYTES = 64 * 1024
+
+
+def iter_pages(page_filter, page_fields=None):
+    """Pages matching page_filter in the include_pages shape, one at a time
+
+    Pages and choices are read from two server-side cursors, both sorted
+    by (story_id, page id), and merged as they arrive so neither the rows
+    nor the serialized pages are ever held in memory all at once.
+    page_number restarts at 1 for every story.
+    """
+    fields = page_fields or PAGE_FIELDS
+    pages = (
+        Page.query.options(only_columns(Page, fields, "story_id"))
+        .filter(page_filter)
+        .order_by(Page.story_id, Page.id)
+        .yield_per(YIELD_PER)
+    )
+
+    with_choices = "choices" in fields
+    choices = iter(())
+    if with_choices:
+        choices = iter(
+            db.session.query(Choice, Page.story_id)
+            .join(Page, Choice.from_page_id == Page.id)
+            .filter(page_filter)
+            .order_by(Page.story_id, Choice.from_page_id, Choice.choice_order, Choice.id)
+            .yield_per(YIELD_PER)
+        )
+    pending = next(choices, None)
+
+    story_id, page_number = None, 0
+    for page in pages:
+        if page.story_id != story_id:
+            story_id, page_number = page.story_id, 0
+        page_number += 1
+
+        page_dict = row_to_dict(page, fields)
+        if "page_number" in fields:
+            page_dict["page_number"] = page_number
+        if with_choices:
+            key = (page.story_id, page.id)
+            page_dict["choices"] = []
+            while pending is not None and (pending[1], pending[0].from_page_id) <= key:
+                if (pending[1], pending[0].from_page_id) == key:
+                    page_dict["choices"].append(pending[0].to_dict())
+                pending = next(choices, None)
+        yield page_dict
+
+
+def iter_catalog(status="published"):
+    """("story", dict) and ("page", dict) records of every story with status
+
+    Each story record is followed by the records of its pages.
+    """
+    stories = Story.query.filter_by(status=status).order_by(Story.id).yield_per(YIELD_PER)
+    story_ids = db.select(Story.id).where(Story.status == status)
+    pages = iter_pages(Page.story_id.in_(story_ids))
+
+    pending = next(pages, None)
+    for story in stories:
+        yield "story", story.to_dict()
+        while pending is not None and pending["story_id"] <= story.id:
+            if pending["story_id"] == story.id:
+                yield "page", pending
+            pending = next(pages, None)
+
+
+def buffered(pieces):
+    """Join small string pieces into chunks of about CHUNK_BYTES"""
+    chunk, size = [], 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def story_json(story, pages=None):
+    """The include_pages JSON document, written one page at a time
+
+    The bytes match the buffered response: keys sorted with "pages" in
+    its sorted place among the story's keys, compact separators and a
+    trailing newline.
+    """
+    dumps = current_app.json.dumps_compact
+    if pages is None:
+        yield dumps(story) + "\n"
+        return
+
+    before = {key: value for key, value in story.items() if key < "pages"}
+    after = {key: value for key, value in story.items() if key > "pages"}
+    yield dumps(before)[:-1] + ("," if before else "") + '"pages":['
+    for idx, page in enumerate(pages):
+        yield ("," if idx else "") + dumps(page)
+    yield "]" + ("," + dumps(after)[1:] if after else "}") + "\n"
+
+
+def ndjson(records):
+    """One {"type": ..., "data": ...} JSON object per line"""
+    dumps = current_app.json.dumps
+    for record_type, data in records:
+        yield dumps({"type": record_type, "data": data}) + "\n"
+
+
+def story_ndjson(story, pages=None):
+    yield from ndjson([("story", story)])
+    if pages is not None:
+        yield from ndjson(("page", page) for page in pages)
@@ -0,0 +1,128 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Story, Tag, story_tag, DELETING
+
+TAG_MATCH_MODES = ("all", "any", "exact")
+BATCH_SIZE = 5000
+
+
+def parse_tags(raw):
+    """Normalized, de-duplicated tag names from a comma separated string or a list"""
+    if not raw:
+        return []
+    if isinstance(raw, str):
+        raw = raw.split(",")
+
+    names = []
+    for name in raw:
+        name = str(name).strip().lower()[:100]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def insert_ignore(table):
+    """INSERT that skips rows violating a unique constraint"""
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return table.insert().prefix_with("IGNORE")
+
+
+def tag_ids(names):
+    """Map of tag name to id, creating the missing tags"""
+    if not names:
+        return {}
+    db.session.execute(insert_ignore(Tag.__table__), [{"name": name} for name in names])
+    rows = db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(names)).all()
+    return dict(rows)
+
+
+def set_story_tags(story_id, names):
+    """Replace the tag associations of a story in the current transaction"""
+    db.session.execute(story_tag.delete().where(story_tag.c.story_id == story_id))
+    ids = tag_ids(names)
+    if ids:
+        db.session.execute(
+            story_tag.insert(),
+            [{"story_id": story_id, "tag_id": tag_id} for tag_id in ids.values()]
+        )
+
+
+def filter_by_tags(query, names, match="all"):
+    """Restrict a Story query to stories tagged with names
+
+    all: every tag, any: at least one tag, exact: exactly these tags.
+    """
+    if not names:
+        return query
+
+    tagged = (
+        db.select(story_tag.c.story_id)
+        .join(Tag, Tag.id == story_tag.c.tag_id)
+        .where(Tag.name.in_(names))
+    )
+    if match == "any":
+        return query.filter(Story.id.in_(tagged))
+
+    tagged = tagged.group_by(story_tag.c.story_id).having(
+        db.func.count(story_tag.c.tag_id) == len(names)
+    )
+    query = query.filter(Story.id.in_(tagged))
+
+    if match == "exact":
+        other_tags = (
+            db.select(story_tag.c.story_id)
+            .join(Tag, Tag.id == story_tag.c.tag_id)
+            .where(Tag.name.notin_(names))
+        )
+        query = query.filter(Story.id.notin_(other_tags))
+    return query
+
+
+def tag_facets(status=None, limit=None):
+    """(name, story count) pairs, most used first, from one grouped query"""
+    count = db.func.count(story_tag.c.story_id)
+    query = (
+        db.session.query(Tag.name, count)
+        .join(story_tag, story_tag.c.tag_id == Tag.id)
+        .join(Story, Story.id == story_tag.c.story_id)
+        .filter(Story.status != DELETING)
+    )
+    if status:
+        query = query.filter(Story.status == status)
+    query = query.group_by(Tag.name).order_by(count.desc(), Tag.name)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def backfill_story_tags():
+    """Build tag and story_tag rows from the comma separated Story.tags strings
+
+    Safe to run more than once: existing tags and associations are skipped.
+    Returns (stories, tags, links) counts.
+    """
+    story_names = {}
+    for story_id, raw in db.session.query(Story.id, Story.tags).yield_per(BATCH_SIZE):
+        names = parse_tags(raw)
+        if names:
+            story_names[story_id] = names
+
+    all_names = sorted({name for names in story_names.values() for name in names})
+    ids = {}
+    for start in range(0, len(all_names), BATCH_SIZE):
+        ids.update(tag_ids(all_names[start:start + BATCH_SIZE]))
+
+    links = [
+        {"story_id": story_id, "tag_id": ids[name]}
+        for story_id, names in story_names.items()
+        for name in names
+    ]
+    for start in range(0, len(links), BATCH_SIZE):
+        db.session.execute(insert_ignore(story_tag), links[start:start + BATCH_SIZE])
+
+    db.session.commit()
+    return len(story_names), len(all_names), len(links)
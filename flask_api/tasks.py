@@ -0,0 +1,66 @@
+from models import db, Story, Page, Choice, StorySnapshot, DELETING
+from jobs import handler
+from tags import set_story_tags
+from clone import clone_story
+from importer import validate_story, import_story
+
+# Pages removed per committed step of a story delete
+DELETE_BATCH_SIZE = 500
+
+
+def mark_deleting(story):
+    """Hide a story from reads until its delete job has run; the caller commits"""
+    story.status = DELETING
+    Story.bump_version(story.id)
+
+
+@handler("delete_story")
+def delete_story(ctx, story_id):
+    """Remove a story, its pages and their choices in committed batches
+
+    Safe to run again after a crash: every batch only deletes rows that
+    are still there. Does nothing unless the story is still marked
+    for deletion.
+    """
+    story = db.session.get(Story, story_id)
+    if story is None or story.status != DELETING:
+        return {"story_id": story_id, "pages": 0, "skipped": True}
+
+    page_ids = db.session.execute(
+        db.select(Page.id).where(Page.story_id == story_id).order_by(Page.id)
+    ).scalars().all()
+    total = len(page_ids)
+    ctx.progress(0, total)
+
+    for start in range(0, total, DELETE_BATCH_SIZE):
+        batch = page_ids[start:start + DELETE_BATCH_SIZE]
+        db.session.execute(
+            db.delete(Choice).where(Choice.from_page_id.in_(batch) | Choice.to_page_id.in_(batch))
+        )
+        db.session.execute(db.delete(Page).where(Page.id.in_(batch)))
+        ctx.progress(start + len(batch))
+
+    set_story_tags(story_id, [])
+    db.session.execute(db.delete(StorySnapshot).where(StorySnapshot.story_id == story_id))
+    db.session.execute(db.delete(Story).where(Story.id == story_id))
+    ctx.progress(total)
+    return {"story_id": story_id, "pages": total}
+
+
+@handler("clone_story")
+def clone_story_job(ctx, story_id, overrides):
+    source = db.session.get(Story, story_id)
+    if source is None:
+        raise LookupError(f"story {story_id} not found")
+
+    story = clone_story(source, **overrides)
+    ctx.progress(1, 1)
+    return {"story": story.to_dict()}
+
+
+@handler("import_story")
+def import_story_job(ctx, document):
+    validate_story(document)
+    story, page_ids = import_story(document)
+    ctx.progress(1, 1)
+    return {"story": story.to_dict(), "page_ids": page_ids}
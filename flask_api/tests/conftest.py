@@ -0,0 +1,155 @@
+"""Fixtures for the Flask API tests
+
+Every test session runs against a throwaway SQLite file migrated to head:
+
+    cd flask_api
+    python -m pytest
+"""
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.sqlite")
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["FLASK_API_KEY"] = "test-key"
+
+from sqlalchemy import event  # noqa: E402
+
+from app import app as flask_app  # noqa: E402
+from models import db  # noqa: E402
+from cache import graph_cache  # noqa: E402
+from schema import upgrade_schema  # noqa: E402
+
+API_KEY = {"X-API-KEY": "test-key"}
+STORY_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "stories", "mohith_python_exam.json")
+
+
+@pytest.fixture(scope="session")
+def app():
+    flask_app.config["TESTING"] = True
+    with flask_app.app_context():
+        upgrade_schema()
+    return flask_app
+
+
+@pytest.fixture(autouse=True)
+def cold_graph_cache(app):
+    """Each test starts without cached graphs; other caches are keyed by version"""
+    graph_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+@pytest.fixture
+def story_document():
+    with open(STORY_FILE) as f:
+        return json.load(f)
+
+
+def chain_document(pages, title="Chain"):
+    """A story of pages in a line, each with a choice to the next and one back to the start"""
+    return {
+        "title": title,
+        "pages": [
+            {
+                "page_key": f"p{i}",
+                "content": f"Page {i}",
+                "is_ending": i == pages - 1,
+                "choices": [] if i == pages - 1 else [
+                    {"choice_text": "on", "next_page_key": f"p{i + 1}"},
+                    {"choice_text": "back", "next_page_key": "p0"},
+                ],
+            }
+            for i in range(pages)
+        ],
+    }
+
+
+def graph_document(pages, edges, endings=(), extradata=None, title="Graph"):
+    """A story of pages p1..pN with choices (from, to) or (from, to, time_change)"""
+    extradata = extradata or {}
+    choices = {i: [] for i in range(1, pages + 1)}
+    for edge in edges:
+        source, target, *time_change = edge
+        choice = {"choice_text": f"to {target}", "next_page_key": f"p{target}"}
+        if time_change:
+            choice["time_change"] = time_change[0]
+        choices[source].append(choice)
+    return {
+        "title": title,
+        "pages": [
+            {
+                "page_key": f"p{i}",
+                "content": f"Page {i}",
+                "is_ending": i in endings,
+                "extradata": extradata.get(i),
+                "choices": choices[i],
+            }
+            for i in range(1, pages + 1)
+        ],
+    }
+
+
+def adjacency(pages, edges, endings=()):
+    """StoryAdjacency of pages 1..N with choices (from, to) or (from, to, time_change)"""
+    from analysis import StoryAdjacency
+    return StoryAdjacency(
+        list(range(1, pages + 1)),
+        [i in endings for i in range(1, pages + 1)],
+        [(edge[0], edge[1], edge[2] if len(edge) > 2 else 0) for edge in edges],
+        {i: f"ending {i}" for i in endings},
+    )
+
+
+@pytest.fixture
+def import_story(client):
+    """Import a story document; returns (story id, {page_key: page id})"""
+    def load(document):
+        response = client.post("/stories/import", json=document, headers=API_KEY)
+        assert response.status_code == 201, response.get_json()
+        body = response.get_json()
+        return body["story"]["id"], body["page_ids"]
+    return load
+
+
+@pytest.fixture
+def create_story(client):
+    """POST /stories; returns the new story"""
+    def create(**data):
+        data.setdefault("title", "Untitled")
+        response = client.post("/stories", json=data, headers=API_KEY)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+    return create
+
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements sent to the database inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with flask_app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
@@ -0,0 +1,118 @@
+from conftest import API_KEY, adjacency, chain_document, count_queries, graph_document
+from analysis import StoryAdjacency, analyze_story, bfs_depths, strongly_connected_components
+
+
+def test_csr_keeps_choice_order_and_drops_outside_choices():
+    graph = StoryAdjacency([10, 20, 30], [False, False, True], [(10, 30, 0), (10, 20, 5), (10, 99, 0), (20, 30, 0)])
+
+    assert list(graph.successors(0)) == [2, 1]
+    assert list(graph.weights[graph.offsets[0]:graph.offsets[1]]) == [0, 5]
+    assert graph.edge_count == 3
+
+
+def test_bfs_depths():
+    graph = adjacency(5, [(1, 2), (1, 3), (2, 4), (3, 4)])
+
+    assert list(bfs_depths(graph, 0)) == [0, 1, 1, 2, -1]
+    assert list(bfs_depths(graph, None)) == [-1] * 5
+
+
+def test_components_come_in_reverse_topological_order():
+    graph = adjacency(5, [(1, 2), (2, 3), (3, 2), (3, 4), (4, 5)])
+
+    component, count = strongly_connected_components(graph)
+
+    assert count == 4
+    assert component[1] == component[2]
+    # Every choice leaving a component leads to a lower-numbered one
+    for source in range(5):
+        for target in graph.successors(source):
+            assert component[target] <= component[source]
+
+
+def test_components_of_a_long_chain_need_no_recursion():
+    pages = 50_000
+    graph = adjacency(pages, [(i, i + 1) for i in range(1, pages)] + [(pages, 1)])
+
+    _, count = strongly_connected_components(graph)
+
+    assert count == 1
+
+
+def test_analysis_flags_unreachable_dead_ends_loops_and_traps():
+    # 1 -> 2 -> 3 (ending); 1 -> 4 <-> 5 (trap); 2 -> 6 (dead end); 7 -> 3 unreachable; 8 chooses itself
+    graph = adjacency(8, [(1, 2), (2, 3), (1, 4), (4, 5), (5, 4), (2, 6), (7, 3), (8, 8)], endings={3})
+
+    result = analyze_story(graph, 1)
+
+    assert result["reachable_count"] == 6
+    assert result["unreachable_page_ids"] == [7, 8]
+    assert result["dead_end_page_ids"] == [6]
+    assert sorted(result["loops"]) == [[4, 5], [8]]
+    # The self loop of page 8 cannot be reached, so it traps nobody
+    assert result["traps"] == [[4, 5]]
+    assert result["max_depth"] == 2
+    assert result["deepest_page_ids"] == [3, 5, 6]
+
+
+def test_a_loop_with_a_way_out_or_an_ending_is_not_a_trap():
+    graph = adjacency(5, [(1, 2), (2, 3), (3, 2), (3, 4), (1, 5), (5, 5)], endings={4, 5})
+
+    result = analyze_story(graph, 1)
+
+    assert sorted(result["loops"]) == [[2, 3], [5]]
+    assert result["traps"] == []
+
+
+def test_analysis_without_a_start_page():
+    result = analyze_story(adjacency(2, [(1, 2)]), None)
+
+    assert result["start_page_id"] is None
+    assert result["max_depth"] is None
+    assert result["unreachable_page_ids"] == [1, 2]
+
+
+def test_analysis_endpoint(client, import_story):
+    story_id, page_ids = import_story(graph_document(4, [(1, 2), (2, 1), (1, 3)], endings={3}))
+
+    response = client.get(f"/stories/{story_id}/analysis")
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body["loops"] == [[page_ids["p1"], page_ids["p2"]]]
+    assert body["unreachable_page_ids"] == [page_ids["p4"]]
+    assert body["dead_end_page_ids"] == [page_ids["p4"]]
+    assert body["max_depth"] == 1
+
+
+def test_analysis_is_cached_per_version(client, import_story):
+    story_id, page_ids = import_story(chain_document(30))
+    etag = client.get(f"/stories/{story_id}/analysis").headers["ETag"]
+
+    with count_queries() as queries:
+        response = client.get(f"/stories/{story_id}/analysis")
+    assert response.get_json()["max_depth"] == 29
+    assert len(queries) == 1
+    assert client.get(f"/stories/{story_id}/analysis", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post(f"/pages/{page_ids['p0']}/choices", json={"to_page_id": page_ids["p29"], "choice_text": "skip"}, headers=API_KEY)
+
+    response = client.get(f"/stories/{story_id}/analysis", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    # The last page is now one choice away, so the farthest is the one before it
+    assert response.get_json()["max_depth"] == 28
+
+
+def test_analysis_does_not_write(client, import_story):
+    story_id, _ = import_story(chain_document(5))
+    version = client.get(f"/stories/{story_id}").get_json()["version"]
+
+    with count_queries() as queries:
+        client.get(f"/stories/{story_id}/analysis")
+
+    assert not any(statement.lstrip().upper().startswith(("UPDATE", "INSERT", "DELETE")) for statement in queries)
+    assert client.get(f"/stories/{story_id}").get_json()["version"] == version
+
+
+def test_analysis_of_a_missing_story_is_a_404(client):
+    assert client.get("/stories/999999/analysis").status_code == 404
@@ -0,0 +1,44 @@
+from conftest import chain_document
+from models import db, Change, Choice, Page
+from importer import import_story, upsert_story
+
+
+def feed(story_id, since=0):
+    rows = Change.query.filter(Change.story_id == story_id, Change.seq > since).order_by(Change.seq)
+    return [(change.entity, change.op, change.entity_id) for change in rows]
+
+
+def last_seq():
+    return db.session.query(db.func.max(Change.seq)).scalar() or 0
+
+
+def choice_ids(story_id):
+    return sorted(db.session.execute(
+        db.select(Choice.id).join(Page, Choice.from_page_id == Page.id).where(Page.story_id == story_id)
+    ).scalars())
+
+
+def test_import_records_every_row_it_creates(app_context):
+    story, page_ids = import_story(chain_document(3, "Feed import"))
+    db.session.commit()
+
+    entries = feed(story.id)
+    # Then an update from publishing it
+    assert entries[0] == ("story", "create", story.id)
+    assert sorted(e[2] for e in entries if e[:2] == ("page", "create")) == sorted(page_ids.values())
+    assert [e[2] for e in entries if e[:2] == ("choice", "create")] == choice_ids(story.id)
+
+
+def test_upsert_records_replaced_choices(app_context):
+    story, _ = import_story(chain_document(3, "Feed upsert"))
+    db.session.commit()
+    old_choices, since = choice_ids(story.id), last_seq()
+
+    document = chain_document(4, "Feed upsert")
+    upsert_story(document)
+    db.session.commit()
+
+    entries = feed(story.id, since)
+    assert [e[2] for e in entries if e[:2] == ("choice", "delete")] == old_choices
+    assert [e[2] for e in entries if e[:2] == ("choice", "create")] == choice_ids(story.id)
+    assert [e for e in entries if e[:2] == ("page", "create")] != []
@@ -0,0 +1,106 @@
+from conftest import adjacency, graph_document
+from analysis import ending_stats
+
+
+def by_page(result):
+    return {ending["page_id"]: ending for ending in result["endings"]}
+
+
+def test_routes_through_a_diamond():
+    # 1 -> 2 -> 4, 1 -> 3 -> 4, 4 -> 5 (ending), 1 -> 5
+    graph = adjacency(5, [(1, 2), (1, 3), (2, 4), (3, 4), (4, 5), (1, 5)], endings={5})
+
+    ending = by_page(ending_stats(graph, 1))[5]
+
+    assert ending["route_count"] == 3
+    assert (ending["shortest"], ending["longest"]) == (1, 3)
+    assert not ending["unbounded"]
+
+
+def test_parallel_choices_are_separate_routes():
+    graph = adjacency(2, [(1, 2), (1, 2)], endings={2})
+
+    assert by_page(ending_stats(graph, 1))[2]["route_count"] == 2
+
+
+def test_counts_stay_exact_beyond_64_bits():
+    # 100 diamonds in a row: 2 ** 100 routes
+    edges = []
+    for k in range(100):
+        top = 3 * k + 1
+        edges += [(top, top + 1), (top, top + 2), (top + 1, top + 3), (top + 2, top + 3)]
+    graph = adjacency(301, edges, endings={301})
+
+    result = ending_stats(graph, 1)
+
+    assert by_page(result)[301]["route_count"] == 2 ** 100
+    assert result["total_routes"] == 2 ** 100
+    assert by_page(result)[301]["longest"] == 200
+
+
+def test_an_ending_behind_a_loop_has_unbounded_routes():
+    # 1 -> 2 <-> 3 -> 4 (ending); 1 -> 5 (ending) avoids the loop
+    graph = adjacency(5, [(1, 2), (2, 3), (3, 2), (3, 4), (1, 5)], endings={4, 5})
+
+    result = ending_stats(graph, 1)
+    endings = by_page(result)
+
+    assert endings[4]["unbounded"]
+    assert endings[4]["route_count"] is None and endings[4]["longest"] is None
+    assert endings[4]["shortest"] == 3
+    assert endings[5]["route_count"] == 1 and not endings[5]["unbounded"]
+    assert result["total_routes"] is None
+
+
+def test_a_page_choosing_itself_is_a_loop():
+    graph = adjacency(2, [(1, 1), (1, 2)], endings={2})
+
+    assert by_page(ending_stats(graph, 1))[2]["unbounded"]
+
+
+def test_unreachable_endings():
+    graph = adjacency(3, [(1, 2)], endings={2, 3})
+
+    result = ending_stats(graph, 1)
+
+    assert by_page(result)[3] == {
+        "page_id": 3, "ending_label": "ending 3", "reachable": False, "unbounded": False,
+        "route_count": None, "shortest": None, "longest": None,
+    }
+    assert result["reachable_endings"] == 1
+    assert result["total_routes"] == 1
+
+
+def test_without_a_start_page_nothing_is_reachable():
+    result = ending_stats(adjacency(2, [(1, 2)], endings={2}), None)
+
+    assert result["reachable_endings"] == 0
+    assert result["total_routes"] == 0
+
+
+def test_ending_stats_endpoint(client, import_story):
+    story_id, page_ids = import_story(graph_document(4, [(1, 2), (1, 3), (2, 4), (3, 4)], endings={4}))
+
+    response = client.get(f"/stories/{story_id}/endings/stats")
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body["total_routes"] == 2
+    assert [(e["page_id"], e["route_count"], e["shortest"], e["longest"]) for e in body["endings"]] == [
+        (page_ids["p4"], 2, 2, 2)
+    ]
+    etag = response.headers["ETag"]
+    assert client.get(f"/stories/{story_id}/endings/stats", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_huge_counts_survive_json(client, import_story):
+    edges = []
+    for k in range(70):
+        top = 3 * k + 1
+        edges += [(top, top + 1), (top, top + 2), (top + 1, top + 3), (top + 2, top + 3)]
+    story_id, _ = import_story(graph_document(211, edges, endings={211}))
+
+    response = client.get(f"/stories/{story_id}/endings/stats")
+
+    assert response.status_code == 200
+    assert response.get_json()["total_routes"] == 2 ** 70
@@ -0,0 +1,67 @@
+from conftest import API_KEY, chain_document, count_queries
+
+
+def test_matching_if_none_match_is_a_304(client, import_story):
+    story_id, _ = import_story(chain_document(3))
+    first = client.get(f"/stories/{story_id}?include_pages=true")
+    assert first.status_code == 200 and first.get_etag()[0]
+
+    again = client.get(f"/stories/{story_id}?include_pages=true", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+
+def test_a_write_changes_the_etag(client, import_story):
+    story_id, page_ids = import_story(chain_document(3))
+    etag = client.get(f"/stories/{story_id}").headers["ETag"]
+
+    client.put(f"/pages/{page_ids['p0']}", json={"content": "Changed"}, headers=API_KEY)
+    response = client.get(f"/stories/{story_id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_etag_depends_on_the_query_string(client, import_story):
+    story_id, _ = import_story(chain_document(3))
+    etag = client.get(f"/stories/{story_id}").headers["ETag"]
+
+    response = client.get(f"/stories/{story_id}?include_pages=true", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_compressed_variant_etag_still_matches(client, import_story):
+    story_id, _ = import_story(chain_document(3))
+    etag = client.get(f"/stories/{story_id}").get_etag()[0]
+
+    response = client.get(f"/stories/{story_id}", headers={"If-None-Match": f'"{etag}-gzip"'})
+
+    assert response.status_code == 304
+
+
+def test_not_modified_story_costs_one_query(client, import_story):
+    story_id, _ = import_story(chain_document(20))
+    etag = client.get(f"/stories/{story_id}?include_pages=true").headers["ETag"]
+
+    with count_queries() as queries:
+        response = client.get(f"/stories/{story_id}?include_pages=true", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert len(queries) == 1
+
+
+def test_list_etag_follows_the_stories_it_lists(client, create_story):
+    story = create_story(author_id=3001)
+    url = "/stories?author_id=3001"
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    client.put(f"/stories/{story['id']}", json={"title": "Renamed"}, headers=API_KEY)
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["stories"][0]["title"] == "Renamed"
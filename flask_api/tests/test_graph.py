@@ -0,0 +1,65 @@
+from conftest import API_KEY, chain_document, count_queries
+from cache import graph_cache
+from graph import get_story_graph
+
+
+def test_cold_story_load_is_a_fixed_number_of_queries(app_context, import_story):
+    small, _ = import_story(chain_document(3, "Small"))
+    large, _ = import_story(chain_document(200, "Large"))
+    graph_cache.clear()
+
+    with count_queries() as small_queries:
+        assert len(get_story_graph(small).pages) == 3
+    with count_queries() as large_queries:
+        assert len(get_story_graph(large).pages) == 200
+
+    # Version, pages, choices, story: never one query per page
+    assert len(small_queries) == 4
+    assert len(large_queries) == 4
+
+
+def test_warm_story_load_only_reads_the_version(app_context, import_story):
+    story_id, _ = import_story(chain_document(50))
+    get_story_graph(story_id)
+
+    with count_queries() as queries:
+        graph = get_story_graph(story_id)
+
+    assert len(graph.pages) == 50
+    assert len(queries) == 1
+
+
+def test_get_story_with_pages_queries(client, import_story):
+    story_id, _ = import_story(chain_document(100))
+    graph_cache.clear()
+
+    with count_queries() as cold:
+        response = client.get(f"/stories/{story_id}?include_pages=true")
+    assert response.status_code == 200
+    assert len(response.get_json()["pages"]) == 100
+    assert len(cold) == 4
+
+    with count_queries() as warm:
+        assert client.get(f"/stories/{story_id}?include_pages=true").status_code == 200
+    assert len(warm) == 1
+
+
+def test_cached_graph_follows_writes(client, import_story):
+    story_id, page_ids = import_story(chain_document(3))
+    before = client.get(f"/stories/{story_id}?include_pages=true").get_json()
+
+    response = client.put(f"/pages/{page_ids['p1']}", json={"content": "Rewritten"}, headers=API_KEY)
+    assert response.status_code == 200
+
+    after = client.get(f"/stories/{story_id}?include_pages=true").get_json()
+    assert after["version"] == before["version"] + 1
+    assert [page["content"] for page in after["pages"]] == ["Page 0", "Rewritten", "Page 2"]
+
+
+def test_choices_keep_their_order(app_context, import_story, story_document):
+    story_id, page_ids = import_story(story_document)
+    graph = get_story_graph(story_id)
+
+    for page in story_document["pages"]:
+        choices = graph.page_with_choices(page_ids[page["page_key"]])["choices"]
+        assert [c["choice_text"] for c in choices] == [c["choice_text"] for c in page.get("choices", [])]
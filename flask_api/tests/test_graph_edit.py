@@ -0,0 +1,51 @@
+import pytest
+
+from conftest import API_KEY, chain_document
+
+
+def patch_graph(client, story_id, operations):
+    return client.patch(f"/stories/{story_id}/graph", json={"operations": operations}, headers=API_KEY)
+
+
+def test_a_batch_creates_and_links_pages(client, import_story):
+    story_id, page_ids = import_story(chain_document(2))
+
+    response = patch_graph(client, story_id, [
+        {"op": "create", "type": "page", "ref": "new", "data": {"content": "New", "is_ending": True}},
+        {"op": "create", "type": "choice", "data": {
+            "from_page_id": page_ids["p0"], "to_page_ref": "new", "choice_text": "go", "time_change": 5,
+        }},
+    ])
+
+    assert response.status_code == 200, response.get_json()
+    pages = client.get(f"/stories/{story_id}?include_pages=true").get_json()["pages"]
+    assert sorted(choice["time_change"] for choice in pages[0]["choices"]) == [0, 0, 5]
+
+
+@pytest.mark.parametrize("operation, error", [
+    ({"op": "create", "type": "page", "data": {"content": "x", "is_ending": "yes"}}, "is_ending must be true or false"),
+    ({"op": "create", "type": "page", "data": {"content": 5}}, "content must be a string"),
+    ({"op": "create", "type": "page", "data": {"content": "x", "page_key": ["k"]}},
+     "page_key must be a string of at most 100 characters or null"),
+    ({"op": "update", "type": "page", "id": "PAGE", "data": {"ending_label": "x" * 101}},
+     "ending_label must be a string of at most 100 characters or null"),
+    ({"op": "update", "type": "page", "id": "PAGE", "data": {"is_start": 1}}, "is_start must be true or false"),
+    ({"op": "create", "type": "choice", "data": {"from_page_id": "PAGE", "to_page_id": "PAGE", "choice_text": "go", "time_change": "soon"}},
+     "time_change must be an integer"),
+    ({"op": "update", "type": "choice", "id": "CHOICE", "data": {"choice_order": 1.5}}, "choice_order must be an integer"),
+    ({"op": "update", "type": "choice", "id": "CHOICE", "data": {"choice_text": None}},
+     "choice_text must be a string of at most 500 characters"),
+])
+def test_bad_values_are_a_400_naming_the_operation(client, import_story, operation, error):
+    story_id, page_ids = import_story(chain_document(2))
+    choice_id = client.get(f"/pages/{page_ids['p0']}").get_json()["choices"][0]["id"]
+    operation = dict(operation, **({"id": {"PAGE": page_ids["p0"], "CHOICE": choice_id}[operation["id"]]} if "id" in operation else {}))
+    if "from_page_id" in operation["data"]:
+        operation["data"] = dict(operation["data"], from_page_id=page_ids["p0"], to_page_id=page_ids["p1"])
+    version = client.get(f"/stories/{story_id}").get_json()["version"]
+
+    response = patch_graph(client, story_id, [{"op": "delete", "type": "page", "id": page_ids["p1"]}, operation])
+
+    assert response.status_code == 400
+    assert response.get_json()["details"] == [f"operations[1]: {error}"]
+    assert client.get(f"/stories/{story_id}").get_json()["version"] == version
@@ -0,0 +1,50 @@
+import pytest
+
+from conftest import API_KEY, chain_document
+
+
+def import_errors(client, document):
+    response = client.post("/stories/import", json=document, headers=API_KEY)
+    assert response.status_code == 400, response.get_json()
+    return response.get_json()["details"]
+
+
+def with_choice(**fields):
+    document = chain_document(2)
+    document["pages"][0]["choices"][0].update(fields)
+    return document
+
+
+def test_valid_document_imports(client, story_document):
+    response = client.post("/stories/import", json=story_document, headers=API_KEY)
+
+    assert response.status_code == 201
+    assert set(response.get_json()["page_ids"]) == {page["page_key"] for page in story_document["pages"]}
+
+
+@pytest.mark.parametrize("document, error", [
+    (with_choice(time_change="soon"), "pages[0].choices[0].time_change must be an integer"),
+    (with_choice(time_change=1.5), "pages[0].choices[0].time_change must be an integer"),
+    (with_choice(choice_order=True), "pages[0].choices[0].choice_order must be an integer"),
+    (with_choice(choice_text=7), "pages[0].choices[0].choice_text must be a string"),
+    (with_choice(choice_text="x" * 501), "pages[0].choices[0].choice_text must be at most 500 characters"),
+    (with_choice(next_page_key=["p1"]), "pages[0].choices[0].next_page_key '['p1']' matches no page"),
+    (dict(chain_document(2), title="x" * 201), "title must be at most 200 characters"),
+    (dict(chain_document(2), author_id="7"), "author_id must be an integer"),
+    (dict(chain_document(2), status="deleting"), "status must be one of published, draft, suspended"),
+    (dict(chain_document(2), tags=5), "tags must be a string or a list of strings"),
+])
+def test_bad_values_are_reported(client, document, error):
+    assert error in import_errors(client, document)
+
+
+def test_page_values_are_checked(client):
+    document = chain_document(2)
+    document["pages"][1].update(is_ending="yes", ending_label=3, page_key="k" * 101)
+
+    assert import_errors(client, document) == [
+        "pages[1].page_key must be at most 100 characters",
+        "pages[1].is_ending must be true or false",
+        "pages[1].ending_label must be a string",
+        "pages[0].choices[0].next_page_key 'p1' matches no page",
+    ]
@@ -0,0 +1,52 @@
+import json
+
+import import_story
+from conftest import chain_document
+
+
+def write(directory, name, content):
+    path = directory / name
+    path.write_text(content if isinstance(content, str) else json.dumps(content))
+    return str(path)
+
+
+def test_bad_files_are_reported_and_the_run_goes_on(tmp_path, capsys, monkeypatch):
+    write(tmp_path, "a_broken.json", "{not json")
+    write(tmp_path, "b_invalid.json", [chain_document(2, "Fine"), {"title": "No pages", "pages": "none"}])
+    write(tmp_path, "c_crashes.json", chain_document(2, "Crashes on insert"))
+    write(tmp_path, "d_good.json", chain_document(3, "Imported by the CLI"))
+
+    real_import = import_story.import_story
+
+    def import_or_crash(document):
+        if document["title"] == "Crashes on insert":
+            raise TypeError("unsupported value")
+        return real_import(document)
+    monkeypatch.setattr(import_story, "import_story", import_or_crash)
+
+    assert import_story.main([str(tmp_path), "--workers", "1"]) == 1
+
+    output = capsys.readouterr().out
+    assert "✗ a_broken.json" in output
+    assert "✗ b_invalid.json: story 1: pages must be a list" in output
+    assert "✗ c_crashes.json: unsupported value" in output
+    assert "✓ d_good.json: 'Imported by the CLI' created" in output
+    assert "1 stories, 3 pages, 4 choices" in output and "3 failed" in output
+
+
+def test_a_failed_file_leaves_nothing_behind(tmp_path, monkeypatch):
+    path = write(tmp_path, "two.json", [chain_document(2, "First of two"), chain_document(2, "Second of two")])
+
+    real_import = import_story.import_story
+
+    def crash_on_second(document):
+        if document["title"] == "Second of two":
+            raise ValueError("bad value")
+        return real_import(document)
+    monkeypatch.setattr(import_story, "import_story", crash_on_second)
+
+    result = import_story.import_file(path)
+
+    assert result == {"path": path, "stories": [], "error": "bad value"}
+    with import_story.app.app_context():
+        assert not import_story.db.session.query(import_story.Story).filter_by(title="First of two").count()
@@ -0,0 +1,64 @@
+from conftest import API_KEY, chain_document
+
+
+def moderate(client, ids, status):
+    response = client.patch("/stories", json={"ids": ids, "status": status}, headers=API_KEY)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_publishing_a_draft_in_bulk_makes_it_playable(client, import_story):
+    story_id, _ = import_story(dict(chain_document(3), status="draft"))
+    assert client.get(f"/stories/{story_id}/published").status_code == 404
+
+    assert moderate(client, [story_id], "published")["updated"] == [story_id]
+
+    response = client.get(f"/stories/{story_id}/published")
+    assert response.status_code == 200
+    snapshot = client.get(response.get_json()["url"]).get_json()
+    assert len(snapshot["pages"]) == 3
+
+
+def test_unsuspending_keeps_the_published_snapshot(client, import_story):
+    story_id, page_ids = import_story(chain_document(3))
+    published = client.get(f"/stories/{story_id}/published").get_json()
+    moderate(client, [story_id], "suspended")
+    client.put(f"/pages/{page_ids['p1']}", json={"content": "Unreviewed edit"}, headers=API_KEY)
+
+    moderate(client, [story_id], "published")
+
+    # Readers keep the reviewed snapshot; the edit waits for an explicit publish
+    assert client.get(f"/stories/{story_id}/published").get_json() == published
+
+
+def test_unknown_status_is_rejected(client, create_story):
+    story_id = create_story()["id"]
+
+    response = client.patch("/stories", json={"ids": [story_id], "status": "deleting"}, headers=API_KEY)
+
+    assert response.status_code == 400
+
+
+def test_put_cannot_hide_a_story_as_deleting(client, create_story):
+    story_id = create_story()["id"]
+
+    response = client.put(f"/stories/{story_id}", json={"status": "deleting"}, headers=API_KEY)
+
+    assert response.status_code == 400
+    assert client.get(f"/stories/{story_id}").status_code == 200
+    assert client.delete(f"/stories/{story_id}", headers=API_KEY).status_code in (200, 202, 204)
+
+
+def test_post_only_takes_moderation_statuses(client):
+    response = client.post("/stories", json={"title": "Hidden", "status": "deleting"}, headers=API_KEY)
+
+    assert response.status_code == 400
+
+
+def test_put_still_moves_between_moderation_statuses(client, create_story):
+    story_id = create_story()["id"]
+
+    response = client.put(f"/stories/{story_id}", json={"status": "suspended"}, headers=API_KEY)
+
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "suspended"
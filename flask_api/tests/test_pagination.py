@@ -0,0 +1,81 @@
+import pytest
+
+from conftest import count_queries
+from models import db, Story
+from pagination import MAX_LIMIT, parse_limit, encode_cursor, decode_story_cursor, InvalidCursor
+
+
+def list_all(client, author_id, limit):
+    """Follow next_cursor through every page of an author's stories"""
+    pages, cursor = [], None
+    while True:
+        url = f"/stories?author_id={author_id}&limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url)
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append([story["id"] for story in body["stories"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_walks_every_story_once_newest_first(client, create_story):
+    ids = [create_story(author_id=4001, title=f"Story {i}")["id"] for i in range(7)]
+
+    pages = list_all(client, 4001, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == ids[::-1]
+
+
+def test_ties_on_created_at_are_broken_by_id(app, client, create_story):
+    ids = [create_story(author_id=4002)["id"] for _ in range(5)]
+    with app.app_context():
+        same = db.session.get(Story, ids[0]).created_at
+        db.session.execute(db.update(Story).where(Story.id.in_(ids)).values(created_at=same))
+        db.session.commit()
+
+    pages = list_all(client, 4002, limit=2)
+
+    assert sum(pages, []) == sorted(ids, reverse=True)
+
+
+def test_exact_last_page_has_no_cursor(client, create_story):
+    for _ in range(4):
+        create_story(author_id=4003)
+
+    pages = list_all(client, 4003, limit=2)
+
+    assert [len(page) for page in pages] == [2, 2]
+
+
+def test_later_pages_cost_one_query(client, create_story):
+    for _ in range(6):
+        create_story(author_id=4004)
+    cursor = client.get("/stories?author_id=4004&limit=2").get_json()["next_cursor"]
+
+    with count_queries() as queries:
+        assert client.get(f"/stories?author_id=4004&limit=2&cursor={cursor}").status_code == 200
+
+    assert len(queries) == 1
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor("yesterday", 1), encode_cursor(1, 2, 3), "e30"])
+def test_invalid_cursor_is_a_400(client, cursor):
+    response = client.get(f"/stories?cursor={cursor}")
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "invalid cursor"}
+
+
+@pytest.mark.parametrize("raw, limit", [(None, 50), ("", 50), ("abc", 50), ("0", 1), ("-5", 1), ("20", 20), ("100000", MAX_LIMIT)])
+def test_limit_is_clamped(raw, limit):
+    assert parse_limit(raw) == limit
+
+
+def test_cursor_round_trip(app_context, create_story):
+    story = db.session.get(Story, create_story()["id"])
+
+    assert decode_story_cursor(encode_cursor(story.created_at, story.id)) == (story.created_at, story.id)
+    with pytest.raises(InvalidCursor):
+        decode_story_cursor(encode_cursor(story.id))
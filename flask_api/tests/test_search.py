@@ -0,0 +1,110 @@
+import pytest
+
+from conftest import API_KEY
+from changes import record, STORY, CREATE, UPDATE
+from models import db, Story
+from search import search_index, to_tsquery_text, tokenize
+
+
+def search(client, text, **args):
+    response = client.get("/stories", query_string={"search": text, **args})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_title_matches_rank_above_description_matches(client, create_story):
+    in_description = create_story(title="Plain", description="a tale of the zephyrquill")["id"]
+    in_title = create_story(title="The Zephyrquill", description="a tale")["id"]
+
+    body = search(client, "zephyrquill")
+
+    assert [story["id"] for story in body["stories"]] == [in_title, in_description]
+    assert body["stories"][0]["rank"] > body["stories"][1]["rank"]
+
+
+def test_every_term_must_match_and_the_last_is_a_prefix(client, create_story):
+    both = create_story(title="Marrowvale lanterns")["id"]
+    create_story(title="Marrowvale")
+
+    assert [story["id"] for story in search(client, "marrowvale lant")["stories"]] == [both]
+    assert search(client, "marrowvale lanternsx")["stories"] == []
+
+
+def test_search_pages_do_not_repeat(client, create_story):
+    ids = {create_story(title=f"Quillfen chapter {i}")["id"] for i in range(5)}
+
+    seen, cursor = [], None
+    while True:
+        body = search(client, "quillfen", limit=2, **({"cursor": cursor} if cursor else {}))
+        seen += [story["id"] for story in body["stories"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(seen) == sorted(ids)
+
+
+def test_index_follows_edits(client, create_story):
+    story_id = create_story(title="Brindlemoor")["id"]
+    assert search(client, "brindlemoor")["stories"]
+
+    client.put(f"/stories/{story_id}", json={"title": "Ashenreach"}, headers=API_KEY)
+
+    assert search(client, "brindlemoor")["stories"] == []
+    assert [story["id"] for story in search(client, "ashenreach")["stories"]] == [story_id]
+
+
+def test_index_follows_writes_made_outside_the_request(app, client, create_story):
+    story_id = create_story(title="Gallowmere")["id"]
+    assert search(client, "gallowmere")["stories"]
+
+    # As a worker job or the import CLI would: a committed write and its feed entry, no route involved
+    with app.app_context():
+        fresh = Story(title="Cinderholt", author_name="Worker", status="published")
+        db.session.add(fresh)
+        db.session.flush()
+        record(fresh.id, STORY, CREATE)
+        db.session.get(Story, story_id).title = "Saltmarrow"
+        record(story_id, STORY, UPDATE)
+        db.session.commit()
+        fresh_id = fresh.id
+
+    assert [story["id"] for story in search(client, "cinderholt")["stories"]] == [fresh_id]
+    assert search(client, "gallowmere")["stories"] == []
+    assert [story["id"] for story in search(client, "saltmarrow")["stories"]] == [story_id]
+
+
+def test_deleted_stories_leave_the_index(client, create_story):
+    story_id = create_story(title="Wrenfallow")["id"]
+    assert search(client, "wrenfallow")["stories"]
+
+    assert client.delete(f"/stories/{story_id}", headers=API_KEY).status_code == 202
+
+    assert search(client, "wrenfallow")["stories"] == []
+    assert story_id not in search_index._doc_len
+
+
+def test_search_applies_the_other_filters(client, create_story):
+    create_story(title="Thornwick", author_id=5001)
+    mine = create_story(title="Thornwick", author_id=5002)["id"]
+
+    assert [story["id"] for story in search(client, "thornwick", author_id=5002)["stories"]] == [mine]
+
+
+def test_search_cursor_must_be_a_search_cursor(client):
+    response = client.get("/stories", query_string={"search": "anything", "cursor": "e30"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("The Lost Door", "the & lost & door:*"),
+    ("door", "door:*"),
+    ("!!", None),
+])
+def test_tsquery_text(text, expected):
+    assert to_tsquery_text(text) == expected
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("The Cave of the Winds") == ["cave", "winds"]
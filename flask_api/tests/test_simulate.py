@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from conftest import adjacency, graph_document
+from simulate import TransitionTable, simulate, MAX_BIAS
+
+
+def shares(result):
+    return {outcome["page_id"]: outcome["share"] for outcome in result["endings"] + result["dead_ends"]}
+
+
+def test_every_walk_of_a_line_ends_the_same_way():
+    table = TransitionTable(adjacency(3, [(1, 2), (2, 3)], endings={3}))
+
+    result = simulate(table, 1, walks=1000, seed=1)
+
+    assert result["finished"] == 1000 and result["unfinished"] == 0
+    assert result["endings"] == [{"page_id": 3, "ending_label": "ending 3", "count": 1000, "share": 1.0}]
+    assert result["steps"] == {"mean": 2.0, "min": 2, "max": 2, "histogram": [0, 0, 1000]}
+
+
+def test_a_uniform_reader_splits_evenly():
+    table = TransitionTable(adjacency(4, [(1, 2), (1, 3), (1, 4)], endings={2, 3, 4}))
+
+    result = simulate(table, 1, walks=90_000, seed=7)
+
+    for share in shares(result).values():
+        assert share == pytest.approx(1 / 3, abs=0.01)
+
+
+@pytest.mark.parametrize("bias", [0.5, 2.0])
+def test_bias_weights_choices_by_position(bias):
+    table = TransitionTable(adjacency(4, [(1, 2), (1, 3), (1, 4)], endings={2, 3, 4}), bias)
+
+    result = shares(simulate(table, 1, walks=100_000, seed=3))
+
+    weights = [bias ** k for k in range(3)]
+    for page_id, weight in zip((2, 3, 4), weights):
+        assert result[page_id] == pytest.approx(weight / sum(weights), abs=0.01)
+
+
+def test_a_heavy_bias_on_a_wide_page_stays_finite():
+    targets = range(2, 502)
+    table = TransitionTable(adjacency(501, [(1, t) for t in targets], endings=set(targets)), MAX_BIAS)
+
+    assert np.isfinite(table.thresholds).all()
+    assert (np.diff(table.thresholds) >= 0).all()
+    result = simulate(table, 1, walks=1000, seed=0)
+    assert shares(result)[501] == pytest.approx(0.9, abs=0.05)
+
+
+def test_the_same_seed_gives_the_same_result():
+    table = TransitionTable(adjacency(5, [(1, 2), (1, 3), (2, 4), (2, 5), (3, 5)], endings={4, 5}))
+
+    assert simulate(table, 1, walks=5000, seed=42) == simulate(table, 1, walks=5000, seed=42)
+
+
+def test_dead_ends_and_loops():
+    # 1 -> 2 (dead end), 1 -> 3 <-> 4 (a loop walks never leave)
+    table = TransitionTable(adjacency(4, [(1, 2), (1, 3), (3, 4), (4, 3)]))
+
+    result = simulate(table, 1, walks=10_000, seed=5, max_steps=50)
+
+    assert result["endings"] == []
+    assert [outcome["page_id"] for outcome in result["dead_ends"]] == [2]
+    assert result["finished"] + result["unfinished"] == 10_000
+    assert result["unfinished"] == pytest.approx(5000, abs=300)
+    assert not result["truncated"]
+
+
+def test_the_step_budget_truncates_long_runs():
+    table = TransitionTable(adjacency(2, [(1, 2), (2, 1)]))
+
+    result = simulate(table, 1, walks=1000, seed=0, max_steps=1000, step_budget=10_000)
+
+    assert result["truncated"]
+    assert result["unfinished"] == 1000
+    assert result["steps"]["mean"] is None
+
+
+def test_starting_on_an_ending_or_without_a_start():
+    table = TransitionTable(adjacency(2, [(1, 2)], endings={1, 2}))
+
+    assert simulate(table, 1, walks=10, seed=0)["steps"]["histogram"] == [10]
+    assert simulate(table, None, walks=10) is None
+
+
+def test_simulate_endpoint(client, import_story):
+    story_id, page_ids = import_story(graph_document(3, [(1, 2), (1, 3)], endings={2, 3}))
+
+    response = client.get(f"/stories/{story_id}/simulate?walks=2000&seed=9")
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body["finished"] == 2000 and not body["truncated"]
+    assert {e["page_id"] for e in body["endings"]} == {page_ids["p2"], page_ids["p3"]}
+    etag = response.headers["ETag"]
+    assert client.get(f"/stories/{story_id}/simulate?walks=2000&seed=9", headers={"If-None-Match": etag}).status_code == 304
+
+
+@pytest.mark.parametrize("query", ["walks=0", "walks=2000000", "bias=0", "bias=-1", "bias=11", "bias=nan", "bias=inf", "max_steps=0", "max_steps=5000"])
+def test_simulate_rejects_bad_arguments(client, import_story, query):
+    story_id, _ = import_story(graph_document(2, [(1, 2)], endings={2}))
+
+    assert client.get(f"/stories/{story_id}/simulate?{query}").status_code == 400
+
+
+def test_simulating_a_story_without_a_start_page_is_a_409(client, create_story):
+    story_id = create_story()["id"]
+
+    for query in ("walks=10", "walks=10&seed=1"):
+        response = client.get(f"/stories/{story_id}/simulate?{query}")
+        assert response.status_code == 409
+        assert response.get_json() == {"error": "Story has no start page"}
@@ -0,0 +1,74 @@
+from conftest import API_KEY, chain_document, count_queries
+from models import db, Story
+from stats import repair_story_stats
+
+
+def story_stats(client, story_id):
+    story = client.get(f"/stories/{story_id}").get_json()
+    return story["version"], (story["page_count"], story["ending_count"], story["choice_count"], story["max_depth"])
+
+
+def test_import_stores_every_statistic(client, import_story):
+    story_id, _ = import_story(chain_document(6))
+
+    assert story_stats(client, story_id)[1] == (6, 1, 10, 5)
+
+
+def test_a_change_of_shape_clears_max_depth_with_the_version_bump(client, import_story):
+    story_id, page_ids = import_story(chain_document(6))
+    version, _ = story_stats(client, story_id)
+
+    client.post(f"/pages/{page_ids['p0']}/choices", json={"to_page_id": page_ids["p5"], "choice_text": "skip"}, headers=API_KEY)
+
+    assert story_stats(client, story_id) == (version + 1, (6, 1, 11, None))
+
+
+def test_editing_text_keeps_max_depth(client, import_story):
+    story_id, page_ids = import_story(chain_document(6))
+
+    client.put(f"/pages/{page_ids['p2']}", json={"content": "New text"}, headers=API_KEY)
+
+    assert story_stats(client, story_id)[1][3] == 5
+
+
+def test_graph_writes_cost_the_same_whatever_the_story_size(client, import_story):
+    costs = []
+    for pages in (3, 300):
+        story_id, page_ids = import_story(chain_document(pages))
+        with count_queries() as queries:
+            response = client.post(
+                f"/pages/{page_ids['p0']}/choices",
+                json={"to_page_id": page_ids["p1"], "choice_text": "again"}, headers=API_KEY,
+            )
+        assert response.status_code == 201
+        costs.append(len(queries))
+
+    assert costs[0] == costs[1]
+
+
+def test_repair_fills_cleared_depths_and_bumps_their_version(app, client, import_story):
+    story_id, page_ids = import_story(chain_document(6))
+    untouched, _ = import_story(chain_document(4))
+    first_choice = client.get(f"/pages/{page_ids['p0']}").get_json()["choices"][0]["id"]
+    client.delete(f"/choices/{first_choice}", headers=API_KEY)
+    version, stats = story_stats(client, story_id)
+    untouched_version, _ = story_stats(client, untouched)
+    assert stats[3] is None
+
+    with app.app_context():
+        stories, repaired = repair_story_stats()
+
+    assert repaired >= 1
+    # p0 only leads back to itself now
+    assert story_stats(client, story_id) == (version + 1, (6, 1, 9, 0))
+    assert story_stats(client, untouched)[0] == untouched_version
+
+
+def test_repair_corrects_wrong_counts(app, client, import_story):
+    story_id, _ = import_story(chain_document(5))
+    with app.app_context():
+        db.session.execute(db.update(Story).where(Story.id == story_id).values(page_count=99))
+        db.session.commit()
+        repair_story_stats()
+
+    assert story_stats(client, story_id)[1] == (5, 1, 8, 4)
@@ -0,0 +1,22 @@
+import pytest
+
+from conftest import chain_document
+from cache import graph_cache
+
+
+@pytest.mark.parametrize("query", [
+    "",
+    "include_pages=true",
+    "include_pages=true&fields=title,id",
+    "include_pages=true&fields=version,title&page_fields=id,content,choices",
+])
+def test_streamed_json_is_the_buffered_document(client, import_story, query):
+    story_id, _ = import_story(chain_document(5, "Stréam"))
+    graph_cache.clear()
+
+    buffered = client.get(f"/stories/{story_id}?{query}")
+    streamed = client.get(f"/stories/{story_id}?{query}&stream=json")
+
+    assert streamed.status_code == buffered.status_code == 200
+    assert streamed.get_json() == buffered.get_json()
+    assert streamed.get_data() == buffered.get_data()
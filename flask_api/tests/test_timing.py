@@ -0,0 +1,106 @@
+import pytest
+
+from conftest import adjacency, graph_document
+from analysis import page_deadline, time_bounds
+
+
+def elapsed(result):
+    return {page["page_id"]: (page["min_elapsed"], page["max_elapsed"]) for page in result["pages"]}
+
+
+def outcomes(result):
+    return {page["page_id"]: page["outcome"] for page in result["deadlines"]}
+
+
+# 1 -> 2 (5), 1 -> 3 (1), 2 -> 4 (1), 3 -> 4 (2); page 5 cannot be reached
+DAG = [(1, 2, 5), (1, 3, 1), (2, 4, 1), (3, 4, 2)]
+
+
+def test_least_and_most_time_over_a_dag():
+    result = time_bounds(adjacency(5, DAG, endings={4}), 1, {})
+
+    assert elapsed(result) == {1: (0, 0), 2: (5, 5), 3: (1, 1), 4: (3, 6), 5: (None, None)}
+    assert not result["negative_time_changes"]
+    assert result["endings"] == [
+        {"page_id": 4, "reachable": True, "min_elapsed": 3, "max_elapsed": 6, "ending_label": "ending 4"}
+    ]
+
+
+def test_a_loop_that_costs_time_has_no_most():
+    graph = adjacency(3, [(1, 2, 1), (2, 1, 1), (2, 3, 0)], endings={3})
+
+    assert elapsed(time_bounds(graph, 1, {})) == {1: (0, None), 2: (1, None), 3: (1, None)}
+
+
+def test_a_loop_of_free_choices_is_bounded():
+    graph = adjacency(3, [(1, 2, 0), (2, 1, 0), (2, 3, 4)], endings={3})
+
+    assert elapsed(time_bounds(graph, 1, {})) == {1: (0, 0), 2: (0, 0), 3: (4, 4)}
+
+
+def test_choices_giving_time_back():
+    graph = adjacency(3, [(1, 2, 5), (2, 3, -3), (1, 3, 4)], endings={3})
+
+    result = time_bounds(graph, 1, {})
+
+    assert result["negative_time_changes"]
+    assert elapsed(result)[3] == (2, 4)
+
+
+def test_a_loop_giving_time_back_has_no_least():
+    graph = adjacency(3, [(1, 2, 1), (2, 1, -2), (2, 3, 0)], endings={3})
+
+    result = elapsed(time_bounds(graph, 1, {}))
+
+    assert result == {1: (None, 0), 2: (None, 1), 3: (None, 1)}
+
+
+@pytest.mark.parametrize("deadline, outcome", [(10, "always_met"), (6, "always_met"), (4, "can_miss"), (2, "always_missed")])
+def test_deadline_outcomes(deadline, outcome):
+    result = time_bounds(adjacency(5, DAG, endings={4}), 1, {4: deadline})
+
+    assert outcomes(result) == {4: outcome}
+    assert result["deadlines"][0]["deadline"] == deadline
+
+
+def test_deadlines_on_unreachable_pages_and_unbounded_routes():
+    graph = adjacency(4, [(1, 2, 1), (2, 1, 1), (2, 3, 0)], endings={3})
+
+    result = time_bounds(graph, 1, {3: 100, 4: 100, 99: 1})
+
+    # Going round the loop can always take longer; page 99 is not in the story
+    assert outcomes(result) == {3: "can_miss", 4: "unreachable"}
+
+
+def test_without_a_start_page():
+    result = time_bounds(adjacency(2, [(1, 2, 3)]), None, {2: 1})
+
+    assert elapsed(result) == {1: (None, None), 2: (None, None)}
+    assert outcomes(result) == {2: "unreachable"}
+
+
+@pytest.mark.parametrize("extradata, deadline", [
+    ({"deadline": 30}, 30),
+    ({"deadline": 2.5}, 2.5),
+    ({"deadline": "30"}, None),
+    ({"deadline": True}, None),
+    ({"mood": "tense"}, None),
+    (["deadline"], None),
+    (None, None),
+])
+def test_page_deadline(extradata, deadline):
+    assert page_deadline(extradata) == deadline
+
+
+def test_timing_endpoint_reads_deadlines_from_extradata(client, import_story):
+    document = graph_document(4, DAG, endings={4}, extradata={4: {"deadline": 4}, 2: {"deadline": 10}})
+    story_id, page_ids = import_story(document)
+
+    response = client.get(f"/stories/{story_id}/timing")
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert {page["page_id"]: page["outcome"] for page in body["deadlines"]} == {
+        page_ids["p2"]: "always_met", page_ids["p4"]: "can_miss",
+    }
+    assert [(e["min_elapsed"], e["max_elapsed"]) for e in body["endings"]] == [(3, 6)]
@@ -0,0 +1,87 @@
+import argparse
+import os
+import signal
+import sys
+from multiprocessing import Process, Event
+from multiprocessing.connection import wait
+
+from flask import Flask
+from models import db
+from config import Config
+from schema import migrate, upgrade_schema
+from jobs import claim_next, run_job, requeue_stale
+import tasks  # noqa: F401  registers the job handlers
+
+'''
+     Runs the jobs queued by the API (story deletes, async clones and imports)
+     -> python worker.py --workers 4
+'''
+
+# --- Flask app setup ---
+app = Flask(__name__)
+app.config.from_object(Config)
+db.init_app(app)
+migrate.init_app(app)
+
+
+def work(stop, once=False):
+    """Claim and run jobs until stop is set, or until the queue is empty with once"""
+    # Ctrl+C is handled by the parent, which sets stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    with app.app_context():
+        # Pooled connections inherited from the parent must not be shared
+        db.engine.dispose(close=False)
+        interval = app.config["JOB_POLL_INTERVAL"]
+        while not stop.is_set():
+            job = claim_next()
+            if job is None:
+                if once:
+                    return
+                stop.wait(interval)
+                continue
+            status = run_job(job)
+            print(f"{'✓' if status == 'succeeded' else '✗'} job {job.id} ({job.kind}) {status}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run queued background jobs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--once", action="store_true",
+                        help="exit once the queue is empty instead of polling")
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        upgrade_schema()
+        requeued = requeue_stale()
+        single_writer = db.engine.dialect.name == "sqlite"
+        db.engine.dispose()
+    if requeued:
+        print(f"✓ {requeued} stale job(s) requeued or failed")
+
+    # SQLite allows one writer at a time, so extra processes would only wait on its lock
+    workers = 1 if single_writer else max(1, args.workers)
+    stop = Event()
+    processes = [Process(target=work, args=(stop, args.once)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    print(f"✓ {workers} worker(s) running")
+
+    check_every = min(app.config["JOB_TIMEOUT"], 60)
+    try:
+        while any(process.is_alive() for process in processes):
+            wait([process.sentinel for process in processes if process.is_alive()], check_every)
+            if not args.once:
+                with app.app_context():
+                    requeue_stale()
+                    db.engine.dispose()
+    except KeyboardInterrupt:
+        print("Stopping after the current jobs...")
+        stop.set()
+        for process in processes:
+            process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
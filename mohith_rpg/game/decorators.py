@@ -4,7 +4,7 @@ from game.flask_api import flask_api
 
 def story_owner_required(view_func):
     def wrapper(request, story_id, *args, **kwargs):
-        story = flask_api.get_story(story_id)
+        story = flask_api.get_story(story_id, fields=["author_id"])
         if not story:
             messages.error(request, "Story not found.")
             return redirect('author_dashboard')
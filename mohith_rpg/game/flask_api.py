@@ -1,11 +1,77 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.cookiejar import DefaultCookiePolicy
+
 import requests
 from django.conf import settings
 
+# Cookie the API sets after a write so the writer's next reads skip the read replicas
+STICKY_COOKIE = "primary_until"
+STICKY_SESSION_KEY = "flask_api_primary_until"
+
+# Django session of the end user the current request is made for, see bind_user_session
+_user_session = ContextVar("flask_api_user_session", default=None)
+
+
+@contextmanager
+def bind_user_session(session):
+    """Make API calls in the block read and write the sticky cookie of this Django session"""
+    token = _user_session.set(session)
+    try:
+        yield
+    finally:
+        _user_session.reset(token)
+
+
+class PerUserSession(requests.Session):
+    """requests.Session whose read-your-writes cookie belongs to one end user at a time
+
+    The client is shared by every Django user, so its cookie jar is
+    switched off: the primary_until cookie of a write is kept in the
+    Django session bound with bind_user_session() and sent back only
+    with that user's requests.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def request(self, method, url, **kwargs):
+        user_session = _user_session.get()
+        if user_session is not None:
+            until = user_session.get(STICKY_SESSION_KEY)
+            if until is not None and float(until) > time.time():
+                kwargs["cookies"] = {STICKY_COOKIE: until, **(kwargs.get("cookies") or {})}
+            elif until is not None:
+                del user_session[STICKY_SESSION_KEY]
+
+        response = super().request(method, url, **kwargs)
+        until = response.cookies.get(STICKY_COOKIE)
+        if until is not None and user_session is not None:
+            user_session[STICKY_SESSION_KEY] = until
+        return response
+
 
 class FlaskAPIClient:
+    # Number of GET responses kept with their ETag for conditional requests
+    etag_cache_size = 256
+    # Number of snapshot resources kept; they never change, so are never revalidated
+    immutable_cache_size = 256
+
     def __init__(self):
         self.url = settings.FLASK_API_URL
         self.key = settings.FLASK_API_KEY
+        self._etag_cache = OrderedDict()
+        self._etag_lock = threading.Lock()
+        self._immutable_cache = OrderedDict()
+        # One pooled keep-alive connection per host; the API compresses
+        # large JSON bodies and requests decodes them transparently
+        self.session = PerUserSession()
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
 
     def _get_head(self, include_auth=False):
         headers = {"Content-Type": "application/json"}
@@ -26,6 +92,62 @@ class FlaskAPIClient:
                 raise Exception(f"API Error: HTTP {response.status_code}")
         return response.json()
 
+    def _get_json(self, path, params=None):
+        """GET a JSON resource, revalidating the last copy with If-None-Match"""
+        url = f"{self.url}{path}"
+        cache_key = (url, tuple(sorted((params or {}).items())))
+        headers = {}
+
+        with self._etag_lock:
+            cached = self._etag_cache.get(cache_key)
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        response = self.session.get(url, params=params, headers=headers, timeout=10)
+        if response.status_code == 304 and cached:
+            with self._etag_lock:
+                if cache_key in self._etag_cache:
+                    self._etag_cache.move_to_end(cache_key)
+            # Callers normalize results in place, so never hand out the cached copy
+            return copy.deepcopy(cached[1])
+
+        data = self._handle_response(response)
+        etag = response.headers.get("ETag")
+        with self._etag_lock:
+            if etag and data is not None:
+                self._etag_cache[cache_key] = (etag, copy.deepcopy(data))
+                self._etag_cache.move_to_end(cache_key)
+                while len(self._etag_cache) > self.etag_cache_size:
+                    self._etag_cache.popitem(last=False)
+            else:
+                self._etag_cache.pop(cache_key, None)
+        return data
+
+    def _get_immutable(self, path):
+        """GET a versioned snapshot resource, served from memory once fetched"""
+        url = f"{self.url}{path}"
+        with self._etag_lock:
+            cached = self._immutable_cache.get(url)
+            if cached is not None:
+                self._immutable_cache.move_to_end(url)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        response = self.session.get(url, timeout=10)
+        data = self._handle_response(response)
+        if data is not None:
+            with self._etag_lock:
+                self._immutable_cache[url] = copy.deepcopy(data)
+                while len(self._immutable_cache) > self.immutable_cache_size:
+                    self._immutable_cache.popitem(last=False)
+        return data
+
+    def _fields_param(self, fields):
+        """Sparse fieldset for ?fields=, from a list or a comma separated string"""
+        if isinstance(fields, (list, tuple)):
+            return ",".join(fields)
+        return fields
+
     def _normalize_story(self, story):
         """Normalize story fields from Flask API to Django expected format"""
         if not story:
@@ -68,7 +190,12 @@ class FlaskAPIClient:
 
     # READ ENDPOINTS
 
-    def get_stories(self, status=None, search=None, tags=None):
+    def get_stories_page(self, status=None, search=None, tags=None, author_id=None,
+                         limit=None, cursor=None, fields=None):
+        """One page of stories: {"stories": [...], "next_cursor": str or None}
+
+        fields limits each story to the given keys, e.g. ["title", "status"].
+        """
         params = {}
         if status:
             params["status"] = status
@@ -76,26 +203,42 @@ class FlaskAPIClient:
             params["search"] = search
         if tags:
             params["tags"] = tags
+        if author_id is not None:
+            params["author_id"] = author_id
+        if limit:
+            params["limit"] = limit
+        if cursor:
+            params["cursor"] = cursor
+        if fields:
+            params["fields"] = self._fields_param(fields)
 
         try:
-            response = requests.get(
-                f"{self.url}/stories", params=params, timeout=10
-            )
-            data = self._handle_response(response)
+            data = self._get_json("/stories", params=params)
             if not data:
-                return []
-            return [self._normalize_story(s) for s in data]
+                return {"stories": [], "next_cursor": None}
+            return {
+                "stories": [self._normalize_story(s) for s in data["stories"]],
+                "next_cursor": data.get("next_cursor"),
+            }
         except Exception as e:
             print(f"Error fetching stories: {e}")
-            return []
+            return {"stories": [], "next_cursor": None}
 
-    def get_story(self, story_id, include_pages=False):
+    def get_stories(self, status=None, search=None, tags=None, author_id=None,
+                    limit=None, cursor=None, fields=None):
+        return self.get_stories_page(
+            status=status, search=search, tags=tags, author_id=author_id,
+            limit=limit, cursor=cursor, fields=fields,
+        )["stories"]
+
+    def get_story(self, story_id, include_pages=False, fields=None, page_fields=None):
         try:
             params = {"include_pages": "true"} if include_pages else {}
-            response = requests.get(
-                f"{self.url}/stories/{story_id}", params=params, timeout=10
-            )
-            story = self._handle_response(response)
+            if fields:
+                params["fields"] = self._fields_param(fields)
+            if include_pages and page_fields:
+                params["page_fields"] = self._fields_param(page_fields)
+            story = self._get_json(f"/stories/{story_id}", params=params)
             if not story:
                 return None
             story = self._normalize_story(story)
@@ -109,7 +252,7 @@ class FlaskAPIClient:
 
     def get_story_start(self, story_id):
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.url}/stories/{story_id}/start", timeout=10
             )
             data = self._handle_response(response)
@@ -120,15 +263,164 @@ class FlaskAPIClient:
             print(f"Error fetching start of story {story_id}: {e}")
             return None
 
-    def get_page(self, page_id):
+    def get_story_analysis(self, story_id):
+        """Unreachable pages, dead ends, loops and traps (loops with no way out) of a story"""
         try:
-            response = requests.get(f"{self.url}/pages/{page_id}", timeout=10)
-            page = self._handle_response(response)
+            return self._get_json(f"/stories/{story_id}/analysis")
+        except Exception as e:
+            print(f"Error fetching analysis of story {story_id}: {e}")
+            return None
+
+    def get_ending_stats(self, story_id):
+        """Route count, shortest and longest route (in choices) to every ending of a story"""
+        try:
+            return self._get_json(f"/stories/{story_id}/endings/stats")
+        except Exception as e:
+            print(f"Error fetching ending stats of story {story_id}: {e}")
+            return None
+
+    def get_story_timing(self, story_id):
+        """Least and most elapsed time at every page and ending, and how each deadline fares"""
+        try:
+            return self._get_json(f"/stories/{story_id}/timing")
+        except Exception as e:
+            print(f"Error fetching timing of story {story_id}: {e}")
+            return None
+
+    def get_page(self, page_id, fields=None):
+        try:
+            params = {"fields": self._fields_param(fields)} if fields else None
+            page = self._get_json(f"/pages/{page_id}", params=params)
             return self._normalize_page(page)
         except Exception as e:
             print(f"Error fetching page {page_id}: {e}")
             return None
 
+    # BULK READS
+
+    # Largest ?ids= list the Flask API accepts in one request
+    bulk_size = 200
+
+    def _get_bulk(self, path, key, ids, fields=None):
+        """Fetch objects by id with one request per bulk_size ids, in the order given"""
+        ids = list(dict.fromkeys(int(i) for i in ids if i is not None))
+        results = []
+        for start in range(0, len(ids), self.bulk_size):
+            params = {"ids": ",".join(str(i) for i in ids[start:start + self.bulk_size])}
+            if fields:
+                params["fields"] = self._fields_param(fields)
+            data = self._get_json(path, params=params)
+            if data:
+                results.extend(data[key])
+        return results
+
+    def get_stories_bulk(self, ids, fields=None):
+        try:
+            return [self._normalize_story(s) for s in self._get_bulk("/stories", "stories", ids, fields)]
+        except Exception as e:
+            print(f"Error fetching stories {ids}: {e}")
+            return []
+
+    def get_pages_bulk(self, ids, fields=None):
+        """Pages by id; include "choices" in fields to get their choices too"""
+        try:
+            return [self._normalize_page(p) for p in self._get_bulk("/pages", "pages", ids, fields)]
+        except Exception as e:
+            print(f"Error fetching pages {ids}: {e}")
+            return []
+
+    def get_choices_bulk(self, ids):
+        try:
+            return [self._normalize_choice(c) for c in self._get_bulk("/choices", "choices", ids)]
+        except Exception as e:
+            print(f"Error fetching choices {ids}: {e}")
+            return []
+
+    # PUBLISHED SNAPSHOTS
+
+    def get_published(self, story_id):
+        """{"version", "start_page_id", ...} of the snapshot readers are served, or None"""
+        try:
+            return self._get_json(f"/stories/{story_id}/published")
+        except Exception as e:
+            print(f"Error fetching published snapshot of story {story_id}: {e}")
+            return None
+
+    def get_snapshot_page(self, story_id, version, page_id):
+        """A page with its choices as it was in the given published version"""
+        try:
+            page = self._get_immutable(f"/stories/{story_id}/snapshots/{version}/pages/{page_id}")
+            return self._normalize_page(page)
+        except Exception as e:
+            print(f"Error fetching page {page_id} of story {story_id} v{version}: {e}")
+            return None
+
+    # CHANGE FEED
+
+    def iter_changes(self, since=0, limit=None):
+        """Every change after seq since, oldest first, fetched page by page
+
+        Each change is {"seq", "story_id", "type": "story"|"page"|"choice",
+        "id", "op": "create"|"update"|"delete", "changed_at"}; keep the seq
+        of the last one to resume from it next time.
+        """
+        while True:
+            params = {"since": since}
+            if limit:
+                params["limit"] = limit
+            response = self.session.get(f"{self.url}/changes", params=params, timeout=10)
+            data = self._handle_response(response)
+            if not data:
+                return
+            yield from data["changes"]
+            since = data["last_seq"]
+            if not data["has_more"]:
+                return
+
+    def forget(self, *paths):
+        """Drop the cached ETag copies of the given API paths, whatever their params"""
+        urls = {f"{self.url}{path}" for path in paths}
+        with self._etag_lock:
+            for cache_key in [key for key in self._etag_cache if key[0] in urls]:
+                del self._etag_cache[cache_key]
+
+    def sync_changes(self, since=0):
+        """Forget cached copies of everything changed after seq since; returns the new seq"""
+        try:
+            for change in self.iter_changes(since):
+                paths = [f"/stories/{change['story_id']}", f"/stories/{change['story_id']}/graph"]
+                if change["type"] == "page":
+                    paths.append(f"/pages/{change['id']}")
+                elif change["type"] == "choice":
+                    paths.append(f"/choices/{change['id']}")
+                self.forget(*paths)
+                since = change["seq"]
+        except Exception as e:
+            print(f"Error syncing changes after {since}: {e}")
+        return since
+
+    # BACKGROUND JOBS
+
+    def get_job(self, job_id):
+        """Status of a background job: {"status": "queued"|"running"|"succeeded"|"failed", ...}"""
+        try:
+            response = self.session.get(f"{self.url}/jobs/{job_id}", timeout=10)
+            return self._handle_response(response)
+        except Exception as e:
+            print(f"Error fetching job {job_id}: {e}")
+            return None
+
+    def wait_for_job(self, job_id, timeout=60, interval=0.5):
+        """Poll a job until it finishes or timeout seconds pass; returns its last status"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get_job(job_id)
+            if job is None or job["status"] in ("succeeded", "failed"):
+                return job
+            if time.monotonic() >= deadline:
+                return job
+            time.sleep(interval)
+
     # WRITE ENDPOINTS
 
     def create_story(self, title, description="", status="draft", author_id=None, tags=None):
@@ -145,7 +437,7 @@ class FlaskAPIClient:
                 "author_name": "Author",
                 "tags": tags if tags else "",
             }
-            response = requests.post(
+            response = self.session.post(
                 f"{self.url}/stories",
                 json=data,
                 headers=self._get_head(include_auth=True),
@@ -161,13 +453,28 @@ class FlaskAPIClient:
             print(f"Error creating story: {e}")
             return None
 
+    def clone_story(self, story_id, **overrides):
+        """Copy a story with all its pages and choices; overrides title, author_id, status..."""
+        try:
+            response = self.session.post(
+                f"{self.url}/stories/{story_id}/clone",
+                json=overrides,
+                headers=self._get_head(include_auth=True),
+                timeout=30,
+            )
+            result = self._handle_response(response)
+            return self._normalize_story(result) if result else None
+        except Exception as e:
+            print(f"Error cloning story {story_id}: {e}")
+            return None
+
     def update_story(self, story_id, **kwargs):
         try:
             # Convert tags list to comma separated string if needed
             if "tags" in kwargs and isinstance(kwargs["tags"], list):
                 kwargs["tags"] = ",".join(kwargs["tags"])
 
-            response = requests.put(
+            response = self.session.put(
                 f"{self.url}/stories/{story_id}",
                 json=kwargs,
                 headers=self._get_head(include_auth=True),
@@ -183,14 +490,65 @@ class FlaskAPIClient:
             print(f"Error updating story {story_id}: {e}")
             return None
 
+    def set_stories_status(self, story_ids, status):
+        """Set the status of many stories in one request; returns the ids that were updated"""
+        try:
+            response = self.session.patch(
+                f"{self.url}/stories",
+                json={"ids": [int(i) for i in story_ids], "status": status},
+                headers=self._get_head(include_auth=True),
+                timeout=10,
+            )
+            result = self._handle_response(response)
+            return result["updated"] if result else []
+        except Exception as e:
+            print(f"Error setting status of stories {story_ids}: {e}")
+            return []
+
+    def edit_story_graph(self, story_id, operations, version=None):
+        """Apply page and choice operations to a story in one transaction
+
+        Each operation is {"op": "create"|"update"|"delete", "type": "page"|"choice",
+        "id": ..., "ref": ..., "data": {...}}. Pass the story version the edits were
+        made against to get None back instead of overwriting someone else's changes.
+        """
+        try:
+            payload = {"operations": operations}
+            if version is not None:
+                payload["version"] = version
+            response = self.session.patch(
+                f"{self.url}/stories/{story_id}/graph",
+                json=payload,
+                headers=self._get_head(include_auth=True),
+                timeout=10,
+            )
+            return self._handle_response(response)
+        except Exception as e:
+            print(f"Error editing story graph {story_id}: {e}")
+            return None
+
+    def publish_story(self, story_id):
+        """Snapshot the story as it is now for readers; returns {"version", "url", ...}"""
+        try:
+            response = self.session.post(
+                f"{self.url}/stories/{story_id}/publish",
+                headers=self._get_head(include_auth=True),
+                timeout=30,
+            )
+            return self._handle_response(response)
+        except Exception as e:
+            print(f"Error publishing story {story_id}: {e}")
+            return None
+
     def delete_story(self, story_id):
+        """Hide a story and queue the removal of its pages; poll the returned job with get_job"""
         try:
-            response = requests.delete(
+            response = self.session.delete(
                 f"{self.url}/stories/{story_id}",
                 headers=self._get_head(include_auth=True),
                 timeout=10,
             )
-            return response.status_code == 200
+            return response.status_code in (200, 202)
         except Exception as e:
             print(f"Error deleting story {story_id}: {e}")
             return False
@@ -202,7 +560,7 @@ class FlaskAPIClient:
                 "is_ending": is_ending,
                 "ending_label": ending_label,
             }
-            response = requests.post(
+            response = self.session.post(
                 f"{self.url}/stories/{story_id}/pages",
                 json=data,
                 headers=self._get_head(include_auth=True),
@@ -224,7 +582,7 @@ class FlaskAPIClient:
             if "text" in kwargs:
                 kwargs["content"] = kwargs.pop("text")
 
-            response = requests.put(
+            response = self.session.put(
                 f"{self.url}/pages/{page_id}",
                 json=kwargs,
                 headers=self._get_head(include_auth=True),
@@ -240,7 +598,7 @@ class FlaskAPIClient:
 
     def delete_page(self, page_id):
         try:
-            response = requests.delete(
+            response = self.session.delete(
                 f"{self.url}/pages/{page_id}",
                 headers=self._get_head(include_auth=True),
                 timeout=10,
@@ -256,7 +614,7 @@ class FlaskAPIClient:
                 "choice_text": text,       # Flask uses 'choice_text'
                 "to_page_id": next_page_id,  # Flask uses 'to_page_id'
             }
-            response = requests.post(
+            response = self.session.post(
                 f"{self.url}/pages/{page_id}/choices",
                 json=data,
                 headers=self._get_head(include_auth=True),
@@ -281,7 +639,7 @@ class FlaskAPIClient:
             if "next_page_id" in kwargs:
                 kwargs["to_page_id"] = kwargs.pop("next_page_id")
 
-            response = requests.put(
+            response = self.session.put(
                 f"{self.url}/choices/{choice_id}",
                 json=kwargs,
                 headers=self._get_head(include_auth=True),
@@ -297,7 +655,7 @@ class FlaskAPIClient:
 
     def delete_choice(self, choice_id):
         try:
-            response = requests.delete(
+            response = self.session.delete(
                 f"{self.url}/choices/{choice_id}",
                 headers=self._get_head(include_auth=True),
                 timeout=10,
@@ -0,0 +1,16 @@
+from .flask_api import bind_user_session
+
+
+class FlaskAPIUserMiddleware:
+    """Ties the Flask API calls of a request to the Django session of its user
+
+    Keeps the API's read-your-writes cookie per user, so one author's
+    write only sends that author's following reads to the primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with bind_user_session(request.session):
+            return self.get_response(request)
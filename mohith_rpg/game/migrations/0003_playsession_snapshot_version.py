@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-17 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0002_report_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playsession',
+            name='snapshot_version',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-17 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_playsession_snapshot_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playsession',
+            name='elapsed_time',
+            field=models.IntegerField(default=0),
+        ),
+    ]
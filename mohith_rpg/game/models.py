@@ -17,6 +17,10 @@ class PlaySession(models.Model):
     session_key = models.CharField(max_length=100, db_index=True)
     story_id = models.IntegerField()
     current_page_id = models.IntegerField()
+    # Published version the session plays; None plays the live story
+    snapshot_version = models.IntegerField(null=True, blank=True)
+    # Sum of the time_change of the choices taken so far
+    elapsed_time = models.IntegerField(default=0)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True,
                              blank=True, related_name='play_sessions')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -25,6 +29,19 @@ class PlaySession(models.Model):
     def __str__(self):
         return f"Session {self.session_key} - Story {self.story_id} at Page {self.current_page_id}"
 
+    def take_choice(self, choice):
+        """Move to the page a choice leads to, spending its time_change."""
+        self.elapsed_time += choice.get("time_change") or 0
+        self.current_page_id = choice["next_page_id"]
+
+    def missed_deadline(self, page):
+        """Whether the reader got to page later than the deadline in its extradata."""
+        extradata = page.get("extradata")
+        deadline = extradata.get("deadline") if isinstance(extradata, dict) else None
+        if isinstance(deadline, bool) or not isinstance(deadline, (int, float)):
+            return False
+        return self.elapsed_time > deadline
+
 
 class UserProfile(models.Model):
     role_choices = [('reader', 'Reader'),
@@ -15,7 +15,9 @@ urlpatterns = [
     path("author/", views.author_dashboard, name="author_dashboard"),
     path("author/stories/create/", views.author_story_create, name="author_story_create"),
     path("author/stories/<int:story_id>/edit/", views.author_story_edit, name="author_story_edit"),
+    path("author/stories/<int:story_id>/publish/", views.author_story_publish, name="author_story_publish"),
     path("author/stories/<int:story_id>/delete/", views.author_story_delete, name="author_story_delete"),
+    path("author/stories/<int:story_id>/clone/", views.author_story_clone, name="author_story_clone"),
     path("author/stories/<int:story_id>/pages/create/", views.author_page_create, name="author_page_create"),
     path("author/pages/<int:page_id>/edit/", views.author_page_edit, name="author_page_edit"),
     path("author/pages/<int:page_id>/delete/", views.author_page_delete, name="author_page_delete"),
@@ -15,9 +15,15 @@ from game.decorators import story_owner_required
 def home(request):
     """List all published stories."""
     search = request.GET.get("search", "")
-    stories = flask_api.get_stories(status="published", search=search or None)
+    cursor = request.GET.get("cursor")
+    result = flask_api.get_stories_page(
+        status="published", search=search or None, cursor=cursor,
+        fields=["title", "description", "author_name", "tags", "page_count", "ending_count", "max_depth"],
+    )
     return render(request, "home.html", {
-        "stories": stories,
+        "stories": result["stories"],
+        "next_cursor": result["next_cursor"],
+        "cursor": cursor,
         "search": search,
     })
 
@@ -26,25 +32,41 @@ def home(request):
 #  GAMEPLAY
 # ─────────────────────────────────────────
 
+def get_session_page(session, page_id):
+    """A page of the version the session plays: its published snapshot, or the live story."""
+    if session.snapshot_version:
+        return flask_api.get_snapshot_page(session.story_id, session.snapshot_version, page_id)
+    return flask_api.get_page(page_id)
+
+
 def play_start(request, story_id):
     """Start or resume a story."""
-    story = flask_api.get_story(story_id)
-    if not story:
-        messages.error(request, "Story not found.")
-        return redirect("home")
-
-    if not story.get("start_page_id"):
-        messages.error(request, "This story has no starting page yet.")
-        return redirect("home")
+    # Readers play the published snapshot, so later edits never change a run mid-way;
+    # stories without one (drafts being previewed) are played live
+    published = flask_api.get_published(story_id)
+    if published and published.get("start_page_id"):
+        start_page_id = published["start_page_id"]
+        snapshot_version = published["version"]
+    else:
+        story = flask_api.get_story(story_id, fields=["start_page_id"])
+        if not story:
+            messages.error(request, "Story not found.")
+            return redirect("home")
+
+        if not story.get("start_page_id"):
+            messages.error(request, "This story has no starting page yet.")
+            return redirect("home")
+        start_page_id = story["start_page_id"]
+        snapshot_version = None
 
     # Create a new session
     session_key = str(uuid.uuid4())
-    start_page_id = story["start_page_id"]
 
     PlaySession.objects.create(
         session_key=session_key,
         story_id=story_id,
         current_page_id=start_page_id,
+        snapshot_version=snapshot_version,
         user=request.user if request.user.is_authenticated else None,
     )
 
@@ -58,15 +80,18 @@ def play_page(request, session_key):
         messages.error(request, "Session not found.")
         return redirect("home")
 
-    page = flask_api.get_page(session.current_page_id)
+    page = get_session_page(session, session.current_page_id)
     if not page:
         messages.error(request, "Page not found.")
         return redirect("home")
 
-    story = flask_api.get_story(session.story_id)
+    story = flask_api.get_story(session.story_id, fields=["title"])
+
+    # Arriving after the page's deadline ends the story there
+    late = session.missed_deadline(page)
 
     # If it's an ending, record a completed play
-    if page.get("is_ending"):
+    if page.get("is_ending") and not late:
         Play.objects.get_or_create(
             story_id=session.story_id,
             ending_page_id=page["id"],
@@ -79,7 +104,9 @@ def play_page(request, session_key):
         "page": page,
         "story": story,
         "choices": page.get("choices", []),
-        "is_ending": page.get("is_ending", False),
+        "is_ending": page.get("is_ending", False) or late,
+        "late": late,
+        "timed": bool(session.elapsed_time) or any(c.get("time_change") for c in page.get("choices", [])),
     })
 
 
@@ -94,7 +121,7 @@ def play_choice(request, session_key, choice_id):
         return redirect("home")
 
     # Get current page to find the choice
-    page = flask_api.get_page(session.current_page_id)
+    page = get_session_page(session, session.current_page_id)
     if not page:
         return redirect("home")
 
@@ -104,8 +131,13 @@ def play_choice(request, session_key, choice_id):
         messages.error(request, "Invalid choice.")
         return redirect("play_page", session_key=session_key)
 
+    # A missed deadline ended the story on this page; play_page shows it as the ending
+    if session.missed_deadline(page):
+        messages.error(request, "You ran out of time.")
+        return redirect("play_page", session_key=session_key)
+
     # Advance session to next page
-    session.current_page_id = chosen["next_page_id"]
+    session.take_choice(chosen)
     session.save()
 
     return redirect("play_page", session_key=session_key)
@@ -123,9 +155,16 @@ def play_restart(request, story_id):
 @login_required
 def author_dashboard(request):
     """List all stories for authoring."""
-    stories = flask_api.get_stories()
-    user_stories = [s for s in stories if s.get('author_id') == request.user.id]
-    return render(request, 'author/dashboard.html', {'stories': user_stories})
+    cursor = request.GET.get("cursor")
+    result = flask_api.get_stories_page(
+        author_id=request.user.id, cursor=cursor,
+        fields=["title", "status", "author_name"],
+    )
+    return render(request, 'author/dashboard.html', {
+        'stories': result["stories"],
+        'next_cursor': result["next_cursor"],
+        'cursor': cursor,
+    })
 
 @login_required
 def author_story_create(request):
@@ -193,7 +232,28 @@ def author_story_edit(request, story_id):
             else:
                 messages.error(request, "Failed to update story.")
 
-    return render(request, "author/story_edit.html", {"story": story})
+    analysis = flask_api.get_story_analysis(story_id) or {}
+    endings = (flask_api.get_ending_stats(story_id) or {}).get("endings", [])
+    stats_by_page = {ending["page_id"]: ending for ending in endings}
+    for page in story.get("pages", []):
+        page["ending_stats"] = stats_by_page.get(page["id"])
+    return render(request, "author/story_edit.html", {
+        "story": story,
+        "unreachable": set(analysis.get("unreachable_page_ids", [])),
+        "trapped": {page_id for trap in analysis.get("traps", []) for page_id in trap},
+    })
+
+@login_required
+@story_owner_required
+def author_story_publish(request, story_id):
+    """Publish the story's current pages to readers."""
+    if request.method == "POST":
+        published = flask_api.publish_story(story_id)
+        if published:
+            messages.success(request, f"Published version {published['version']}.")
+        else:
+            messages.error(request, "Failed to publish story.")
+    return redirect("author_story_edit", story_id=story_id)
 
 @login_required
 @story_owner_required
@@ -207,11 +267,37 @@ def author_story_delete(request, story_id):
             messages.error(request, "Failed to delete story.")
     return redirect("author_dashboard")
 
+@login_required
+def author_story_clone(request, story_id):
+    """Fork a published story, or one of your own, into a new draft."""
+    if request.method != "POST":
+        return redirect("author_dashboard")
+
+    story = flask_api.get_story(story_id, fields=["status", "author_id"])
+    if not story:
+        messages.error(request, "Story not found.")
+        return redirect("author_dashboard")
+    if story["status"] != "published" and story.get("author_id") != request.user.id and not request.user.is_staff:
+        messages.error(request, "You can only fork published stories.")
+        return redirect("author_dashboard")
+
+    clone = flask_api.clone_story(
+        story_id,
+        author_id=request.user.id,
+        author_name=request.user.username,
+        status="draft",
+    )
+    if clone:
+        messages.success(request, f"Forked into '{clone['title']}'.")
+        return redirect("author_story_edit", story_id=clone["id"])
+    messages.error(request, "Failed to fork story.")
+    return redirect("author_dashboard")
+
 @login_required
 @story_owner_required
 def author_page_create(request, story_id):
     """Add a new page to a story."""
-    story = flask_api.get_story(story_id)
+    story = flask_api.get_story(story_id, fields=["title"])
     if not story:
         messages.error(request, "Story not found.")
         return redirect("author_dashboard")
@@ -250,7 +336,7 @@ def author_page_edit(request, page_id):
         messages.error(request, "Page not found.")
         return redirect("author_dashboard")
 
-    story = flask_api.get_story(page["story_id"], include_pages=True)
+    story = flask_api.get_story(page["story_id"], fields=["title"])
 
     if request.method == "POST":
         text = request.POST.get("text", "").strip()
@@ -272,6 +358,14 @@ def author_page_edit(request, page_id):
             else:
                 messages.error(request, "Failed to update page.")
 
+    # Resolve every choice target with one bulk request
+    targets = flask_api.get_pages_bulk(
+        [c["next_page_id"] for c in page.get("choices", [])], fields=["page_key"]
+    )
+    target_keys = {p["id"]: p["page_key"] for p in targets}
+    for choice in page.get("choices", []):
+        choice["next_page_key"] = target_keys.get(choice["next_page_id"])
+
     return render(request, "author/page_form.html", {
         "action": "Edit",
         "story": story,
@@ -281,7 +375,7 @@ def author_page_edit(request, page_id):
 @login_required
 def author_page_delete(request, page_id):
     """Delete a page."""
-    page = flask_api.get_page(page_id)
+    page = flask_api.get_page(page_id, fields=["story_id"])
     story_id = page["story_id"] if page else None
 
     if request.method == "POST":
@@ -303,7 +397,11 @@ def author_choice_create(request, page_id):
         messages.error(request, "Page not found.")
         return redirect("author_dashboard")
 
-    story = flask_api.get_story(page["story_id"], include_pages=True)
+    # The page picker only needs ids and keys, not every page's text
+    story = flask_api.get_story(
+        page["story_id"], include_pages=True,
+        fields=["title"], page_fields=["page_key"],
+    )
 
     if request.method == "POST":
         text = request.POST.get("text", "").strip()
@@ -43,15 +43,22 @@ def profile_view(request):
 @staff_member_required
 def admin_stories_view(request):
     """Admin can see all stories and suspend them."""
-    stories = flask_api.get_stories()
-    return render(request, 'admin/stories.html', {'stories': stories})
+    cursor = request.GET.get('cursor')
+    result = flask_api.get_stories_page(
+        cursor=cursor, fields=['title', 'author_name', 'status', 'created_at'],
+    )
+    return render(request, 'admin/stories.html', {
+        'stories': result['stories'],
+        'next_cursor': result['next_cursor'],
+        'cursor': cursor,
+    })
 
 
 @staff_member_required
 def admin_suspend_story(request, story_id):
     """Suspend a story."""
     if request.method == 'POST':
-        flask_api.update_story(story_id, status='suspended')
+        flask_api.set_stories_status([story_id], 'suspended')
         messages.success(request, "Story suspended.")
     return redirect('admin_stories')
 
@@ -60,15 +67,40 @@ def admin_suspend_story(request, story_id):
 def admin_unsuspend_story(request, story_id):
     """Unsuspend a story."""
     if request.method == 'POST':
-        flask_api.update_story(story_id, status='published')
+        flask_api.set_stories_status([story_id], 'published')
         messages.success(request, "Story unsuspended.")
     return redirect('admin_stories')
 
 
+# Bulk actions of the moderation pages -> story status they set
+BULK_STORY_ACTIONS = {'suspend': 'suspended', 'unsuspend': 'published'}
+
+
+@staff_member_required
+def admin_bulk_stories(request):
+    """Suspend or unsuspend every selected story with one API request."""
+    if request.method == 'POST':
+        status = BULK_STORY_ACTIONS.get(request.POST.get('action'))
+        story_ids = request.POST.getlist('story_ids')
+        if status and story_ids:
+            updated = flask_api.set_stories_status(story_ids, status)
+            messages.success(request, f"{len(updated)} stories {status}.")
+        else:
+            messages.error(request, "Select at least one story.")
+    return redirect('admin_stories')
+
+
 @staff_member_required
 def admin_reports_view(request):
     """Admin view all reports."""
-    reports = Report.objects.all().order_by('-id')
+    reports = list(Report.objects.all().order_by('-id'))
+
+    # One bulk request for every reported story instead of one per report
+    stories = flask_api.get_stories_bulk({r.story_id for r in reports}, fields=['title'])
+    titles = {s['id']: s['title'] for s in stories}
+    for report in reports:
+        report.story_title = titles.get(report.story_id)
+
     return render(request, 'admin/reports.html', {'reports': reports})
 
 
@@ -82,7 +114,7 @@ def admin_review_report(request, report_id):
         notes = request.POST.get('moderator_notes', '')
 
         if action == 'suspend':
-            flask_api.update_story(report.story_id, status='suspended')
+            flask_api.set_stories_status([report.story_id], 'suspended')
             report.status = 'resolved'
         elif action == 'dismiss':
             report.status = 'dismissed'
@@ -98,4 +130,27 @@ def admin_review_report(request, report_id):
     return render(request, 'admin/report_review.html', {
         'report': report,
         'story': story,
-    })
\ No newline at end of file
+    })
+
+
+@staff_member_required
+def admin_bulk_reports(request):
+    """Resolve every selected report at once, suspending their stories in one API request."""
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        reports = Report.objects.filter(id__in=request.POST.getlist('report_ids'), status='pending')
+        count = 0
+
+        if action == 'suspend':
+            story_ids = set(reports.values_list('story_id', flat=True))
+            if story_ids:
+                flask_api.set_stories_status(story_ids, 'suspended')
+            count = reports.update(status='resolved', reviewed_by=request.user)
+        elif action == 'dismiss':
+            count = reports.update(status='dismissed', reviewed_by=request.user)
+
+        if count:
+            messages.success(request, f"{count} reports reviewed.")
+        else:
+            messages.error(request, "Select at least one pending report.")
+    return redirect('admin_reports')
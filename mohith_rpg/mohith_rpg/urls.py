@@ -31,8 +31,10 @@ urlpatterns = [
 
     # Moderation URLs (renamed from admin/ to moderate/ to avoid conflict with Django's built-in admin panel)
     path('moderate/stories/', views_auth.admin_stories_view, name='admin_stories'),
+    path('moderate/stories/bulk/', views_auth.admin_bulk_stories, name='admin_bulk_stories'),
     path('moderate/stories/<int:story_id>/suspend/', views_auth.admin_suspend_story, name='admin_suspend_story'),
     path('moderate/stories/<int:story_id>/unsuspend/', views_auth.admin_unsuspend_story, name='admin_unsuspend_story'),
     path('moderate/reports/', views_auth.admin_reports_view, name='admin_reports'),
+    path('moderate/reports/bulk/', views_auth.admin_bulk_reports, name='admin_bulk_reports'),
     path('moderate/reports/<int:report_id>/review/', views_auth.admin_review_report, name='admin_review_report'),
 ]
\ No newline at end of file